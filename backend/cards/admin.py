@@ -1,53 +1,249 @@
+import json
+
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .forms import NoteForm
+from .models import Card, CardSRS, Deck, Folder, Note, ReviewSession, Tag, UserProfile
+from .notes import sync_note_cards
+from .tags import TagError, tag_filter
+
+
+# ---------------------------------------------------------------------------
+# Helpers for changelists over large tables
+# ---------------------------------------------------------------------------
+
+
+class InputFilter(admin.SimpleListFilter):
+    """A list filter rendered as a text box instead of a list of every value.
+
+    Listing every user or deck in the sidebar means loading the whole table
+    on each changelist view; typing the value keeps the filter O(1).
+    """
+
+    template = "admin/input_filter.html"
+    placeholder = ""
+    # Lookup used when the typed value is numeric / textual.
+    id_lookup = None
+    text_lookup = None
+
+    def lookups(self, request, model_admin):
+        # Must be non-empty or Django hides the filter.
+        return ((None, ""),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice["query_parts"] = [
+            (key, value)
+            for key, values in changelist.get_filters_params().items()
+            if key != self.parameter_name
+            for value in (values if isinstance(values, list) else [values])
+        ]
+        yield all_choice
+
+    def queryset(self, request, queryset):
+        value = (self.value() or "").strip()
+        if not value:
+            return queryset
+        if value.isdigit() and self.id_lookup:
+            return queryset.filter(**{self.id_lookup: int(value)})
+        if self.text_lookup:
+            return queryset.filter(**{self.text_lookup: value})
+        return queryset.none()
+
+
+def user_input_filter(prefix):
+    """Build an InputFilter matching a user by id or by email/username."""
+
+    class UserInputFilter(InputFilter):
+        title = "user"
+        parameter_name = "user"
+        placeholder = "User id or email"
+        id_lookup = f"{prefix}_id"
+        # Accounts use the normalized email as username, which is indexed.
+        text_lookup = f"{prefix}__username"
+
+    return UserInputFilter
+
+
+class DeckInputFilter(InputFilter):
+    title = "deck"
+    parameter_name = "deck"
+    placeholder = "Deck id"
+    id_lookup = "deck_id"
+
+
+class FolderInputFilter(InputFilter):
+    title = "folder"
+    parameter_name = "folder"
+    placeholder = "Folder id"
+    id_lookup = "folder_id"
+
+
+class TagExpressionFilter(InputFilter):
+    """Cards matching a tag expression (tag names of any user)."""
+
+    title = "tags"
+    parameter_name = "tags"
+    placeholder = "e.g. verbs AND NOT irregular"
+
+    def queryset(self, request, queryset):
+        value = (self.value() or "").strip()
+        if not value:
+            return queryset
+        try:
+            return queryset.filter(tag_filter(value, card_field="id"))
+        except TagError as exc:
+            raise IncorrectLookupParameters(exc)
+
 
-from .models import Card, CardSRS, Deck, Folder, ReviewSession
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts planner statistics for big PostgreSQL tables.
+
+    An exact COUNT(*) over millions of rows is the slowest part of a
+    changelist. On PostgreSQL the planner's row estimate is used instead when
+    it is above ESTIMATE_THRESHOLD; smaller results are still counted exactly.
+    """
+
+    ESTIMATE_THRESHOLD = 50_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return super().count
+
+        estimate = self._estimate(queryset, connection)
+        if estimate is None or estimate < self.ESTIMATE_THRESHOLD:
+            return super().count
+        return estimate
+
+    @staticmethod
+    def _estimate(queryset, connection):
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                # Unfiltered: the table's statistics are enough.
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+            else:
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            row = cursor.fetchone()
+
+        if row is None:
+            return None
+        if isinstance(row[0], (int, float)):
+            return int(row[0]) if row[0] >= 0 else None
+        plan = row[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist defaults for tables that grow with every user's cards."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Folder)
 class FolderAdmin(admin.ModelAdmin):
-    list_display = ("name", "user", "sort_order", "created_at")
-    list_filter = ("user",)
-    search_fields = ("name", "user__username", "user__email")
+    list_display = ("name", "user", "parent", "sort_order", "created_at")
+    list_filter = (user_input_filter("user"),)
+    search_fields = ("name", "=user__username")
     ordering = ("user", "sort_order", "name")
+    list_select_related = ("user", "parent")
+    autocomplete_fields = ("user", "parent")
 
 
 @admin.register(Deck)
-class DeckAdmin(admin.ModelAdmin):
+class DeckAdmin(LargeTableAdmin):
     list_display = ("user", "title",  "folder", "created_at")
-    list_filter = ("user", "is_archived", "folder")
-    search_fields = ("title", "description", "user__username", "user__email", "folder__name")
+    list_filter = (user_input_filter("user"), "is_archived", "is_public", FolderInputFilter)
+    search_fields = ("title", "=user__username", "folder__name")
     ordering = ("user", "sort_order", "title")
     list_select_related = ("user", "folder")
-    autocomplete_fields = ("user", "folder")
+    autocomplete_fields = ("user", "folder", "source_deck")
 
 
 @admin.register(Card)
-class CardAdmin(admin.ModelAdmin):
+class CardAdmin(LargeTableAdmin):
     list_display = ("get_user", "front_preview", "id", "deck",  "status",  "updated_at", "created_at")
-    list_filter = ("status", "deck__user", "deck")
+    list_filter = ("status", user_input_filter("user"), DeckInputFilter, TagExpressionFilter)
+    # Prefix/exact lookups only: a substring search over back_text or a
+    # join to auth_user for email scans the whole card table.
     search_fields = (
-        "front_text",
-        "back_text",
-        "deck__title",
-        "deck__user__username",
-        "deck__user__email",
+        "=id",
+        "^front_text",
+        "^note__front_text",
+        "^deck__title",
+        "=user__username",
     )
-    ordering = ("-updated_at",)
-    list_select_related = ("deck", "deck__user")
-    autocomplete_fields = ("deck",)
+    # Newest first by primary key; no extra index on updated_at needed.
+    ordering = ("-id",)
+    list_select_related = ("deck", "user", "note")
+    autocomplete_fields = ("deck", "origin")
+
+    def get_readonly_fields(self, request, obj=None):
+        # A note's cards have no text of their own; edit the note instead.
+        if obj is not None and obj.note_id:
+            return (
+                *super().get_readonly_fields(request, obj),
+                "front_text", "back_text", "content_format",
+            )
+        return super().get_readonly_fields(request, obj)
 
-    @admin.display(ordering="deck__user", description="User")
+    @admin.display(ordering="user", description="User")
     def get_user(self, obj):
-        return obj.deck.user
+        return obj.user
+
+    @admin.display(description="Front")
+    def front_preview(self, obj):
+        text = (obj.sides()[0] or "").strip().replace("\n", " ")
+        return text[:60] + ("…" if len(text) > 60 else "")
+
+
+@admin.register(Note)
+class NoteAdmin(LargeTableAdmin):
+    list_display = ("user", "kind", "front_preview", "id", "deck", "updated_at")
+    list_filter = ("kind", user_input_filter("user"), DeckInputFilter)
+    search_fields = ("=id", "^front_text", "=user__username")
+    ordering = ("-id",)
+    list_select_related = ("deck", "user")
+    autocomplete_fields = ("deck",)
+    form = NoteForm
 
     @admin.display(description="Front")
     def front_preview(self, obj):
         text = (obj.front_text or "").strip().replace("\n", " ")
         return text[:60] + ("…" if len(text) > 60 else "")
 
+    def save_model(self, request, obj, form, change):
+        # Admin edits go through the same diff as the note editor.
+        super().save_model(request, obj, form, change)
+        sync_note_cards(obj)
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ("name", "user", "card_count")
+    list_filter = (user_input_filter("user"),)
+    search_fields = ("^name", "=user__username")
+    ordering = ("user", "name")
+    list_select_related = ("user",)
+    autocomplete_fields = ("user",)
+    readonly_fields = ("card_count",)
+
 
 @admin.register(CardSRS)
-class CardSRSAdmin(admin.ModelAdmin):
+class CardSRSAdmin(LargeTableAdmin):
     list_display = (
        "get_user",
        "card",
@@ -58,25 +254,34 @@ class CardSRSAdmin(admin.ModelAdmin):
         "due_at",
         "last_reviewed_at",
     )
-    list_filter = ("card__deck__user",)
+    list_filter = (user_input_filter("user"),)
     search_fields = (
-        "card__front_text",
-        "card__back_text",
-        "card__deck__title",
-        "card__deck__user__username",
+        "=card__id",
+        "^card__front_text",
+        "=user__username",
     )
     ordering = ("due_at",)
-    list_select_related = ("card", "card__deck", "card__deck__user")
-    autocomplete_fields = ("card",)
+    list_select_related = ("card", "card__deck", "card__note", "user")
+    autocomplete_fields = ("card", "user", "deck")
 
-    @admin.display(ordering="card__deck__user", description="User")
+    @admin.display(ordering="user", description="User")
     def get_user(self, obj):
-        return obj.card.deck.user
+        return obj.user
 
 
 @admin.register(ReviewSession)
-class ReviewSessionAdmin(admin.ModelAdmin):
+class ReviewSessionAdmin(LargeTableAdmin):
     list_display = ("user", "mode", "started_at", "ended_at")
-    list_filter = ("user", "mode")
-    search_fields = ("user__username", "user__email")
+    list_filter = (user_input_filter("user"), "mode")
+    search_fields = ("=user__username",)
+    list_select_related = ("user",)
+    autocomplete_fields = ("user", "deck", "folder")
     ordering = ("-started_at",)
+
+
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    list_display = ("user", "timezone", "day_rollover_hour")
+    search_fields = ("=user__username",)
+    list_select_related = ("user",)
+    autocomplete_fields = ("user",)
@@ -0,0 +1,202 @@
+"""Whole-collection statistics over a user's SRS state.
+
+Retention curves, due forecasts and ease distributions look at every
+CardSRS row a user has. Instead of building one model instance per row, the
+rows are streamed with ``values_list`` into one typed NumPy array per column
+(about 40 bytes per card) and every statistic is a vectorized operation on
+those arrays. With ANALYTICS_CACHE_DIR set, the arrays are also kept on disk
+and reused until the user's cards change.
+"""
+
+import os
+import tempfile
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import BigIntegerField, Count, F, Func, Sum
+
+from .models import CardSRS
+
+
+# Column name -> (ORM lookup, dtype). due_at holds UTC epoch seconds.
+SRS_COLUMNS = {
+    "card_id": ("card_id", np.int64),
+    "deck_id": ("deck_id", np.int64),
+    "due_at": ("due_epoch", np.int64),
+    "interval_days": ("interval_days", np.int32),
+    "ease_factor": ("ease_factor", np.float32),
+    "repetitions": ("repetitions", np.int32),
+    "lapses": ("lapses", np.int32),
+}
+
+# Interval buckets (days) for the retention curve, matching the review ladder.
+RETENTION_BUCKETS = [1, 3, 7, 14, 30, 60, 120, 240, 365]
+
+EASE_BINS = np.round(np.arange(1.3, 3.01, 0.1), 1)
+MATURE_INTERVAL_DAYS = 21
+
+
+class EpochSeconds(Func):
+    """A datetime column as UTC epoch seconds, computed by the database.
+
+    Converting in SQL skips building (and time-zone tagging) one Python
+    datetime per row, which is most of the cost of reading the column.
+    """
+
+    template = "CAST(FLOOR(EXTRACT(EPOCH FROM %(expressions)s)) AS BIGINT)"
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite stores UTC text; julianday() 2440587.5 is the Unix epoch. The
+        # half millisecond absorbs floating point error before truncating.
+        return self.as_sql(
+            compiler,
+            connection,
+            template="CAST((julianday(%(expressions)s) - 2440587.5) * 86400 + 0.0005 AS INTEGER)",
+            **extra_context,
+        )
+
+
+def _user_srs(user):
+    return CardSRS.objects.filter(user=user)
+
+
+def _fingerprint(user):
+    """Cheap summary that changes whenever a user's SRS rows change.
+
+    Every answer bumps CardSRS.version. Ids only grow, so a card deleted and
+    another created (or a row moved to a private copy by copy_on_write)
+    changes the sum of card ids even when the count stays the same, and
+    the sum of card_id * deck_id changes when a row moves to another deck.
+    """
+
+    summary = _user_srs(user).aggregate(
+        rows=Count("id"),
+        versions=Sum("version"),
+        cards=Sum("card_id"),
+        placement=Sum(F("card_id") * F("deck_id")),
+    )
+    return "-".join(str(summary[key] or 0) for key in ("rows", "versions", "cards", "placement"))
+
+
+def load_srs_arrays(user, chunk_size=50_000):
+    """Return a dict of column name -> NumPy array with the user's SRS rows.
+
+    Rows are read ``chunk_size`` at a time with a server-side cursor where
+    the database supports it, and copied straight into preallocated arrays,
+    so peak memory stays close to the size of the arrays themselves.
+    """
+
+    queryset = _user_srs(user).order_by().annotate(due_epoch=EpochSeconds("due_at"))
+    total = queryset.count()
+    arrays = {name: np.empty(total, dtype=dtype) for name, (_, dtype) in SRS_COLUMNS.items()}
+
+    lookups = [lookup for lookup, _ in SRS_COLUMNS.values()]
+    rows = queryset.values_list(*lookups).iterator(chunk_size=chunk_size)
+
+    filled = 0
+    while filled < total:
+        # Rows inserted after the COUNT don't fit; the next load picks them up.
+        chunk = list(islice(rows, min(chunk_size, total - filled)))
+        if not chunk:
+            break
+
+        end = filled + len(chunk)
+        for (name, (_, dtype)), column in zip(SRS_COLUMNS.items(), zip(*chunk)):
+            arrays[name][filled:end] = np.asarray(column, dtype=dtype)
+        filled = end
+
+    # Cards deleted between the COUNT and the scan leave unused slots.
+    return {name: array[:filled] for name, array in arrays.items()}
+
+
+def cached_srs_arrays(user):
+    """load_srs_arrays() through the on-disk cache, when one is configured."""
+
+    cache_dir = settings.ANALYTICS_CACHE_DIR
+    if not cache_dir:
+        return load_srs_arrays(user)
+
+    cache_dir = Path(cache_dir)
+    path = cache_dir / f"srs-{user.id}-{_fingerprint(user)}.npz"
+    if path.exists():
+        with np.load(path) as stored:
+            return {name: stored[name] for name in SRS_COLUMNS}
+
+    arrays = load_srs_arrays(user)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for stale in cache_dir.glob(f"srs-{user.id}-*.npz"):
+        stale.unlink(missing_ok=True)
+    # Write to a file of our own and rename it into place, so readers never
+    # see a partial file and two workers refreshing the same user can't
+    # write into each other's. The dot prefix keeps it out of the glob above.
+    partial = tempfile.NamedTemporaryFile(
+        dir=cache_dir, prefix=f".srs-{user.id}-", suffix=".tmp", delete=False
+    )
+    try:
+        with partial:
+            np.savez(partial, **arrays)
+        os.replace(partial.name, path)
+    except BaseException:
+        Path(partial.name).unlink(missing_ok=True)
+        raise
+    return arrays
+
+
+def srs_statistics(arrays, start_of_today, forecast_days=30):
+    """Compute the dashboard statistics from SRS column arrays.
+
+    ``start_of_today`` is an aware datetime; the due forecast counts cards
+    per day from that moment, with overdue cards in day 0.
+    """
+
+    due_at = arrays["due_at"]
+    intervals = arrays["interval_days"]
+    repetitions = arrays["repetitions"]
+    lapses = arrays["lapses"]
+    answers = repetitions + lapses
+
+    day_index = (due_at - int(start_of_today.timestamp())) // 86_400
+    day_index = np.maximum(day_index, 0)
+    upcoming = day_index < forecast_days
+    forecast = np.bincount(day_index[upcoming], minlength=forecast_days)
+
+    due_today = day_index == 0
+    due_decks, due_counts = np.unique(arrays["deck_id"][due_today], return_counts=True)
+
+    # Bins are centred on EASE_BINS (float32 eases sit just off the edges).
+    ease_counts, _ = np.histogram(
+        arrays["ease_factor"],
+        bins=np.append(EASE_BINS - 0.05, np.inf),
+    )
+
+    # Share of right answers per interval bucket: the retention curve.
+    bucket = np.searchsorted(RETENTION_BUCKETS, intervals, side="right")
+    right_per_bucket = np.bincount(bucket, weights=repetitions, minlength=len(RETENTION_BUCKETS) + 1)
+    answers_per_bucket = np.bincount(bucket, weights=answers, minlength=len(RETENTION_BUCKETS) + 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        retention = np.where(answers_per_bucket > 0, right_per_bucket / answers_per_bucket, np.nan)
+
+    total_answers = int(answers.sum())
+    return {
+        "cards": int(due_at.size),
+        "due_today": int(due_today.sum()),
+        "new": int((answers == 0).sum()),
+        "mature": int((intervals >= MATURE_INTERVAL_DAYS).sum()),
+        "retention": round(int(repetitions.sum()) / total_answers, 4) if total_answers else None,
+        "due_forecast": forecast.tolist(),
+        "due_by_deck": dict(zip(due_decks.tolist(), due_counts.tolist())),
+        "ease_histogram": [
+            {"ease": float(low), "cards": int(count)}
+            for low, count in zip(EASE_BINS, ease_counts)
+        ],
+        "retention_curve": [
+            {
+                "interval_days": ([0] + RETENTION_BUCKETS)[index],
+                "retention": None if np.isnan(value) else round(float(value), 4),
+            }
+            for index, value in enumerate(retention)
+        ],
+    }
@@ -0,0 +1,70 @@
+"""The user's logical study day.
+
+"Due today" means "due before this user's day rolls over": midnight in their
+own time zone, or a later hour (UserProfile.day_rollover_hour) for people
+who study past midnight. ``study_day(request)`` computes those boundaries
+once per request; every due count, due query and day-keyed cache entry uses
+the same StudyDay so they can't disagree.
+"""
+
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone
+
+from .models import UserProfile
+
+
+class StudyDay:
+    """One logical day of a user: ``start <= moment < end`` in their zone."""
+
+    def __init__(self, tz, rollover_hour=0, now=None, configured=True):
+        self.tz = tz
+        # False when the user never saved a profile (server defaults).
+        self.configured = configured
+        self.rollover = timedelta(hours=rollover_hour)
+        self.date = self.date_of(now or timezone.now())
+        self.start = self.start_of(self.date)
+        self.end = self.start_of(self.date + timedelta(days=1))
+
+    def date_of(self, moment):
+        """Return the logical date a moment belongs to."""
+
+        return (timezone.localtime(moment, self.tz) - self.rollover).date()
+
+    def start_of(self, day):
+        """Return the aware datetime at which a logical date begins."""
+
+        return timezone.make_aware(datetime.combine(day, time.min), self.tz) + self.rollover
+
+    def __repr__(self):
+        return f"<StudyDay {self.date} {self.tz}>"
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.get_default_timezone()
+
+
+def study_day_for_user(user, now=None):
+    """Return the user's current StudyDay (one profile lookup)."""
+
+    profile = (
+        UserProfile.objects.filter(user_id=user.id)
+        .values_list("timezone", "day_rollover_hour")
+        .first()
+    )
+    if profile is None:
+        return StudyDay(timezone.get_default_timezone(), now=now, configured=False)
+    return StudyDay(_zone(profile[0]), profile[1], now=now)
+
+
+def study_day(request):
+    """Return the StudyDay of the request's user, computed once per request."""
+
+    day = getattr(request, "_study_day", None)
+    if day is None:
+        day = request._study_day = study_day_for_user(request.user)
+    return day
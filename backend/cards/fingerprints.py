@@ -0,0 +1,108 @@
+"""Text fingerprints used to spot duplicate cards.
+
+``front_text_hash`` is stored on every card (Card.front_hash) so exact
+duplicates are found with an indexed equality lookup. The MinHash helpers
+catch near duplicates (small edits, typos) and run in Python over a user's
+cards only when the near-duplicate report is requested.
+"""
+
+import hashlib
+import re
+import struct
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+SHINGLE_SIZE = 3
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16  # 16 bands x 4 rows: pairs above ~0.6 Jaccard usually collide
+
+
+def normalize_front_text(text: str) -> str:
+    """Case-fold and collapse whitespace so trivial variants compare equal."""
+
+    return _WHITESPACE_RE.sub(" ", (text or "").casefold()).strip()
+
+
+def front_text_hash(text: str) -> str:
+    """Return the 32-character hex fingerprint of a card's normalized front."""
+
+    normalized = normalize_front_text(text)
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _shingles(normalized: str):
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text: str):
+    """Return the MinHash signature of a text's character shingles."""
+
+    hashed = [
+        struct.unpack("<Q", hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest())[0]
+        for shingle in _shingles(normalize_front_text(text))
+    ]
+    # One cheap universal hash per permutation: (a * x + b) mod a large prime.
+    prime = (1 << 61) - 1
+    return tuple(
+        min((a * value + b) % prime for value in hashed)
+        for a, b in _PERMUTATION_PARAMS
+    )
+
+
+def _permutation_params():
+    params = []
+    for i in range(MINHASH_PERMUTATIONS):
+        digest = hashlib.blake2b(f"minhash-{i}".encode("utf-8"), digest_size=16).digest()
+        a, b = struct.unpack("<QQ", digest)
+        params.append((a | 1, b))
+    return params
+
+
+_PERMUTATION_PARAMS = _permutation_params()
+
+
+def near_duplicate_groups(items, threshold=0.7):
+    """Group (key, text) pairs whose estimated Jaccard similarity >= threshold.
+
+    Locality-sensitive hashing over signature bands keeps this close to
+    linear: only items sharing a band bucket are compared.
+    """
+
+    signatures = {key: minhash_signature(text) for key, text in items}
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+
+    buckets = {}
+    for key, signature in signatures.items():
+        for band in range(MINHASH_BANDS):
+            bucket = (band, signature[band * rows:(band + 1) * rows])
+            buckets.setdefault(bucket, []).append(key)
+
+    # Union-find over candidate pairs that pass the similarity threshold.
+    parent = {key: key for key in signatures}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for keys in buckets.values():
+        if len(keys) < 2:
+            continue
+        first = keys[0]
+        for other in keys[1:]:
+            if find(first) == find(other):
+                continue
+            matches = sum(
+                1 for x, y in zip(signatures[first], signatures[other]) if x == y
+            )
+            if matches / MINHASH_PERMUTATIONS >= threshold:
+                parent[find(other)] = find(first)
+
+    groups = {}
+    for key in signatures:
+        groups.setdefault(find(key), []).append(key)
+    return [sorted(group) for group in groups.values() if len(group) > 1]
@@ -0,0 +1,109 @@
+"""Queries over the nested folder tree.
+
+The tree is Folder.parent; FolderClosure lists every (ancestor,
+descendant) pair of it (see FolderClosureManager for how moves keep it in
+step). Each helper below is a fixed number of queries however deep the
+tree is: a subtree is one indexed lookup on the closure table, and rolled-up
+counts are one pass over the closure rows.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Deck, Folder, FolderClosure, ReviewSession
+
+
+def subtree_ids(folder_id):
+    """Subquery of the ids of a folder and of every folder under it."""
+
+    return FolderClosure.objects.filter(ancestor_id=folder_id).values("descendant_id")
+
+
+def is_nested(first_id, second_id):
+    """True if one of the two folders lies inside the other (or they are one)."""
+
+    if first_id == second_id:
+        return True
+    return FolderClosure.objects.filter(
+        Q(ancestor_id=first_id, descendant_id=second_id)
+        | Q(ancestor_id=second_id, descendant_id=first_id)
+    ).exists()
+
+
+def folder_tree(folders):
+    """Return [(folder, depth)] in display order: each folder, then its subtree.
+
+    ``folders`` is every folder of one user, already sorted the way siblings
+    should appear.
+    """
+
+    children = {}
+    for folder in folders:
+        children.setdefault(folder.parent_id, []).append(folder)
+
+    ordered = []
+    stack = [(folder, 0) for folder in reversed(children.get(None, []))]
+    while stack:
+        folder, depth = stack.pop()
+        ordered.append((folder, depth))
+        stack.extend((child, depth + 1) for child in reversed(children.get(folder.id, [])))
+    return ordered
+
+
+def rolled_up_counts(user, decks, due_attr="today_cards", total_attr="total_cards"):
+    """Return {folder id: (due, total)} summed over each folder's subtree.
+
+    ``decks`` carry per-deck counts (as annotated on the decks page); adding
+    them up the tree takes one query for the user's closure rows.
+    """
+
+    per_folder = {}
+    for deck in decks:
+        if deck.folder_id:
+            due, total = per_folder.get(deck.folder_id, (0, 0))
+            per_folder[deck.folder_id] = (
+                due + (getattr(deck, due_attr) or 0),
+                total + (getattr(deck, total_attr) or 0),
+            )
+
+    rolled_up = {}
+    for ancestor_id, descendant_id in FolderClosure.objects.filter(
+        ancestor__user=user,
+    ).values_list("ancestor_id", "descendant_id"):
+        due, total = per_folder.get(descendant_id, (0, 0))
+        if due or total:
+            ancestor_due, ancestor_total = rolled_up.get(ancestor_id, (0, 0))
+            rolled_up[ancestor_id] = (ancestor_due + due, ancestor_total + total)
+    return rolled_up
+
+
+def delete_empty_folders(folder_ids):
+    """Delete the folders among ``folder_ids`` with no active deck and no subfolder.
+
+    The folders go in one ``DELETE ... WHERE NOT EXISTS (...)``, so the
+    emptiness test and the delete are the same statement and a deck moved in
+    by a concurrent request keeps its folder. Only when something was deleted
+    are the rows pointing at it cleared by id (closure rows and scoped
+    sessions cascade, archived decks drop to the top level); foreign keys are
+    deferred, so this happens before they are checked at commit. Returns the
+    number of folders deleted. Checking for subfolders matters: deleting a
+    folder deletes its whole subtree.
+    """
+
+    empty = (
+        Folder.objects.filter(id__in=folder_ids)
+        .exclude(Exists(Deck.objects.filter(folder_id=OuterRef("id"), is_archived=False)))
+        .exclude(Exists(Folder.objects.filter(parent_id=OuterRef("id"))))
+        .values("id")
+    )
+    sql, params = empty.query.sql_with_params()
+    table = connection.ops.quote_name(Folder._meta.db_table)
+
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({sql}) RETURNING id", params)
+        deleted_ids = [row[0] for row in cursor.fetchall()]
+        if deleted_ids:
+            FolderClosure.objects.filter(descendant_id__in=deleted_ids).delete()
+            ReviewSession.objects.filter(folder_id__in=deleted_ids).delete()
+            Deck.objects.filter(folder_id__in=deleted_ids).update(folder=None)
+    return len(deleted_ids)
@@ -5,7 +5,9 @@ from django.contrib.auth.password_validation import (
     password_validators_help_text_html,
 )
 from django.core.exceptions import ValidationError
-from .models import Card
+from .models import Card, Note
+from .notes import NoteError, card_sides
+from .tags import TagError, parse_tag_names
 
 
 class EmailSignupForm(forms.ModelForm):
@@ -86,6 +88,51 @@ class EmailSignupForm(forms.ModelForm):
 class CardForm(forms.ModelForm):
     """Simple form for creating or editing a flashcard."""
 
+    # Not a model field: the user's tags are saved with tags.set_card_tags.
+    tags = forms.CharField(
+        required=False,
+        help_text="Separate tags with spaces or commas, e.g. verbs irregular.",
+    )
+
     class Meta:
         model = Card
-        fields = ["front_text", "back_text"]
+        fields = ["front_text", "back_text", "content_format"]
+        help_texts = {
+            "content_format": "Markdown and HTML support formatting and images; unsafe markup is removed.",
+        }
+
+    def clean_tags(self):
+        """Return the set of normalized tag names."""
+        try:
+            return parse_tag_names(self.cleaned_data.get("tags", ""))
+        except TagError as exc:
+            raise forms.ValidationError(str(exc))
+
+
+class NoteForm(forms.ModelForm):
+    """Form for a note, which generates one or more flashcards."""
+
+    class Meta:
+        model = Note
+        fields = ["kind", "front_text", "back_text", "content_format"]
+        labels = {"kind": "Card type"}
+        help_texts = {
+            "kind": "Basic and reversed also asks back to front; cloze makes one card per {{c1::deletion}}.",
+            "back_text": "For cloze notes: extra text shown on the back of every card.",
+        }
+
+    def clean(self):
+        """Check that the note produces at least one card."""
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        try:
+            card_sides(Note(
+                kind=cleaned_data.get("kind"),
+                front_text=cleaned_data.get("front_text", ""),
+                back_text=cleaned_data.get("back_text", ""),
+                content_format=cleaned_data.get("content_format"),
+            ))
+        except NoteError as exc:
+            raise forms.ValidationError(str(exc))
+        return cleaned_data
@@ -0,0 +1,109 @@
+"""The shared deck library.
+
+A user publishes a deck (Deck.is_public) and other users subscribe to it. A
+subscription is a deck of the subscriber's with ``source_deck`` set. The
+publisher's cards are not copied into it: the subscriber only gets CardSRS
+rows for them, so subscribing to a 10,000-card deck writes 10,000 small rows
+and cards added to the source later reach every subscriber (see
+CardSRSManager.create_for_cards). A subscriber who edits a shared card gets
+a private copy of it (copy-on-write) that takes over their SRS row.
+"""
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+from .models import Card, CardSRS, CardTag, Deck
+
+
+SUBSCRIBE_BATCH_SIZE = 5000
+LIBRARY_PAGE_SIZE = 50
+
+
+def public_decks(user, query=""):
+    """Public decks of other users, by title, with card counts.
+
+    ``query`` is a title prefix; the listing is served by the partial index
+    on public deck titles.
+    """
+
+    decks = Deck.objects.filter(is_public=True).exclude(user=user)
+    if query:
+        decks = decks.filter(title__istartswith=query)
+    return (
+        decks.select_related("user")
+        .annotate(
+            card_count=Count("card"),
+            subscribed=Exists(
+                Deck.objects.filter(user=user, source_deck_id=OuterRef("id"))
+            ),
+        )
+        .order_by("title", "id")[:LIBRARY_PAGE_SIZE]
+    )
+
+
+def publish(deck, is_public=True):
+    """List a deck in the library (or take it out again)."""
+
+    if deck.source_deck_id:
+        raise ValueError("A subscribed deck cannot be published.")
+    deck.is_public = is_public
+    deck.save(update_fields=["is_public", "updated_at"])
+
+
+def subscribe(user, source):
+    """Return the user's linked deck for ``source``, creating it on first use.
+
+    The new deck gets one SRS row per source card, all due now, inserted in
+    batches; nothing of the cards themselves is copied.
+    """
+
+    with transaction.atomic():
+        deck, created = Deck.objects.get_or_create(
+            user=user,
+            source_deck=source,
+            defaults={"title": source.title, "description": source.description},
+        )
+        if not created:
+            return deck
+
+        now = timezone.now()
+        card_ids = Card.objects.filter(deck=source).values_list("id", flat=True).order_by("id")
+        batch = []
+        for card_id in card_ids.iterator(chunk_size=SUBSCRIBE_BATCH_SIZE):
+            batch.append(CardSRS(card_id=card_id, user=user, deck=deck, due_at=now))
+            if len(batch) == SUBSCRIBE_BATCH_SIZE:
+                CardSRS.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            CardSRS.objects.bulk_create(batch, ignore_conflicts=True)
+    return deck
+
+
+def copy_on_write(card, deck):
+    """Save a shared card as a private copy in the subscriber's ``deck``.
+
+    ``card`` is the publisher's card, possibly already edited in memory. It
+    is saved as a new card of ``deck`` (its ``origin`` pointing back at the
+    shared one), and the subscriber's SRS row and tags move to the copy so
+    the review history carries over. The publisher's card is left untouched.
+    """
+
+    source_id = card.pk
+    card.pk = None
+    card._state.adding = True
+    card.deck = deck
+    card.origin_id = source_id
+    # The copy is a standalone card; the publisher's note keeps generating theirs.
+    if card.note_id is not None and not card.front_text:
+        card.front_text, card.back_text = card.sides()
+    card.note_id = None
+    card.ordinal = 0
+
+    with transaction.atomic():
+        card.save()
+        # save() gave the copy a fresh SRS row; the existing one replaces it.
+        CardSRS.objects.filter(card=card, user_id=deck.user_id).delete()
+        CardSRS.objects.filter(card_id=source_id, user_id=deck.user_id).update(card=card)
+        CardTag.objects.filter(card_id=source_id, tag__user_id=deck.user_id).update(card=card)
+    return card
@@ -0,0 +1,87 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from cards.models import Deck, Folder
+from cards.views import DecksView
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark decks.html render time for a user with many decks, with "
+        "cold fragment caches (every row rendered) and warm ones. All test "
+        "data is created inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--decks", type=int, default=500)
+        parser.add_argument("--decks-per-folder", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, options):
+        user = User.objects.create_user(username="bench-decks@example.com")
+        folders = Folder.objects.bulk_create(
+            Folder(user=user, name=f"Folder {i}")
+            for i in range(options["decks"] // max(options["decks_per_folder"], 1) // 2)
+        )
+        Deck.objects.bulk_create(
+            Deck(
+                user=user,
+                title=f"Deck {i}",
+                # Half of the decks live in folders, half are ungrouped.
+                folder=folders[i // options["decks_per_folder"]] if i // options["decks_per_folder"] < len(folders) else None,
+                sort_order=i,
+            )
+            for i in range(options["decks"])
+        )
+
+        request = RequestFactory().get("/decks/")
+        request.user = user
+        view = DecksView()
+        view.setup(request)
+        context = view.get_context_data()
+        context["request"] = request
+
+        fragments = caches["template_fragments"]
+
+        def render_ms():
+            start = time.perf_counter()
+            render_to_string(DecksView.template_name, context, request=request)
+            return (time.perf_counter() - start) * 1000
+
+        # First render also fills the cached template loader.
+        render_to_string(DecksView.template_name, context, request=request)
+
+        cold = []
+        for _ in range(options["repeat"]):
+            fragments.clear()
+            cold.append(render_ms())
+
+        render_ms()  # fill fragment caches
+        warm = [render_ms() for _ in range(options["repeat"])]
+        fragments.clear()
+
+        self.stdout.write(f"decks.html with {options['decks']} decks ({len(folders)} folders):")
+        for label, samples in (("cold fragments (before)", cold), ("warm fragments (after)", warm)):
+            self.stdout.write(
+                f"  {label:<26} median {statistics.median(samples):7.2f} ms"
+                f"   min {min(samples):7.2f} ms"
+            )
@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cards.days import StudyDay
+from cards.models import Card, CardSRS, Deck
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the query plan and run time of the due-card query on one "
+        "large deck: the old LEFT JOIN with OR cardsrs IS NULL against the "
+        "plain due_at range used now that every card has a CardSRS row. All "
+        "test data is created inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cards", type=int, default=100_000)
+        parser.add_argument("--due-fraction", type=float, default=0.05)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, options):
+        user = User.objects.create_user(username="bench-due@example.com")
+        deck = Deck.objects.create(user=user, title="Bench deck")
+
+        Card.objects.bulk_create(
+            (Card(deck=deck, front_text=f"Front {i}", back_text=f"Back {i}") for i in range(options["cards"])),
+            batch_size=5000,
+        )
+
+        # Push most cards into the future so only --due-fraction are due today.
+        now = timezone.now()
+        rng = random.Random(0)
+        srs_rows = list(CardSRS.objects.filter(deck=deck).only("id", "due_at"))
+        for srs in srs_rows:
+            if rng.random() >= options["due_fraction"]:
+                srs.due_at = now + timedelta(days=rng.randint(2, 365))
+        CardSRS.objects.bulk_update(srs_rows, ["due_at"], batch_size=5000)
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE cards_card")
+                cursor.execute("ANALYZE cards_cardsrs")
+
+        day_end = StudyDay(timezone.get_default_timezone()).end
+        cards = Card.objects.filter(deck=deck, status="active")
+        queries = (
+            (
+                "OR IS NULL (before)",
+                cards.filter(Q(cardsrs__due_at__lt=day_end) | Q(cardsrs__isnull=True)),
+            ),
+            ("due_at range (after)", cards.filter(cardsrs__due_at__lt=day_end)),
+        )
+
+        explain_options = {"analyze": True} if connection.vendor == "postgresql" else {}
+        self.stdout.write(f"{options['cards']} cards, {options['due_fraction']:.0%} due ({connection.vendor}):")
+        for label, queryset in queries:
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                count = queryset.count()
+                first = queryset.order_by("created_at").first()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(
+                f"\n== {label}: {count} due, first card {first.id if first else None}, "
+                f"median {statistics.median(timings):.2f} ms, min {min(timings):.2f} ms"
+            )
+            self.stdout.write(queryset.order_by("created_at")[:1].explain(**explain_options))
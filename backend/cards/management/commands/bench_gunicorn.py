@@ -0,0 +1,158 @@
+import http.client
+import json
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from cards.models import Card, Deck
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the review answer endpoint under gunicorn, once per "
+        "worker class (sync vs gthread), using gunicorn.conf.py. The test "
+        "user and deck are committed for the servers to see and deleted "
+        "afterwards. Use a Postgres DATABASE_URL: SQLite serializes writes "
+        "across workers. Several workers also need REDIS_URL, so they share "
+        "the answer throttle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker-classes", default="sync,gthread")
+        parser.add_argument("--workers", type=int, default=None, help="Default: gunicorn.conf.py sizing.")
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--concurrency", type=int, default=16, help="Simultaneous clients.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per worker class.")
+        parser.add_argument("--cards", type=int, default=500)
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username=f"bench-gunicorn-{secrets.token_hex(4)}@example.com")
+        try:
+            deck = Deck.objects.create(user=user, title="Bench deck")
+            Card.objects.bulk_create(
+                Card(deck=deck, front_text=f"Front {i}", back_text=f"Back {i}")
+                for i in range(options["cards"])
+            )
+            card_ids = list(Card.objects.filter(deck=deck).values_list("id", flat=True))
+            session_cookie = self._login_cookie(user)
+
+            for worker_class in options["worker_classes"].split(","):
+                self._bench(worker_class.strip(), deck, card_ids, session_cookie, options)
+        finally:
+            user.delete()
+
+    def _login_cookie(self, user):
+        """Create a logged-in session in the configured backend."""
+
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+    def _bench(self, worker_class, deck, card_ids, session_cookie, options):
+        env = {
+            **os.environ,
+            "WEB_WORKER_CLASS": worker_class,
+            "WEB_THREADS": str(options["threads"]),
+            "PORT": str(options["port"]),
+            # Measure the endpoint itself, not the per-user throttle.
+            "ANSWER_RATE_BURST": "1000000",
+            "ANSWER_RATE_PER_SECOND": "1000000",
+        }
+        if options["workers"]:
+            env["WEB_CONCURRENCY"] = str(options["workers"])
+
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", "nerdeck_project.wsgi",
+                "--config", str(settings.BASE_DIR / "gunicorn.conf.py"),
+                "--bind", f"127.0.0.1:{options['port']}",
+                "--log-level", "warning",
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        try:
+            self._wait_until_up(options["port"])
+            results = self._load(deck, card_ids, session_cookie, options)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        latencies = sorted(latency for latency, ok in results if ok)
+        errors = sum(1 for _, ok in results if not ok)
+        if not latencies:
+            raise CommandError(f"{worker_class}: every request failed.")
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        self.stdout.write(
+            f"{worker_class:<8} {len(latencies) / options['duration']:8.1f} answers/s   "
+            f"p50 {statistics.median(latencies):7.1f} ms   p95 {p95:7.1f} ms   errors {errors}"
+        )
+
+    def _wait_until_up(self, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                connection.request("GET", "/api/health/")
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError("gunicorn did not start.")
+
+    def _load(self, deck, card_ids, session_cookie, options):
+        csrf_token = get_random_string(32)
+        headers = {
+            "Content-Type": "application/json",
+            "Cookie": f"{session_cookie}; {settings.CSRF_COOKIE_NAME}={csrf_token}",
+            "X-CSRFToken": csrf_token,
+        }
+        path = f"/decks/{deck.id}/review/answer/"
+        due_at = (timezone.now() + timedelta(days=1)).isoformat()
+        deadline = time.monotonic() + options["duration"]
+
+        def client(index):
+            # One keep-alive connection per client, like a study tab.
+            connection = http.client.HTTPConnection("127.0.0.1", options["port"], timeout=30)
+            results = []
+            sent = 0
+            while time.monotonic() < deadline:
+                card_id = card_ids[(index + sent * options["concurrency"]) % len(card_ids)]
+                body = json.dumps({"card_id": card_id, "is_right": True, "due_at": due_at})
+                start = time.perf_counter()
+                try:
+                    connection.request(
+                        "POST", path, body=body,
+                        headers={**headers, "Idempotency-Key": secrets.token_hex(8)},
+                    )
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    ok = False
+                results.append(((time.perf_counter() - start) * 1000, ok))
+                sent += 1
+            connection.close()
+            return results
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            return [result for results in pool.map(client, range(options["concurrency"])) for result in results]
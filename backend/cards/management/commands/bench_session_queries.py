@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from cards.models import Deck
+
+
+class _Rollback(Exception):
+    pass
+
+
+CONFIGURATIONS = (
+    (
+        "db + fallback messages (before)",
+        settings.SESSION_BACKENDS["db"],
+        "django.contrib.messages.storage.fallback.FallbackStorage",
+    ),
+    ("db + cookie messages", settings.SESSION_BACKENDS["db"], settings.MESSAGE_STORAGE),
+    ("cached_db + cookie messages", settings.SESSION_BACKENDS["cached_db"], settings.MESSAGE_STORAGE),
+    ("signed_cookies + cookie messages", settings.SESSION_BACKENDS["signed_cookies"], settings.MESSAGE_STORAGE),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the queries per request (total and against django_session) "
+        "on /decks/ and the deck create/rename redirect flows, for each "
+        "session backend and message storage. All test data is created "
+        "inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--decks", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _measure(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            request()
+        sessions = sum("django_session" in query["sql"] for query in queries.captured_queries)
+        return len(queries), sessions
+
+    def _run(self, options):
+        user = User.objects.create_user(username="bench-sessions@example.com")
+        Deck.objects.bulk_create(
+            Deck(user=user, title=f"Deck {i}", sort_order=i) for i in range(options["decks"])
+        )
+        deck = Deck.objects.filter(user=user).first()
+
+        self.stdout.write("queries per request: total (django_session)")
+        for label, engine, storage in CONFIGURATIONS:
+            with override_settings(
+                SESSION_ENGINE=engine,
+                MESSAGE_STORAGE=storage,
+                ALLOWED_HOSTS=["testserver"],
+            ):
+                cache.clear()
+                client = Client()
+                client.force_login(user)
+                client.get("/decks/")  # warm caches and the session
+
+                flows = (
+                    ("GET /decks/", lambda: client.get("/decks/")),
+                    ("create deck", lambda: client.post("/decks/create/", {"title": "Bench deck"})),
+                    ("  -> redirect", lambda: client.get("/decks/")),
+                    ("rename deck", lambda: client.post(
+                        "/decks/rename/", {"deck_id": deck.id, "title": "Renamed"},
+                    )),
+                    ("  -> redirect", lambda: client.get("/decks/")),
+                )
+
+                self.stdout.write(f"\n== {label}")
+                for flow, request in flows:
+                    total, sessions = self._measure(request)
+                    self.stdout.write(f"  {flow:<16} {total:3d} ({sessions})")
@@ -0,0 +1,106 @@
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.test import override_settings
+from django.utils import timezone
+
+from cards.analytics import cached_srs_arrays, load_srs_arrays, srs_statistics
+from cards.days import StudyDay
+from cards.models import Card, CardSRS, Deck
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark whole-collection SRS statistics: loading every CardSRS row "
+        "as model instances versus NumPy column arrays, the vectorized stats "
+        "themselves and the on-disk array cache. All test data is created "
+        "inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cards", type=int, default=1_000_000)
+        parser.add_argument("--decks", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _timed(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return result, statistics.median(samples)
+
+    def _peak_mib(self, func):
+        tracemalloc.start()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del result
+        return peak / 2**20
+
+    def _run(self, options):
+        user = User.objects.create_user(username="bench-stats@example.com")
+        decks = Deck.objects.bulk_create(
+            Deck(user=user, title=f"Deck {i}") for i in range(options["decks"])
+        )
+        Card.objects.bulk_create(
+            (
+                Card(deck=decks[i % len(decks)], front_text=f"Front {i}", back_text=f"Back {i}")
+                for i in range(options["cards"])
+            ),
+            batch_size=10_000,
+        )
+        # Spread intervals, counters and due dates deterministically by id.
+        CardSRS.objects.filter(user=user).update(
+            interval_days=Mod(F("id"), 120),
+            repetitions=Mod(F("id"), 13),
+            lapses=Mod(F("id"), 5),
+            due_at=F("due_at"),
+        )
+        self.stdout.write(f"{options['cards']} SRS rows over {options['decks']} decks:")
+
+        start_of_today = StudyDay(timezone.get_default_timezone()).start
+        repeat = options["repeat"]
+
+        def orm_instances():
+            return list(CardSRS.objects.filter(user=user))
+
+        _, orm_ms = self._timed(orm_instances, repeat)
+        arrays, load_ms = self._timed(lambda: load_srs_arrays(user), repeat)
+        _, stats_ms = self._timed(lambda: srs_statistics(arrays, start_of_today), repeat)
+
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(ANALYTICS_CACHE_DIR=cache_dir):
+            cached_srs_arrays(user)  # write the snapshot
+            _, cached_ms = self._timed(lambda: cached_srs_arrays(user), repeat)
+
+        orm_mib = self._peak_mib(orm_instances)
+        arrays_mib = self._peak_mib(lambda: load_srs_arrays(user))
+
+        rows = (
+            ("model instances (before)", orm_ms, f"peak {orm_mib:8.1f} MiB"),
+            ("NumPy arrays (after)", load_ms, f"peak {arrays_mib:8.1f} MiB, "
+             f"arrays {sum(a.nbytes for a in arrays.values()) / 2**20:.1f} MiB"),
+            ("vectorized statistics", stats_ms, ""),
+            ("cached arrays + stats", cached_ms + stats_ms, "fingerprint query + np.load"),
+        )
+        for label, ms, note in rows:
+            self.stdout.write(f"  {label:<26} median {ms:9.2f} ms   {note}")
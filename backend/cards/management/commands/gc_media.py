@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.deletion import ProtectedError
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from cards.models import CardMedia, Media
+
+
+class Command(BaseCommand):
+    help = "Delete media blobs no card references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=int,
+            default=24,
+            help="Keep unreferenced uploads younger than this (they may still be attached).",
+        )
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Recompute every ref_count from CardMedia before collecting.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            link_counts = (
+                CardMedia.objects.filter(media=OuterRef("pk"))
+                .values("media")
+                .annotate(total=Count("id"))
+                .values("total")
+            )
+            fixed = Media.objects.update(ref_count=Coalesce(Subquery(link_counts), 0))
+            self.stdout.write(f"Recounted references for {fixed} media rows.")
+
+        cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+        candidates = Media.objects.filter(ref_count=0, created_at__lt=cutoff)
+
+        deleted = 0
+        freed = 0
+        for media in candidates.iterator(chunk_size=200):
+            if options["dry_run"]:
+                deleted += 1
+                freed += media.size
+                continue
+
+            try:
+                # Re-check the count in the DELETE itself: a card may have
+                # picked the blob up since the candidate query ran.
+                removed, _ = Media.objects.filter(id=media.id, ref_count=0).delete()
+            except ProtectedError:
+                continue
+            if not removed:
+                continue
+
+            media.file.delete(save=False)
+            if media.thumbnail:
+                media.thumbnail.delete(save=False)
+            deleted += 1
+            freed += media.size
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {deleted} unreferenced media files ({freed} bytes)."
+        ))
@@ -0,0 +1,107 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Runs in a fresh interpreter under -X importtime: each stage is timed from
+# interpreter start, the way a new gunicorn worker (without preload) boots.
+STARTUP_PROBE = r"""
+import io, json, os, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nerdeck_project.settings")
+import django
+from django.conf import settings
+settings.INSTALLED_APPS  # import the settings module
+t1 = time.perf_counter()
+django.setup(set_prefix=False)
+t2 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns  # imports the URLconf and every view module
+t3 = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+application = WSGIHandler()  # loads the middleware chain
+t4 = time.perf_counter()
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": "/api/health/", "QUERY_STRING": "",
+    "SERVER_NAME": "localhost", "SERVER_PORT": "80", "HTTP_HOST": "localhost",
+    "wsgi.input": io.BytesIO(), "wsgi.url_scheme": "http", "wsgi.errors": sys.stderr,
+}
+status = []
+b"".join(application(environ, lambda s, h, *a: status.append(s)))
+t5 = time.perf_counter()
+print(json.dumps({
+    "settings": t1 - t0, "django.setup()": t2 - t1, "URL resolver": t3 - t2,
+    "middleware": t4 - t3, "first request": t5 - t4, "total": t5 - t0,
+    "status": status[0],
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile worker start-up in fresh interpreters: time for settings, "
+        "django.setup(), URL resolver construction, middleware loading and "
+        "the first request, plus the slowest imports from -X importtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to start.")
+        parser.add_argument("--top", type=int, default=20, help="Imports to list.")
+
+    def handle(self, *args, **options):
+        runs = []
+        imports = {}
+        for _ in range(options["repeat"]):
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", STARTUP_PROBE],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+            for module, self_us, cumulative_us, depth in _parse_importtime(result.stderr):
+                imports.setdefault(module, []).append((self_us, cumulative_us, depth))
+
+        self.stdout.write(f"Start-up stages (median of {len(runs)} fresh interpreters):")
+        for stage in ("settings", "django.setup()", "URL resolver", "middleware", "first request", "total"):
+            median_ms = statistics.median(run[stage] for run in runs) * 1000
+            self.stdout.write(f"  {stage:<16} {median_ms:8.1f} ms")
+        self.stdout.write(f"  first response: {runs[0]['status']}")
+
+        def medians(samples):
+            return (
+                statistics.median(sample[0] for sample in samples) / 1000,
+                statistics.median(sample[1] for sample in samples) / 1000,
+                samples[0][2],
+            )
+
+        timings = {module: medians(samples) for module, samples in imports.items()}
+        self.stdout.write(f"\nTop-level imports by cumulative time (top {options['top']}):")
+        top_level = sorted(
+            ((module, timing) for module, timing in timings.items() if timing[2] == 0),
+            key=lambda item: item[1][1],
+            reverse=True,
+        )
+        for module, (_, cumulative_ms, _) in top_level[:options["top"]]:
+            self.stdout.write(f"  {cumulative_ms:8.1f} ms  {module}")
+
+        self.stdout.write(f"\nModules by self time (top {options['top']}):")
+        by_self = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)
+        for module, (self_ms, cumulative_ms, _) in by_self[:options["top"]]:
+            self.stdout.write(f"  {self_ms:8.1f} ms  {module}  (cumulative {cumulative_ms:.1f} ms)")
+
+
+def _parse_importtime(stderr):
+    """Yield (module, self us, cumulative us, nesting depth) per import line."""
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        yield name.strip(), int(self_us), int(cumulative_us), depth
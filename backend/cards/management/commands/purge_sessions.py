@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired database sessions in small batches. Unlike "
+        "clearsessions, no single DELETE holds locks on a large part of "
+        "django_session."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches.",
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith("signed_cookies"):
+            self.stdout.write("Signed-cookie sessions are not stored; nothing to purge.")
+            return
+
+        now = timezone.now()
+        # Indexed range on expire_date; each batch is one DELETE by key.
+        expired = Session.objects.filter(expire_date__lt=now).order_by("expire_date")
+
+        deleted = 0
+        while True:
+            keys = list(expired.values_list("session_key", flat=True)[:options["batch_size"]])
+            if not keys:
+                break
+            removed, _ = Session.objects.filter(session_key__in=keys, expire_date__lt=now).delete()
+            deleted += removed
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(f"Deleted {deleted} expired sessions.")
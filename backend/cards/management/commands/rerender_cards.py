@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from cards.models import Card
+from cards.rendering import RENDER_VERSION
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-render front_html/back_html for cards rendered with an older "
+        "sanitizer allow-list (or for every card with --all)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render every card, not only outdated ones.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of cards rendered and written per UPDATE batch.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # A note's cards render from the note's text (Card.sides()).
+        cards = Card.objects.select_related("note").only(
+            "id", "front_text", "back_text", "content_format", "ordinal", "note",
+        ).order_by("id")
+        if not options["all"]:
+            cards = cards.exclude(render_version=RENDER_VERSION)
+
+        updated = 0
+        last_id = 0
+        while True:
+            # Keyset pagination: each batch starts after the last id we wrote,
+            # so rows leaving the "outdated" filter don't shift the window.
+            batch = list(cards.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+
+            for card in batch:
+                card.render()
+            Card.objects.bulk_update(
+                batch,
+                ["front_html", "back_html", "render_version"],
+            )
+
+            updated += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Rendered {updated} cards...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {updated} cards rendered with version {RENDER_VERSION}."
+        ))
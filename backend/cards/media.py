@@ -0,0 +1,164 @@
+"""Content-addressed storage for card images and audio.
+
+Uploads are hashed while they stream in; a file whose SHA-256 is already
+known is never written twice. Cards reference blobs through CardMedia rows,
+and Media.ref_count mirrors the number of those rows so garbage collection
+is a single indexed lookup (see the gc_media command).
+"""
+
+import hashlib
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.urls import reverse
+
+from .models import CardMedia, Media
+
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+THUMBNAIL_SIZE = (256, 256)
+
+ALLOWED_CONTENT_TYPES = {
+    "image/jpeg": "image",
+    "image/png": "image",
+    "image/gif": "image",
+    "image/webp": "image",
+    "audio/mpeg": "audio",
+    "audio/ogg": "audio",
+    "audio/wav": "audio",
+    "audio/webm": "audio",
+}
+
+# Media URLs embedded in rendered card HTML: /media/<sha256>/
+MEDIA_URL_RE = re.compile(r"/media/([0-9a-f]{64})/")
+
+
+class MediaError(ValueError):
+    """Raised when an upload cannot be stored."""
+
+
+def media_url(media):
+    return reverse("media_file", args=[media.sha256])
+
+
+def thumbnail_url(media):
+    if not media.thumbnail:
+        return ""
+    return reverse("media_thumbnail", args=[media.sha256])
+
+
+def _hash_upload(uploaded_file):
+    """Return the SHA-256 hex digest of an upload, reading it in chunks."""
+
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def _make_thumbnail(uploaded_file):
+    """Return JPEG thumbnail bytes for an image upload (or None)."""
+
+    # Pillow is only needed on the upload path; keep it out of worker boot.
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(uploaded_file) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            buffer = BytesIO()
+            image.convert("RGB").save(buffer, format="JPEG", quality=85)
+    except (UnidentifiedImageError, OSError):
+        return None
+    finally:
+        uploaded_file.seek(0)
+
+    return buffer.getvalue()
+
+
+def store_upload(uploaded_file, user=None):
+    """Store an uploaded file once and return its Media row.
+
+    Re-uploading bytes that already exist returns the existing row without
+    touching storage. Raises MediaError for unsupported or oversized files.
+    """
+
+    kind = ALLOWED_CONTENT_TYPES.get(uploaded_file.content_type)
+    if kind is None:
+        raise MediaError("Only images (JPEG, PNG, GIF, WebP) and audio files are supported.")
+    if uploaded_file.size > MAX_UPLOAD_BYTES:
+        raise MediaError("Files must be 10 MB or smaller.")
+
+    sha256 = _hash_upload(uploaded_file)
+    existing = Media.objects.filter(sha256=sha256).first()
+    if existing is not None:
+        return existing
+
+    media = Media(
+        sha256=sha256,
+        kind=kind,
+        content_type=uploaded_file.content_type,
+        size=uploaded_file.size,
+        uploaded_by=user,
+    )
+    media.file.save(uploaded_file.name, uploaded_file, save=False)
+
+    if kind == "image":
+        thumbnail = _make_thumbnail(uploaded_file)
+        if thumbnail is not None:
+            media.thumbnail.save("thumbnail.jpg", ContentFile(thumbnail), save=False)
+
+    try:
+        with transaction.atomic():
+            media.save()
+    except IntegrityError:
+        # A concurrent upload of the same bytes won the race; reuse its row.
+        # The files written above were saved under names of their own (the
+        # storage never overwrites), so drop them rather than orphan them.
+        media.file.delete(save=False)
+        if media.thumbnail:
+            media.thumbnail.delete(save=False)
+        return Media.objects.get(sha256=sha256)
+
+    return media
+
+
+def referenced_hashes(*html_fragments):
+    """Return the set of media hashes embedded in rendered HTML."""
+
+    hashes = set()
+    for html in html_fragments:
+        hashes.update(MEDIA_URL_RE.findall(html or ""))
+    return hashes
+
+
+def sync_card_media(card):
+    """Make the card's CardMedia rows match the media its HTML embeds.
+
+    Adding a link increments Media.ref_count here; removing one decrements it
+    through the CardMedia post_delete signal, which also covers cascades.
+    """
+
+    wanted = referenced_hashes(card.front_html, card.back_html)
+    current = dict(
+        CardMedia.objects.filter(card=card).values_list("media__sha256", "id")
+    )
+    if not wanted and not current:
+        return
+
+    with transaction.atomic():
+        stale_ids = [link_id for sha, link_id in current.items() if sha not in wanted]
+        if stale_ids:
+            CardMedia.objects.filter(id__in=stale_ids).delete()
+
+        new_media_ids = list(
+            Media.objects.filter(sha256__in=wanted - current.keys()).values_list("id", flat=True)
+        )
+        if new_media_ids:
+            CardMedia.objects.bulk_create(
+                [CardMedia(card=card, media_id=media_id) for media_id in new_media_ids]
+            )
+            Media.objects.filter(id__in=new_media_ids).update(ref_count=F("ref_count") + 1)
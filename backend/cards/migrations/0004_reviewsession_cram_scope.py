@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_deck_sort_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewsession',
+            name='deck',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='cards.deck'),
+        ),
+        migrations.AddField(
+            model_name='reviewsession',
+            name='folder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='cards.folder'),
+        ),
+        migrations.AddField(
+            model_name='reviewsession',
+            name='order',
+            field=models.CharField(choices=[('due', 'Due date'), ('random', 'Random'), ('weakest', 'Weakest first')], default='due', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='reviewsession',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reviewsession',
+            name='seed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0004_reviewsession_cram_scope'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewsession',
+            name='deck_turns',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['deck', 'status'], name='card_deck_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cardsrs',
+            index=models.Index(fields=['due_at'], name='cardsrs_due_at_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:19
+
+from django.db import migrations, models
+
+
+def render_existing_cards(apps, schema_editor):
+    """Render the HTML columns for cards created before they existed."""
+    from cards.rendering import RENDER_VERSION, render_content
+
+    Card = apps.get_model("cards", "Card")
+    batch = []
+    for card in Card.objects.only("id", "front_text", "back_text").iterator(chunk_size=500):
+        card.front_html = render_content(card.front_text, "plain")
+        card.back_html = render_content(card.back_text, "plain")
+        card.render_version = RENDER_VERSION
+        batch.append(card)
+        if len(batch) >= 500:
+            Card.objects.bulk_update(batch, ["front_html", "back_html", "render_version"])
+            batch = []
+    if batch:
+        Card.objects.bulk_update(batch, ["front_html", "back_html", "render_version"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0005_folder_study_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='back_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='content_format',
+            field=models.CharField(choices=[('plain', 'Plain text'), ('markdown', 'Markdown'), ('html', 'HTML')], default='plain', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='front_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='render_version',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+        migrations.RunPython(render_existing_cards, migrations.RunPython.noop),
+    ]
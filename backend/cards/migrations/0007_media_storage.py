@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:21
+
+import cards.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0006_card_rendered_html'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Media',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('kind', models.CharField(choices=[('image', 'Image'), ('audio', 'Audio')], max_length=10)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.PositiveBigIntegerField()),
+                ('file', models.FileField(upload_to=cards.models.media_upload_path)),
+                ('thumbnail', models.FileField(blank=True, upload_to=cards.models.media_thumbnail_path)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'media',
+            },
+        ),
+        migrations.CreateModel(
+            name='CardMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cards.card')),
+                ('media', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='cards.media')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='media',
+            field=models.ManyToManyField(blank=True, through='cards.CardMedia', to='cards.media'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(condition=models.Q(('ref_count', 0)), fields=['created_at'], name='media_unreferenced_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cardmedia',
+            constraint=models.UniqueConstraint(fields=('card', 'media'), name='unique_card_media'),
+        ),
+    ]
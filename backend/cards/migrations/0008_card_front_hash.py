@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:22
+
+from django.db import migrations, models
+
+
+def hash_existing_fronts(apps, schema_editor):
+    """Fill front_hash for cards created before the column existed."""
+    from cards.fingerprints import front_text_hash
+
+    Card = apps.get_model("cards", "Card")
+    batch = []
+    for card in Card.objects.only("id", "front_text").iterator(chunk_size=1000):
+        card.front_hash = front_text_hash(card.front_text)
+        batch.append(card)
+        if len(batch) >= 1000:
+            Card.objects.bulk_update(batch, ["front_hash"])
+            batch = []
+    if batch:
+        Card.objects.bulk_update(batch, ["front_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0007_media_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='front_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.RunPython(hash_existing_fronts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['front_hash', 'deck'], name='card_front_hash_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0009_deck_folder_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardsrs',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:30
+
+from django.db import migrations
+
+
+def create_missing_srs_rows(apps, schema_editor):
+    """Give cards that were never answered a CardSRS row, due at creation."""
+    Card = apps.get_model("cards", "Card")
+    CardSRS = apps.get_model("cards", "CardSRS")
+
+    missing = (
+        Card.objects.filter(cardsrs__isnull=True)
+        .values_list("id", "created_at")
+        .order_by("id")
+    )
+    batch = []
+    for card_id, created_at in missing.iterator(chunk_size=5000):
+        batch.append(CardSRS(card_id=card_id, due_at=created_at))
+        if len(batch) >= 5000:
+            CardSRS.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        CardSRS.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0010_cardsrs_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_srs_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:10
+
+import cards.models
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0011_eager_cardsrs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timezone', models.CharField(default='UTC', max_length=64, validators=[cards.models.validate_timezone])),
+                ('day_rollover_hour', models.PositiveSmallIntegerField(default=0, help_text='Local hour at which a new study day starts.', validators=[django.core.validators.MaxValueValidator(23)])),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_srs_owner(apps, schema_editor):
+    """Copy each SRS row's user and deck from its card, in id batches."""
+    Card = apps.get_model("cards", "Card")
+    CardSRS = apps.get_model("cards", "CardSRS")
+
+    card = Card.objects.filter(id=OuterRef("card_id"))
+    batch_size = 10000
+    last_id = CardSRS.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    for start in range(0, last_id, batch_size):
+        CardSRS.objects.filter(id__gt=start, id__lte=start + batch_size).update(
+            deck_id=Subquery(card.values("deck_id")[:1]),
+            user_id=Subquery(card.values("deck__user_id")[:1]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0012_user_profile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='origin',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='copies', to='cards.card'),
+        ),
+        migrations.AddField(
+            model_name='cardsrs',
+            name='deck',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='card_states', to='cards.deck'),
+        ),
+        migrations.AddField(
+            model_name='cardsrs',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='is_public',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='source_deck',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='subscriptions', to='cards.deck'),
+        ),
+        migrations.RunPython(fill_srs_owner, migrations.RunPython.noop),
+    ]
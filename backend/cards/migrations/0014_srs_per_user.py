@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0013_shared_library'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cardsrs',
+            name='cardsrs_due_at_idx',
+        ),
+        migrations.AlterField(
+            model_name='cardsrs',
+            name='deck',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='card_states', to='cards.deck'),
+        ),
+        migrations.AlterField(
+            model_name='cardsrs',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='cardsrs',
+            name='card',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cards.card'),
+        ),
+        migrations.AddIndex(
+            model_name='cardsrs',
+            index=models.Index(fields=['user', 'due_at'], name='cardsrs_user_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cardsrs',
+            index=models.Index(fields=['deck', 'due_at'], name='cardsrs_deck_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['title'], name='deck_public_title_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cardsrs',
+            constraint=models.UniqueConstraint(fields=('card', 'user'), name='unique_card_user_srs'),
+        ),
+        migrations.AddConstraint(
+            model_name='deck',
+            constraint=models.UniqueConstraint(condition=models.Q(('source_deck__isnull', False)), fields=('user', 'source_deck'), name='unique_deck_subscription'),
+        ),
+    ]
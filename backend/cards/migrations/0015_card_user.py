@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_card_owner(apps, schema_editor):
+    """Copy each card's owner from its deck, in id batches."""
+    Card = apps.get_model("cards", "Card")
+    Deck = apps.get_model("cards", "Deck")
+
+    owner = Deck.objects.filter(id=OuterRef("deck_id")).values("user_id")[:1]
+    batch_size = 10000
+    last_id = Card.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    for start in range(0, last_id, batch_size):
+        Card.objects.filter(id__gt=start, id__lte=start + batch_size).update(
+            user_id=Subquery(owner),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0014_srs_per_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_card_owner, migrations.RunPython.noop),
+    ]
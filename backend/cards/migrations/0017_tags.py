@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0016_card_user_not_null'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewsession',
+            name='tag_expression',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64)),
+                ('card_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CardTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cards.card')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cards.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='cards', through='cards.CardTag', to='cards.tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_user_tag_name'),
+        ),
+        migrations.AddIndex(
+            model_name='cardtag',
+            index=models.Index(fields=['tag', 'card'], name='cardtag_tag_card_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cardtag',
+            constraint=models.UniqueConstraint(fields=('card', 'tag'), name='unique_card_tag'),
+        ),
+    ]
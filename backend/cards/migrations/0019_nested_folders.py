@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_self_links(apps, schema_editor):
+    """Give every existing (top-level) folder its depth-0 closure row."""
+    Folder = apps.get_model("cards", "Folder")
+    FolderClosure = apps.get_model("cards", "FolderClosure")
+
+    batch = []
+    for folder_id in Folder.objects.values_list("id", flat=True).iterator(chunk_size=5000):
+        batch.append(FolderClosure(ancestor_id=folder_id, descendant_id=folder_id, depth=0))
+        if len(batch) == 5000:
+            FolderClosure.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        FolderClosure.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0018_notes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='cards.folder'),
+        ),
+        migrations.CreateModel(
+            name='FolderClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='cards.folder')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='cards.folder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='folderclosure_descendant_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_folder_closure')],
+            },
+        ),
+        migrations.RunPython(fill_self_links, migrations.RunPython.noop),
+    ]
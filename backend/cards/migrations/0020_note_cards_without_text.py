@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-19 20:10
+
+from django.db import migrations
+
+
+def clear_note_card_text(apps, schema_editor):
+    """Drop the text copies on note cards; Card.sides() reads the note now."""
+    Card = apps.get_model("cards", "Card")
+    note_cards = Card.objects.filter(note__isnull=False).exclude(front_text="", back_text="")
+    last_id = 0
+    while True:
+        ids = list(
+            note_cards.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:5000]
+        )
+        if not ids:
+            break
+        Card.objects.filter(id__in=ids).update(front_text="", back_text="")
+        last_id = ids[-1]
+
+
+def restore_note_card_text(apps, schema_editor):
+    """Copy each note's generated text back onto its cards."""
+    from cards.notes import card_sides
+
+    Card = apps.get_model("cards", "Card")
+    batch = []
+    cards = Card.objects.filter(note__isnull=False).select_related("note").only(
+        "id", "ordinal", "note",
+    )
+    for card in cards.iterator(chunk_size=1000):
+        card.front_text, card.back_text = card_sides(card.note).get(card.ordinal, ("", ""))
+        batch.append(card)
+        if len(batch) >= 1000:
+            Card.objects.bulk_update(batch, ["front_text", "back_text"])
+            batch = []
+    if batch:
+        Card.objects.bulk_update(batch, ["front_text", "back_text"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0019_nested_folders'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_note_card_text, restore_note_card_text),
+    ]
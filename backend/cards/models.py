@@ -1,19 +1,189 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from django.contrib.auth.models import User
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator
+from django.db import models, transaction
 from django.utils import timezone
 
+from .fingerprints import front_text_hash
+from .rendering import RENDER_VERSION, render_content
+
+
+def validate_timezone(value):
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"Unknown time zone: {value}")
+
+
+class UserProfile(models.Model):
+    """
+    Per-user study preferences.
+
+    `timezone` and `day_rollover_hour` decide when the user's study day
+    starts (see cards/days.py); users without a profile get the server time
+    zone and a midnight rollover.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
+    timezone = models.CharField(max_length=64, default="UTC", validators=[validate_timezone])
+    day_rollover_hour = models.PositiveSmallIntegerField(
+        default=0,
+        validators=[MaxValueValidator(23)],
+        help_text="Local hour at which a new study day starts.",
+    )
+
+    def __str__(self):
+        return f"{self.user.username} ({self.timezone})"
+
 
 class Folder(models.Model):
+    """
+    A user's folder of decks; folders nest (Subject > Course > Chapter).
+
+    ``parent`` is the tree itself. FolderClosure holds every (ancestor,
+    descendant) pair of it, kept in step by save(), so subtree and ancestor
+    questions are one indexed lookup whatever the depth.
+    """
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="children",
+    )
     name = models.CharField(max_length=255)
     sort_order = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Version for the cached folder row on decks.html.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        folder = super().from_db(db, field_names, values)
+        # The stored parent, so save() can tell when the folder moves.
+        folder._stored_parent_id = folder.__dict__.get("parent_id")
+        return folder
+
+    def clean(self):
+        if self.pk and self.parent_id and FolderClosure.objects.filter(
+            ancestor_id=self.pk, descendant_id=self.parent_id,
+        ).exists():
+            raise ValidationError({"parent": "A folder cannot be moved inside itself."})
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        moved = (
+            not adding
+            and (update_fields is None or "parent" in update_fields)
+            and getattr(self, "_stored_parent_id", self.parent_id) != self.parent_id
+        )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                FolderClosure.objects.attach(self)
+            elif moved:
+                FolderClosure.objects.move([self.id], self.parent_id)
+        self._stored_parent_id = self.parent_id
 
     def __str__(self):
         return f"{self.user.username} - {self.name}"
 
 
+class FolderClosureManager(models.Manager):
+    def attach(self, folder):
+        """Insert the rows of a new folder: itself and its parent's ancestors."""
+
+        rows = [FolderClosure(ancestor=folder, descendant=folder, depth=0)]
+        if folder.parent_id:
+            rows.extend(
+                FolderClosure(ancestor_id=ancestor_id, descendant=folder, depth=depth + 1)
+                for ancestor_id, depth in self.filter(descendant_id=folder.parent_id).values_list(
+                    "ancestor_id", "depth"
+                )
+            )
+        self.bulk_create(rows)
+
+    def move(self, folder_ids, parent_id):
+        """Hang the subtrees rooted at ``folder_ids`` under ``parent_id``.
+
+        ``parent_id`` None moves them to the top level; the subtrees must be
+        disjoint. Links from the old ancestors are dropped and links from the
+        new ones inserted (each subtree pair combined with each new ancestor),
+        so a move takes the same four queries at any depth or subtree size.
+        Raises ValueError if ``parent_id`` lies inside one of the subtrees.
+        """
+
+        pairs = list(
+            self.filter(ancestor_id__in=folder_ids).values_list("descendant_id", "depth")
+        )
+        descendant_ids = [descendant_id for descendant_id, _ in pairs]
+        if parent_id in descendant_ids:
+            raise ValueError("A folder cannot be moved inside itself.")
+
+        new_ancestors = []
+        if parent_id is not None:
+            new_ancestors = list(
+                self.filter(descendant_id=parent_id).values_list("ancestor_id", "depth")
+            )
+
+        with transaction.atomic():
+            self.filter(descendant_id__in=descendant_ids).exclude(
+                ancestor_id__in=descendant_ids
+            ).delete()
+            self.bulk_create(
+                [
+                    FolderClosure(
+                        ancestor_id=ancestor_id,
+                        descendant_id=descendant_id,
+                        depth=ancestor_depth + 1 + depth,
+                    )
+                    for ancestor_id, ancestor_depth in new_ancestors
+                    for descendant_id, depth in pairs
+                ],
+                batch_size=5000,
+            )
+
+
+class FolderClosure(models.Model):
+    """One (ancestor, descendant) pair of the folder tree, ``depth`` apart.
+
+    Every folder is its own ancestor at depth 0, so "the folder and
+    everything under it" is ``filter(ancestor=folder)``.
+    """
+
+    ancestor = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveSmallIntegerField()
+
+    objects = FolderClosureManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["ancestor", "descendant"], name="unique_folder_closure"),
+        ]
+        indexes = [
+            models.Index(fields=["descendant", "depth"], name="folderclosure_descendant_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
 class Deck(models.Model):
+    """
+    A user's deck.
+
+    A deck with `source_deck` set is a subscription to someone else's public
+    deck: it holds no copies of the source cards, only the subscriber's
+    CardSRS rows pointing at them, plus the subscriber's own cards (including
+    private copies of source cards they edited, see Card.origin).
+    """
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     folder = models.ForeignKey(
         Folder,
@@ -25,22 +195,196 @@ class Deck(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     is_archived = models.BooleanField(default=False)
+    # Listed in the shared library; other users can subscribe to it.
+    is_public = models.BooleanField(default=False)
+    source_deck = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="subscriptions",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Version for the cached deck row on decks.html.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "source_deck"],
+                condition=models.Q(source_deck__isnull=False),
+                name="unique_deck_subscription",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["title"],
+                condition=models.Q(is_public=True),
+                name="deck_public_title_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if not kwargs.get("force_insert") and (update_fields is None or "user" in update_fields):
+            # Cards and SRS rows carry a copy of the owner (Card.user,
+            # CardSRS.user); follow the deck when it changes hands.
+            Card.objects.filter(deck=self).exclude(user_id=self.user_id).update(user_id=self.user_id)
+            Note.objects.filter(deck=self).exclude(user_id=self.user_id).update(user_id=self.user_id)
+            CardSRS.objects.filter(deck=self).exclude(user_id=self.user_id).update(user_id=self.user_id)
 
     def __str__(self):
         return f"{self.title}"
 
 
+def media_upload_path(instance, filename):
+    """Store blobs under their hash, fanned out by the first two hex digits."""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else "bin"
+    return f"media/{instance.sha256[:2]}/{instance.sha256}.{extension}"
+
+
+def media_thumbnail_path(instance, filename):
+    return f"thumbs/{instance.sha256[:2]}/{instance.sha256}.jpg"
+
+
+class Media(models.Model):
+    """
+    A content-addressed file shared by every card that embeds it.
+
+    The same upload is stored once (keyed by its SHA-256). ref_count tracks
+    how many cards reference the blob; unreferenced blobs are removed by
+    `manage.py gc_media`.
+    """
+
+    KIND_CHOICES = [
+        ("image", "Image"),
+        ("audio", "Audio"),
+    ]
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField()
+    file = models.FileField(upload_to=media_upload_path)
+    thumbnail = models.FileField(upload_to=media_thumbnail_path, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    uploaded_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "media"
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(ref_count=0),
+                name="media_unreferenced_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.sha256[:12]} ({self.ref_count} refs)"
+
+
+class Tag(models.Model):
+    """A user's label for cards, with the number of cards carrying it.
+
+    Tags are personal: a user can tag any card they study, subscribed ones
+    included. ``card_count`` mirrors the tag's CardTag rows (see
+    tags.set_card_tags and signals.release_tag), so the per-user tag list
+    never counts at read time.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tags")
+    name = models.CharField(max_length=64)
+    card_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "name"], name="unique_user_tag_name"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.card_count} cards)"
+
+
+class CardQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Bulk-insert cards the way save() would, SRS rows included.
+
+        bulk_create skips save() and signals, so rendering, front hashes and
+        the eager CardSRS row (see signals.create_card_srs) happen here.
+        """
+
+        objs = list(objs)
+        owners = dict(
+            Deck.objects.filter(id__in={card.deck_id for card in objs}).values_list("id", "user_id")
+        )
+        for card in objs:
+            card.render()
+            card.user_id = owners.get(card.deck_id)
+
+        cards = super().bulk_create(objs, *args, **kwargs)
+        CardSRS.objects.create_for_cards(cards)
+        return cards
+
+
 class Card(models.Model):
     STATUS_CHOICES = [
         ("active", "Active"),
         ("suspended", "Suspended"),
         ("archived", "Archived"),
     ]
+    FORMAT_CHOICES = [
+        ("plain", "Plain text"),
+        ("markdown", "Markdown"),
+        ("html", "HTML"),
+    ]
 
     deck = models.ForeignKey(Deck, on_delete=models.CASCADE)
+    # Copy of deck.user, so ownership checks and per-user queries stay on
+    # this table. Set from the deck on save (see Deck.save for moves).
+    user = models.ForeignKey(User, on_delete=models.CASCADE, editable=False)
+    # Empty on a note's cards: their text is generated from the note (see
+    # sides()), and only the rendered HTML below is stored.
     front_text = models.TextField()
     back_text = models.TextField()
+    content_format = models.CharField(
+        max_length=10,
+        choices=FORMAT_CHOICES,
+        default="plain",
+    )
+    # Sanitized HTML rendered from the text fields on save (see rendering.py).
+    front_html = models.TextField(blank=True, editable=False)
+    back_html = models.TextField(blank=True, editable=False)
+    render_version = models.CharField(max_length=16, blank=True, editable=False)
+    # Hash of the case-folded, whitespace-collapsed front (duplicate lookups).
+    front_hash = models.CharField(max_length=32, blank=True, editable=False)
+    media = models.ManyToManyField(Media, through="CardMedia", blank=True)
+    tags = models.ManyToManyField(Tag, through="CardTag", blank=True, related_name="cards")
+    # The note the card was generated from, and which of its cards it is
+    # (0 for a basic card's front, 1 for the reverse, N for cloze cN).
+    note = models.ForeignKey(
+        "Note",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="cards",
+    )
+    ordinal = models.PositiveSmallIntegerField(default=0)
+    # Set on a subscriber's private copy of a shared card (copy-on-write).
+    origin = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="copies",
+    )
     status = models.CharField(
         max_length=10,
         choices=STATUS_CHOICES,
@@ -49,38 +393,266 @@ class Card(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["note", "ordinal"], name="unique_note_card_ordinal"),
+        ]
+        indexes = [
+            models.Index(fields=["deck", "status"], name="card_deck_status_idx"),
+            models.Index(fields=["user", "front_hash"], name="card_user_front_hash_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        card = super().from_db(db, field_names, values)
+        # The stored deck, so save() can tell when the card moves.
+        card._stored_deck_id = card.__dict__.get("deck_id")
+        return card
+
+    def sides(self):
+        """Return the card's (front text, back text).
+
+        A note's card stores no text of its own; it is generated from the
+        note on demand (notes.card_sides), so select_related("note") when
+        reading the text of many cards.
+        """
+        if self.note_id is None:
+            return self.front_text, self.back_text
+        from .notes import card_sides
+
+        return card_sides(self.note).get(self.ordinal, ("", ""))
+
+    def render(self, sides=None):
+        """Refresh front_html/back_html and front_hash from the card's text."""
+        front, back = sides or self.sides()
+        self.front_html = render_content(front, self.content_format)
+        self.back_html = render_content(back, self.content_format)
+        self.render_version = RENDER_VERSION
+        self.front_hash = front_text_hash(front)
+
+    def save(self, *args, **kwargs):
+        self.render()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "deck" in update_fields:
+            self.user_id = self.deck.user_id
+        if update_fields is not None:
+            kwargs["update_fields"] = {
+                *update_fields, "front_html", "back_html", "render_version", "front_hash",
+                *(("user",) if "deck" in update_fields else ()),
+            }
+        moved_from = None if self._state.adding else getattr(self, "_stored_deck_id", None)
+        super().save(*args, **kwargs)
+        if moved_from is not None and moved_from != self.deck_id:
+            CardSRS.objects.follow_move([self], moved_from)
+        self._stored_deck_id = self.deck_id
+
     def __str__(self):
-        front_preview = (self.front_text or "").strip().replace("\n", " ")
+        front_preview = (self.sides()[0] or "").strip().replace("\n", " ")
         if len(front_preview) > 40:
             front_preview = front_preview[:40] + "..."
         return f"{self.deck.title} - {front_preview}"
 
 
+class Note(models.Model):
+    """The text a user writes once, from which one or more cards are made.
+
+    "basic" makes one card, "basic_reverse" a front->back and a back->front
+    card, and "cloze" one card per ``{{c1::...}}`` deletion in the front
+    text (``back_text`` is then extra text shown on every back). Cards are
+    generated and kept in step by notes.sync_note_cards; Card.ordinal says
+    which card of the note each one is.
+    """
+
+    KIND_CHOICES = [
+        ("basic", "Basic"),
+        ("basic_reverse", "Basic and reversed"),
+        ("cloze", "Cloze"),
+    ]
+
+    deck = models.ForeignKey(Deck, on_delete=models.CASCADE)
+    # Copy of deck.user, like Card.user.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, editable=False)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default="basic")
+    front_text = models.TextField()
+    back_text = models.TextField(blank=True)
+    content_format = models.CharField(
+        max_length=10,
+        choices=Card.FORMAT_CHOICES,
+        default="plain",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "deck" in update_fields:
+            self.user_id = self.deck.user_id
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        front_preview = (self.front_text or "").strip().replace("\n", " ")
+        if len(front_preview) > 40:
+            front_preview = front_preview[:40] + "..."
+        return f"{self.get_kind_display()} - {front_preview}"
+
+
+class CardMedia(models.Model):
+    """A card embedding a media blob; each row holds one Media reference."""
+
+    card = models.ForeignKey(Card, on_delete=models.CASCADE)
+    media = models.ForeignKey(Media, on_delete=models.PROTECT)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["card", "media"], name="unique_card_media"),
+        ]
+
+    def __str__(self):
+        return f"{self.card_id} -> {self.media.sha256[:12]}"
+
+
+class CardTag(models.Model):
+    """One tag on one card; each row counts once in Tag.card_count."""
+
+    card = models.ForeignKey(Card, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["card", "tag"], name="unique_card_tag"),
+        ]
+        indexes = [
+            # Tag filters go from a tag to its cards (see tags.tag_filter).
+            models.Index(fields=["tag", "card"], name="cardtag_tag_card_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.card_id} -> {self.tag_id}"
+
+
+class CardSRSManager(models.Manager):
+    def create_for_cards(self, cards):
+        """Insert the SRS rows new cards need, due at their creation time.
+
+        Every card gets a row for its deck's owner and one for each
+        subscriber of that deck, studied in the subscriber's linked deck.
+        """
+
+        cards = [card for card in cards if card.pk]
+        deck_ids = {card.deck_id for card in cards}
+        if not deck_ids:
+            return
+
+        owners = {}
+        subscribers = {}
+        for deck_id, user_id, source_deck_id in Deck.objects.filter(
+            models.Q(id__in=deck_ids) | models.Q(source_deck_id__in=deck_ids)
+        ).values_list("id", "user_id", "source_deck_id"):
+            if deck_id in deck_ids:
+                owners[deck_id] = user_id
+            if source_deck_id in deck_ids:
+                subscribers.setdefault(source_deck_id, []).append((deck_id, user_id))
+
+        rows = []
+        for card in cards:
+            studied_in = [(card.deck_id, owners[card.deck_id]), *subscribers.get(card.deck_id, ())]
+            rows.extend(
+                CardSRS(card=card, user_id=user_id, deck_id=deck_id, due_at=card.created_at)
+                for deck_id, user_id in studied_in
+            )
+        self.bulk_create(rows, batch_size=5000, ignore_conflicts=True)
+
+    def follow_move(self, cards, from_deck_id):
+        """Move the SRS rows of ``cards``, just moved together out of ``from_deck_id``.
+
+        Every row follows the cards: the owner's to the new deck (and owner),
+        a subscriber's to their linked deck of the new deck. Subscribers of
+        the old deck only lose the cards; subscribers of the new one get
+        their rows from create_for_cards, as for new cards.
+        """
+
+        deck_id, user_id = cards[0].deck_id, cards[0].user_id
+        states = self.filter(card__in=cards)
+        states.filter(deck_id=from_deck_id).update(deck_id=deck_id, user_id=user_id)
+        linked = Deck.objects.filter(source_deck_id=deck_id, user_id=models.OuterRef("user_id"))
+        others = states.exclude(deck_id=deck_id)
+        others.exclude(models.Exists(linked)).delete()
+        others.update(deck_id=models.Subquery(linked.values("id")[:1]))
+        self.create_for_cards(cards)
+
+
 class CardSRS(models.Model):
     """
-    One-to-one relationship with Card.
-    Each card has exactly one SRS state.
+    One user's SRS state for one card.
+
+    Rows are created together with the card (due at its creation time), so
+    due queries are a plain range on due_at. `deck` is the deck the user
+    studies the card in: the card's own deck, or for a shared card the
+    subscriber's linked deck. All study queues filter on (user, deck,
+    due_at) here and join the card only for its content.
     """
 
-    card = models.OneToOneField(Card, on_delete=models.CASCADE)
+    card = models.ForeignKey(Card, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    deck = models.ForeignKey(Deck, on_delete=models.CASCADE, related_name="card_states")
     due_at = models.DateTimeField()
     interval_days = models.IntegerField(default=0)
     ease_factor = models.FloatField(default=2.5)
     repetitions = models.IntegerField(default=0)
     lapses = models.IntegerField(default=0)
     last_reviewed_at = models.DateTimeField(null=True, blank=True)
+    # Bumped by every answer; clients send it back for compare-and-set.
+    version = models.PositiveIntegerField(default=0)
+
+    objects = CardSRSManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["card", "user"], name="unique_card_user_srs"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "due_at"], name="cardsrs_user_due_idx"),
+            models.Index(fields=["deck", "due_at"], name="cardsrs_deck_due_idx"),
+        ]
 
     def __str__(self):
         return f"{self.card} - due {self.due_at:%Y-%m-%d %H:%M}"
 
 
 class ReviewSession(models.Model):
+    """
+    A single study run over a deck or a folder.
+
+    Cram sessions never touch CardSRS. Their card order comes from `seed`
+    (a server-side permutation) and `position` is the offset of the current
+    card inside that permutation, so no list of card ids is ever stored.
+    """
+
     MODE_CHOICES = [
         ("review", "Review"),
         ("cram", "Cram"),
     ]
+    ORDER_CHOICES = [
+        ("due", "Due date"),
+        ("random", "Random"),
+        ("weakest", "Weakest first"),
+    ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    deck = models.ForeignKey(
+        Deck,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    folder = models.ForeignKey(
+        Folder,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
     started_at = models.DateTimeField(default=timezone.now)
     ended_at = models.DateTimeField(null=True, blank=True)
     mode = models.CharField(
@@ -88,6 +660,18 @@ class ReviewSession(models.Model):
         choices=MODE_CHOICES,
         default="review",
     )
+    order = models.CharField(
+        max_length=10,
+        choices=ORDER_CHOICES,
+        default="due",
+    )
+    seed = models.PositiveIntegerField(default=0)
+    position = models.PositiveIntegerField(default=0)
+    # Cards already served per deck ({deck_id: count}) in multi-deck review
+    # sessions, so the interleaved queue keeps rotating between decks.
+    deck_turns = models.JSONField(default=dict, blank=True)
+    # Optional tag expression narrowing the session (see tags.tag_filter).
+    tag_expression = models.CharField(max_length=255, blank=True)
 
     def __str__(self):
         if self.ended_at:
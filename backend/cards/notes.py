@@ -0,0 +1,214 @@
+"""Generating cards from notes.
+
+A note is written once; its cards are derived from it. ``card_sides``
+turns a note into {ordinal: (front text, back text)} and the functions
+below make the note's Card rows match that mapping: new notes get all their
+cards from one bulk_create, and an edited note is diffed against its cards
+so only the ordinals whose rendered sides changed are updated (one
+bulk_update), new cloze deletions are inserted and removed ones deleted.
+Untouched cards keep their rows, and with them their SRS history.
+
+The cards don't copy the text: they store the rendered HTML (and front
+hash) only, and Card.sides() generates the text from the note on demand.
+"""
+
+import re
+
+from django.db import transaction
+from django.utils import timezone
+
+from .media import referenced_hashes, sync_card_media
+from .models import Card, CardSRS, Deck, Note
+
+
+# {{c1::answer}} or {{c1::answer::hint}}
+CLOZE_RE = re.compile(r"\{\{c(\d+)::(.+?)(?:::(.*?))?\}\}", re.DOTALL)
+MAX_CLOZE_ORDINAL = 100
+NOTE_BATCH_SIZE = 1000
+
+# The revealed deletion on the back of a cloze card, per content format.
+CLOZE_ANSWER_FORMATS = {
+    "plain": "{}",
+    "markdown": "**{}**",
+    "html": "<b>{}</b>",
+}
+
+# Card fields refreshed when a note's text (or deck) changes.
+SYNCED_FIELDS = [
+    "content_format", "front_html", "back_html", "render_version", "front_hash",
+    "deck", "user", "updated_at",
+]
+
+
+class NoteError(ValueError):
+    """Raised when a note cannot produce any card."""
+
+
+def cloze_ordinals(text):
+    """Return the sorted cloze numbers used in ``text``."""
+
+    ordinals = sorted({int(match.group(1)) for match in CLOZE_RE.finditer(text or "")})
+    if ordinals and not 1 <= ordinals[0] <= ordinals[-1] <= MAX_CLOZE_ORDINAL:
+        raise NoteError(f"Cloze numbers go from c1 to c{MAX_CLOZE_ORDINAL}.")
+    return ordinals
+
+
+def _cloze_side(note, ordinal, reveal):
+    answer_format = CLOZE_ANSWER_FORMATS[note.content_format]
+
+    def replace(match):
+        answer, hint = match.group(2), match.group(3)
+        if int(match.group(1)) != ordinal:
+            return answer
+        if reveal:
+            return answer_format.format(answer)
+        return f"[{hint or '...'}]"
+
+    return CLOZE_RE.sub(replace, note.front_text)
+
+
+def card_sides(note):
+    """Return {ordinal: (front text, back text)} for the note's cards."""
+
+    if note.kind != "cloze" and not note.back_text.strip():
+        raise NoteError("Basic notes need a back.")
+    if note.kind == "basic":
+        return {0: (note.front_text, note.back_text)}
+    if note.kind == "basic_reverse":
+        return {0: (note.front_text, note.back_text), 1: (note.back_text, note.front_text)}
+
+    ordinals = cloze_ordinals(note.front_text)
+    if not ordinals:
+        raise NoteError("A cloze note needs at least one deletion such as {{c1::answer}}.")
+    sides = {}
+    for ordinal in ordinals:
+        back = _cloze_side(note, ordinal, reveal=True)
+        if note.back_text:
+            back = f"{back}\n\n{note.back_text}"
+        sides[ordinal] = (_cloze_side(note, ordinal, reveal=False), back)
+    return sides
+
+
+def _link_media(new_cards):
+    # bulk_create skips the post_save signal that links media.
+    for card in new_cards:
+        if card.pk and referenced_hashes(card.front_html, card.back_html):
+            sync_card_media(card)
+
+
+def card_fronts(cards):
+    """Return {card id: front text} for a Card queryset.
+
+    Plain cards' fronts are read in chunks; a note's cards store no text, so
+    their notes are loaded once each and the fronts generated from them.
+    """
+
+    fronts = {}
+    note_cards = []
+    for card_id, front_text, note_id, ordinal in cards.values_list(
+        "id", "front_text", "note_id", "ordinal"
+    ).iterator(chunk_size=2000):
+        if note_id is None:
+            fronts[card_id] = front_text
+        else:
+            note_cards.append((card_id, note_id, ordinal))
+
+    if note_cards:
+        notes = Note.objects.in_bulk({note_id for _, note_id, _ in note_cards})
+        sides = {note_id: card_sides(note) for note_id, note in notes.items()}
+        for card_id, note_id, ordinal in note_cards:
+            fronts[card_id] = sides[note_id].get(ordinal, ("", ""))[0]
+    return fronts
+
+
+def create_notes(notes):
+    """Insert new notes and all of their cards in bulk.
+
+    ``notes`` are unsaved Note instances (a deck import can pass thousands).
+    Notes and cards are each written with one bulk_create per batch; the
+    cards' SRS rows come from Card.objects.bulk_create. Returns the cards.
+    Raises NoteError before writing anything if a note would produce no card.
+    """
+
+    notes = list(notes)
+    sides = [card_sides(note) for note in notes]
+    owners = dict(
+        Deck.objects.filter(id__in={note.deck_id for note in notes}).values_list("id", "user_id")
+    )
+    for note in notes:
+        note.user_id = owners.get(note.deck_id)
+
+    with transaction.atomic():
+        Note.objects.bulk_create(notes, batch_size=NOTE_BATCH_SIZE)
+        cards = Card.objects.bulk_create(
+            [
+                Card(
+                    deck_id=note.deck_id,
+                    note=note,
+                    ordinal=ordinal,
+                    content_format=note.content_format,
+                )
+                for note, note_sides in zip(notes, sides)
+                for ordinal in note_sides
+            ],
+            batch_size=NOTE_BATCH_SIZE,
+        )
+        _link_media(cards)
+    return cards
+
+
+def sync_note_cards(note):
+    """Bring the cards of a saved note in line with its text and deck.
+
+    Only the difference is written: cards whose rendered sides changed, or
+    that are still in the note's old deck, are updated in one bulk_update
+    (moved cards' SRS rows follow them, see CardSRSManager.follow_move),
+    missing ordinals are created and ordinals the note no longer produces
+    are deleted. Returns the number of cards (created, updated, deleted).
+    """
+
+    def generated(card):
+        return (card.content_format, card.front_html, card.back_html, card.render_version, card.deck_id)
+
+    wanted = card_sides(note)
+    existing = {card.ordinal: card for card in Card.objects.filter(note=note)}
+
+    now = timezone.now()
+    changed = []
+    moved = {}
+    for ordinal, sides in wanted.items():
+        card = existing.get(ordinal)
+        if card is None:
+            continue
+        before = generated(card)
+        card.content_format = note.content_format
+        card.render(sides)
+        if card.deck_id != note.deck_id:
+            moved.setdefault(card.deck_id, []).append(card)
+            card.deck_id, card.user_id = note.deck_id, note.user_id
+        if generated(card) == before:
+            continue
+        card.updated_at = now
+        changed.append(card)
+
+    stale_ids = [card.id for ordinal, card in existing.items() if ordinal not in wanted]
+    new_cards = [
+        Card(deck_id=note.deck_id, note=note, ordinal=ordinal, content_format=note.content_format)
+        for ordinal in wanted
+        if ordinal not in existing
+    ]
+
+    with transaction.atomic():
+        if stale_ids:
+            Card.objects.filter(id__in=stale_ids).delete()
+        if changed:
+            Card.objects.bulk_update(changed, SYNCED_FIELDS)
+        for from_deck_id, cards in moved.items():
+            CardSRS.objects.follow_move(cards, from_deck_id)
+        if new_cards:
+            new_cards = Card.objects.bulk_create(new_cards)
+        for card in changed:
+            # bulk_update skips the signal too; this also unlinks removed media.
+            sync_card_media(card)
+        _link_media(new_cards)
+    return len(new_cards), len(changed), len(stale_ids)
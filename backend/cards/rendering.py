@@ -0,0 +1,71 @@
+"""Server-side rendering of card content to sanitized HTML.
+
+Cards are rendered once when they are saved and the result is stored in
+``Card.front_html`` / ``Card.back_html``, so study requests never run the
+markdown parser or the sanitizer. ``RENDER_VERSION`` changes whenever the
+allow-list below changes; ``manage.py rerender_cards`` then refreshes every
+card rendered with an older version.
+"""
+
+import hashlib
+import json
+
+from django.utils.html import linebreaks
+
+
+ALLOWED_TAGS = [
+    "a", "audio", "b", "blockquote", "br", "code", "del", "em", "h1", "h2", "h3",
+    "h4", "hr", "i", "img", "li", "ol", "p", "pre", "s", "strong", "sub",
+    "sup", "table", "tbody", "td", "th", "thead", "tr", "u", "ul",
+]
+
+ALLOWED_ATTRIBUTES = {
+    "a": ["href", "title"],
+    "audio": ["src", "controls"],
+    "img": ["src", "alt", "title", "width", "height"],
+    "td": ["colspan", "rowspan"],
+    "th": ["colspan", "rowspan"],
+}
+
+ALLOWED_PROTOCOLS = ["http", "https", "mailto"]
+
+MARKDOWN_EXTENSIONS = ["extra", "sane_lists"]
+
+RENDER_VERSION = hashlib.sha256(
+    json.dumps(
+        [ALLOWED_TAGS, ALLOWED_ATTRIBUTES, ALLOWED_PROTOCOLS, MARKDOWN_EXTENSIONS],
+        sort_keys=True,
+    ).encode("utf-8")
+).hexdigest()[:16]
+
+
+def sanitize_html(html: str) -> str:
+    """Strip everything outside the allow-list from an HTML fragment."""
+
+    # bleach (with its vendored html5lib) is slow to import and only needed
+    # when a card is saved; keep it out of worker start-up.
+    import bleach
+
+    return bleach.clean(
+        html,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        protocols=ALLOWED_PROTOCOLS,
+        strip=True,
+    )
+
+
+def render_content(text: str, content_format: str) -> str:
+    """Render card text in the given format to safe HTML."""
+
+    text = text or ""
+
+    if content_format == "markdown":
+        import markdown
+
+        return sanitize_html(markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS))
+    if content_format == "html":
+        return sanitize_html(text)
+
+    # Plain text: escape and keep the author's line breaks.
+    return linebreaks(text, autoescape=True)
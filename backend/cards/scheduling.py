@@ -0,0 +1,117 @@
+"""Load balancing of review due dates.
+
+The study page picks a card's next due date from a fixed ladder, so a big
+import answered on the same day comes back on the same future day as one
+review spike. ``balance_due_at`` moves each new due date to the least loaded
+day within a tolerance window around it, breaking ties at random (fuzz), so
+siblings spread out over the neighbouring days.
+
+Loads come from a per-user histogram over the user's logical days (see
+cards/days.py) kept in the cache: one key per day, filled for a whole
+window by a single grouped query over that window's due dates on a miss,
+and incremented as answers land on a day. Answered cards leave today (or
+an overdue day), which never falls inside a window, so no decrement is
+needed; the keys expire after DUE_LOAD_CACHE_SECONDS, which corrects drift
+from deleted or archived cards.
+"""
+
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateTimeField, ExpressionWrapper, F
+from django.db.models.functions import TruncDate
+
+from .models import CardSRS
+
+
+DUE_LOAD_CACHE_SECONDS = 6 * 60 * 60
+
+
+def tolerance_days(interval_days: int) -> int:
+    """How many days a due date may move either way for a given interval.
+
+    Short intervals stay exact; longer ones get about 10% slack, capped at
+    two weeks.
+    """
+
+    if interval_days < 3:
+        return 0
+    return max(1, min(round(interval_days * 0.1), 14))
+
+
+def _load_key(user_id, study_day, day):
+    # The zone and rollover are part of the key: changing them regroups days.
+    rollover_hours = int(study_day.rollover.total_seconds() // 3600)
+    return f"due-load:{user_id}:{study_day.tz}:{rollover_hours}:{day.isoformat()}"
+
+
+def due_load(user_id, study_day, first_day, last_day):
+    """Return {date: cards due} for the user's logical days first..last."""
+
+    days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+    keys = {_load_key(user_id, study_day, day): day for day in days}
+
+    cached = cache.get_many(keys)
+    if len(cached) == len(keys):
+        return {keys[key]: count for key, count in cached.items()}
+
+    # Shifting by the rollover first makes the local date the logical date.
+    logical_due = ExpressionWrapper(F("due_at") - study_day.rollover, output_field=DateTimeField())
+    counts = dict(
+        CardSRS.objects.filter(
+            user_id=user_id,
+            due_at__gte=study_day.start_of(first_day),
+            due_at__lt=study_day.start_of(last_day + timedelta(days=1)),
+        )
+        .annotate(day=TruncDate(logical_due, tzinfo=study_day.tz))
+        .values_list("day")
+        .annotate(cards=Count("id"))
+        .order_by()
+    )
+
+    loads = {day: counts.get(day, 0) for day in days}
+    cache.set_many(
+        {_load_key(user_id, study_day, day): count for day, count in loads.items()},
+        timeout=DUE_LOAD_CACHE_SECONDS,
+    )
+    return loads
+
+
+def balance_due_at(user_id, due_at, study_day, rng=random):
+    """Return due_at moved to the least loaded day of its tolerance window.
+
+    The time of day is kept. Returns due_at unchanged when balancing is
+    switched off (settings.LOAD_BALANCE_DUE_DATES) or the interval is too
+    short to move.
+    """
+
+    if not settings.LOAD_BALANCE_DUE_DATES:
+        return due_at
+
+    today = study_day.date
+    due_day = study_day.date_of(due_at)
+    interval = (due_day - today).days
+    tolerance = tolerance_days(interval)
+    if tolerance == 0:
+        return due_at
+
+    first_day = max(due_day - timedelta(days=tolerance), today + timedelta(days=1))
+    last_day = due_day + timedelta(days=tolerance)
+    loads = due_load(user_id, study_day, first_day, last_day)
+
+    lightest = min(loads.values())
+    chosen = rng.choice([day for day, count in loads.items() if count == lightest])
+    return due_at + timedelta(days=(chosen - due_day).days)
+
+
+def record_due(user_id, due_at, study_day):
+    """Count one more card on due_at's day in the cached histogram."""
+
+    key = _load_key(user_id, study_day, study_day.date_of(due_at))
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Not cached (yet or any more): the next due_load() query counts it.
+        pass
@@ -0,0 +1,40 @@
+"""Model signal handlers for the cards app."""
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .media import sync_card_media
+from .models import Card, CardMedia, CardSRS, CardTag, Media, Tag
+
+
+@receiver(post_save, sender=Card)
+def create_card_srs(sender, instance, created, raw=False, **kwargs):
+    """Give every new card its SRS rows (owner and subscribers), due straight away."""
+    if not created or raw:
+        return
+    CardSRS.objects.create_for_cards([instance])
+
+
+@receiver(post_save, sender=Card)
+def link_card_media(sender, instance, raw=False, **kwargs):
+    """Keep CardMedia rows (and ref counts) in step with the card's HTML."""
+    if raw:
+        return
+    sync_card_media(instance)
+
+
+@receiver(post_delete, sender=CardMedia)
+def release_media_reference(sender, instance, **kwargs):
+    """Drop one reference when a card stops embedding a blob or is deleted."""
+    Media.objects.filter(id=instance.media_id, ref_count__gt=0).update(
+        ref_count=F("ref_count") - 1
+    )
+
+
+@receiver(post_delete, sender=CardTag)
+def release_tag(sender, instance, **kwargs):
+    """Keep Tag.card_count in step when a card loses a tag or is deleted."""
+    Tag.objects.filter(id=instance.tag_id, card_count__gt=0).update(
+        card_count=F("card_count") - 1
+    )
@@ -0,0 +1,130 @@
+"""Card queues used by the study views.
+
+Every study screen (deck review, cram, folder study) asks the same question:
+"which card comes next?". The helpers here answer it with a single query per
+call so the answer endpoint stays cheap no matter how large the deck is.
+"""
+
+import secrets
+
+from django.db.models import (
+    Case,
+    F,
+    IntegerField,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Mod, RowNumber
+
+from .folders import subtree_ids
+from .models import CardSRS
+from .tags import tag_filter
+
+
+# Modulus for the cram permutation: the Mersenne prime 2**31 - 1.
+# (id % P) * a stays below 2**62, so the key never overflows a BIGINT.
+PERMUTATION_MODULUS = 2_147_483_647
+
+CRAM_ORDERS = ("random", "weakest")
+
+
+def new_cram_seed() -> int:
+    """Return a fresh seed for a cram session permutation."""
+
+    return secrets.randbelow(PERMUTATION_MODULUS - 1) + 1
+
+
+def _permutation_key(seed: int):
+    """Build the SQL expression ((id mod P) * a + b) mod P for a seed.
+
+    For a non-zero multiplier this is a bijection on card ids, so the order is
+    a stable, seed-dependent shuffle computed entirely inside the database.
+    """
+
+    multiplier = seed % (PERMUTATION_MODULUS - 1) + 1
+    offset = (seed * 7919) % PERMUTATION_MODULUS
+    return Mod(
+        Mod(F("card_id"), PERMUTATION_MODULUS) * multiplier + offset,
+        PERMUTATION_MODULUS,
+        output_field=IntegerField(),
+    )
+
+
+def scope_states(session):
+    """Return the SRS rows of the active cards a session may show.
+
+    Queues run over the user's CardSRS rows rather than over cards, so cards
+    of subscribed decks (owned by someone else) are studied like any other.
+    A folder session covers the decks of all its subfolders too. A
+    session's tag expression becomes part of the same WHERE clause.
+    """
+
+    states = CardSRS.objects.filter(user_id=session.user_id, card__status="active")
+    if session.deck_id:
+        states = states.filter(deck_id=session.deck_id)
+    elif session.folder_id:
+        states = states.filter(
+            deck__folder_id__in=subtree_ids(session.folder_id),
+            deck__is_archived=False,
+        )
+    else:
+        states = states.filter(deck__is_archived=False)
+    if session.tag_expression:
+        states = states.filter(tag_filter(session.tag_expression, session.user_id))
+    return states
+
+
+def cram_queryset(session):
+    """Return the session's SRS rows in their cram order.
+
+    "random" follows the seeded permutation only. "weakest" puts cards with
+    the most lapses and lowest ease first and uses the permutation to break
+    ties, so equally weak cards are still shuffled.
+    """
+
+    states = scope_states(session).annotate(cram_key=_permutation_key(session.seed))
+
+    if session.order == "weakest":
+        states = states.order_by("-lapses", "ease_factor", "cram_key")
+    else:
+        states = states.order_by("cram_key")
+
+    return states.select_related("card", "card__note")
+
+
+def cram_card_at(session, position: int):
+    """Return the SRS row at ``position`` in the session's cram order, or None."""
+
+    return next(iter(cram_queryset(session)[position:position + 1]), None)
+
+
+def interleaved_due_cards(states, day_end, deck_turns=None):
+    """Order SRS rows due before ``day_end`` by due time, mixing decks fairly.
+
+    Each card gets its rank inside its own deck (most overdue first), shifted
+    by the number of cards that deck already served in the session
+    (``deck_turns``). Sorting by (turn, due time) then yields the most overdue
+    card of every deck before a deck gets its next turn. Everything happens
+    in one query, whatever the number of decks in the scope.
+    """
+
+    deck_rank = Window(
+        expression=RowNumber(),
+        partition_by=[F("deck_id")],
+        order_by=[F("due_at").asc(), F("card_id").asc()],
+    )
+    turn = deck_rank
+    if deck_turns:
+        turn = deck_rank + Case(
+            *[When(deck_id=int(deck_id), then=Value(served)) for deck_id, served in deck_turns.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    return (
+        states.filter(due_at__lt=day_end)
+        .annotate(queue_turn=turn)
+        .select_related("card", "card__note")
+        .order_by("queue_turn", "due_at", "card_id")
+    )
@@ -0,0 +1,229 @@
+"""Card tags and tag expressions.
+
+A tag expression such as ``verbs AND NOT (irregular OR archaic)`` narrows a
+card list or a study session. It is parsed once and compiled into a Q
+object of ``IN`` subqueries over CardTag, so it is added to the WHERE clause
+of the query it filters (the due queue, a cram order, a search) and the
+whole thing stays one SQL statement. Each subquery starts from the tag's
+(user, name) index and reads its cards from the (tag, card) index.
+"""
+
+import re
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from .models import CardTag, Tag
+
+
+MAX_TAG_LENGTH = 64
+MAX_TAGS_PER_CARD = 20
+# Bounds the number of subqueries one expression adds to a query.
+MAX_EXPRESSION_TERMS = 16
+
+TAG_NAME_RE = re.compile(r"^[\w\-:./]+$")
+TOKEN_RE = re.compile(r"\(|\)|[^\s()]+")
+OPERATORS = {"and", "or", "not"}
+
+
+class TagError(ValueError):
+    """Raised for an invalid tag name or tag expression."""
+
+
+def normalize_tag(name):
+    """Return the stored form of a tag name (lower case), or raise TagError."""
+
+    name = name.strip().lower()
+    if not name:
+        raise TagError("Tags cannot be empty.")
+    if len(name) > MAX_TAG_LENGTH:
+        raise TagError(f"Tags are at most {MAX_TAG_LENGTH} characters.")
+    if name in OPERATORS:
+        raise TagError(f"'{name}' is reserved for tag expressions.")
+    if not TAG_NAME_RE.match(name):
+        raise TagError(f"'{name}' may only contain letters, digits and - _ : . /")
+    return name
+
+
+def parse_tag_names(text):
+    """Split a comma or space separated tag list into normalized names."""
+
+    names = {normalize_tag(name) for name in re.split(r"[,\s]+", text or "") if name}
+    if len(names) > MAX_TAGS_PER_CARD:
+        raise TagError(f"A card can have at most {MAX_TAGS_PER_CARD} tags.")
+    return names
+
+
+# ---------------------------------------------------------------------------
+# Counters
+# ---------------------------------------------------------------------------
+
+
+def set_card_tags(user, card, names):
+    """Make ``user``'s tags on ``card`` exactly ``names``.
+
+    Links are removed with ``DELETE ... RETURNING`` and added with ``INSERT
+    ... ON CONFLICT DO NOTHING RETURNING``, and Tag.card_count moves by the
+    rows those statements really changed, so a concurrent edit of the same
+    card is neither an IntegrityError nor counted twice. Links deleted any
+    other way (cascades included) are counted down by the CardTag
+    post_delete signal.
+    """
+
+    current = dict(
+        CardTag.objects.filter(card=card, tag__user=user).values_list("tag__name", "id")
+    )
+    if not names and not current:
+        return
+
+    table = connection.ops.quote_name(CardTag._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        stale_ids = [link_id for name, link_id in current.items() if name not in names]
+        if stale_ids:
+            sql, params = CardTag.objects.filter(id__in=stale_ids).values("id").query.sql_with_params()
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({sql}) RETURNING tag_id", params)
+            removed = [row[0] for row in cursor.fetchall()]
+            Tag.objects.filter(id__in=removed, card_count__gt=0).update(card_count=F("card_count") - 1)
+
+        new_names = set(names) - current.keys()
+        if new_names:
+            Tag.objects.bulk_create(
+                [Tag(user=user, name=name) for name in new_names], ignore_conflicts=True
+            )
+            tag_ids = list(
+                Tag.objects.filter(user=user, name__in=new_names).values_list("id", flat=True)
+            )
+            values = ", ".join(["(%s, %s)"] * len(tag_ids))
+            cursor.execute(
+                f"INSERT INTO {table} (card_id, tag_id) VALUES {values} "
+                "ON CONFLICT (card_id, tag_id) DO NOTHING RETURNING tag_id",
+                [value for tag_id in tag_ids for value in (card.id, tag_id)],
+            )
+            added = [row[0] for row in cursor.fetchall()]
+            Tag.objects.filter(id__in=added).update(card_count=F("card_count") + 1)
+
+
+def card_tag_names(user, card_ids):
+    """Return {card id: sorted tag names} of ``user``'s tags on the cards."""
+
+    names = {}
+    for card_id, name in (
+        CardTag.objects.filter(card_id__in=card_ids, tag__user=user)
+        .values_list("card_id", "tag__name")
+        .order_by("tag__name")
+    ):
+        names.setdefault(card_id, []).append(name)
+    return names
+
+
+def tag_counts(user):
+    """The user's tags in use with their card counts, read from the counters."""
+
+    return (
+        Tag.objects.filter(user=user, card_count__gt=0)
+        .order_by("name")
+        .values_list("name", "card_count")
+    )
+
+
+# ---------------------------------------------------------------------------
+# Expressions
+# ---------------------------------------------------------------------------
+
+
+def parse_tag_expression(text):
+    """Parse a tag expression into a tree of tuples.
+
+    Grammar (operators are case-insensitive, NOT binds tightest, then AND,
+    then OR; two terms side by side mean AND)::
+
+        expr   := term ("OR" term)*
+        term   := factor ("AND"? factor)*
+        factor := "NOT" factor | "(" expr ")" | tag
+
+    Nodes are ("tag", name), ("not", node), ("and", [nodes]) and
+    ("or", [nodes]).
+    """
+
+    tokens = TOKEN_RE.findall(text or "")
+    if not tokens:
+        raise TagError("The tag expression is empty.")
+    position = 0
+    terms = 0
+
+    def peek():
+        return tokens[position].lower() if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        token = tokens[position]
+        position += 1
+        return token
+
+    def expr():
+        nodes = [term()]
+        while peek() == "or":
+            take()
+            nodes.append(term())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def term():
+        nodes = [factor()]
+        while peek() not in (None, "or", ")"):
+            if peek() == "and":
+                take()
+            nodes.append(factor())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def factor():
+        nonlocal terms
+        token = peek()
+        if token is None:
+            raise TagError("The tag expression ends too early.")
+        if token == "not":
+            take()
+            return ("not", factor())
+        if token == "(":
+            take()
+            node = expr()
+            if peek() != ")":
+                raise TagError("Missing ')' in the tag expression.")
+            take()
+            return node
+        if token in ("and", "or", ")"):
+            raise TagError(f"Unexpected '{take()}' in the tag expression.")
+        terms += 1
+        if terms > MAX_EXPRESSION_TERMS:
+            raise TagError(f"Use at most {MAX_EXPRESSION_TERMS} tags in one expression.")
+        return ("tag", normalize_tag(take()))
+
+    node = expr()
+    if position < len(tokens):
+        raise TagError(f"Unexpected '{tokens[position]}' in the tag expression.")
+    return node
+
+
+def tag_filter(expression, user_id=None, card_field="card_id"):
+    """Compile a tag expression into a Q over ``card_field``.
+
+    ``card_field`` names the card id column of the filtered model ("card_id"
+    on CardSRS, "id" on Card). Tags are ``user_id``'s; None matches a tag
+    name of any user (the admin's search).
+    """
+
+    tags = Tag.objects.filter(user_id=user_id) if user_id is not None else Tag.objects.all()
+
+    def compile_node(node):
+        kind, value = node
+        if kind == "tag":
+            tag_ids = tags.filter(name=value).values("id")
+            card_ids = CardTag.objects.filter(tag_id__in=tag_ids).values("card_id")
+            return Q(**{f"{card_field}__in": card_ids})
+        if kind == "not":
+            return ~compile_node(value)
+        combined = compile_node(value[0])
+        for child in value[1:]:
+            combined = combined & compile_node(child) if kind == "and" else combined | compile_node(child)
+        return combined
+
+    return compile_node(parse_tag_expression(expression))
@@ -1,3 +1,1942 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import runpy
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.db.models import F
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from nerdeck_project import metrics, monitoring
+from nerdeck_project.db_routing import (
+    REPLICA_ALIAS,
+    REPLICA_PIN_COOKIE,
+    ReplicaRouter,
+    replica_reads,
+    request_state,
+)
+
+from .analytics import cached_srs_arrays, load_srs_arrays, srs_statistics
+from .days import StudyDay, study_day_for_user
+from .fingerprints import front_text_hash, near_duplicate_groups
+from .folders import folder_tree, rolled_up_counts, subtree_ids
+from .library import copy_on_write, subscribe
+from .management.commands.profile_startup import _parse_importtime
+from .media import store_upload
+from .models import (
+    Card,
+    CardSRS,
+    Deck,
+    Folder,
+    FolderClosure,
+    Media,
+    Note,
+    ReviewSession,
+    Tag,
+    UserProfile,
+)
+from .notes import NoteError, card_sides, cloze_ordinals, create_notes, sync_note_cards
+from .rendering import RENDER_VERSION, render_content
+from .scheduling import balance_due_at, due_load, record_due, tolerance_days
+from .study import cram_card_at, cram_queryset, interleaved_due_cards, new_cram_seed
+from .tags import (
+    MAX_EXPRESSION_TERMS,
+    TagError,
+    parse_tag_expression,
+    parse_tag_names,
+    set_card_tags,
+    tag_counts,
+    tag_filter,
+)
+from .views import merge_folders, move_folder, organize_decks
+
+
+def post_json(view, user, payload):
+    request = RequestFactory().post("/", json.dumps(payload), content_type="application/json")
+    request.user = user
+    return view(request)
+
+
+def make_deck(user, title, cards=0, **fields):
+    """A deck with ``cards`` plain cards (and their SRS rows, due now)."""
+
+    deck = Deck.objects.create(user=user, title=title, **fields)
+    for index in range(cards):
+        Card.objects.create(deck=deck, front_text=f"{title} {index}", back_text="back")
+    return deck
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Run a data migration over rows created with the historical models.
+
+    The database is migrated back to ``migrate_from``; ``setUpBeforeMigration``
+    adds rows through ``apps`` of that state, then the migrations up to
+    ``migrate_to`` run and ``self.apps`` holds the models as they are there.
+    """
+
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        self.migrate([("cards", self.migrate_from)])
+        self.setUpBeforeMigration(self.apps)
+        self.migrate([("cards", self.migrate_to)])
+
+    def tearDown(self):
+        self.migrate(None)
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        targets = targets or executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        self.apps = executor.loader.project_state(targets).apps
+
+    def setUpBeforeMigration(self, apps):
+        pass
+
+
+class FolderInvariantsMixin:
+    def assertClosureConsistent(self, user):
+        """The closure rows are exactly the (ancestor, descendant, depth) of the parent links."""
+
+        folders = {folder.id: folder for folder in Folder.objects.filter(user=user)}
+        closure = set(
+            FolderClosure.objects.filter(descendant__user=user).values_list(
+                "ancestor_id", "descendant_id", "depth"
+            )
+        )
+        expected = set()
+        for folder in folders.values():
+            ancestor, depth = folder, 0
+            while ancestor is not None:
+                expected.add((ancestor.id, folder.id, depth))
+                ancestor, depth = folders.get(ancestor.parent_id), depth + 1
+        self.assertEqual(closure, expected)
+
+    def assertNoEmptyFolders(self, user):
+        folders = Folder.objects.filter(user=user)
+        in_use = set(
+            Deck.objects.filter(user=user, is_archived=False, folder__isnull=False)
+            .values_list("folder_id", flat=True)
+        ) | {folder.parent_id for folder in folders}
+        self.assertEqual({folder.id for folder in folders} - in_use, set())
+
+
+class CramSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("learner", password="pw")
+        self.deck = make_deck(self.user, "Deck", cards=12)
+        self.client.force_login(self.user)
+
+    def session(self, seed, order="random"):
+        return ReviewSession.objects.create(
+            user=self.user, deck=self.deck, mode="cram", order=order, seed=seed,
+        )
+
+    def walk(self, session):
+        return [cram_card_at(session, position).card_id for position in range(12)]
+
+    def test_permutation_visits_every_card_once(self):
+        order = self.walk(self.session(seed=new_cram_seed()))
+
+        self.assertEqual(sorted(order), sorted(self.deck.card_set.values_list("id", flat=True)))
+        self.assertIsNone(cram_card_at(self.session(seed=1), 12))
+
+    def test_order_depends_only_on_the_seed(self):
+        # Seeds come from new_cram_seed(), so they are spread over 1..2**31-2.
+        first, second = 1_234_567_891, 987_654_321
+        self.assertEqual(self.walk(self.session(seed=first)), self.walk(self.session(seed=first)))
+        self.assertNotEqual(self.walk(self.session(seed=first)), self.walk(self.session(seed=second)))
+        self.assertNotEqual(self.walk(self.session(seed=first)), sorted(self.walk(self.session(seed=first))))
+
+    def test_weakest_cards_come_first(self):
+        weak = list(CardSRS.objects.filter(deck=self.deck).order_by("id")[:2])
+        CardSRS.objects.filter(id=weak[0].id).update(lapses=5)
+        CardSRS.objects.filter(id=weak[1].id).update(lapses=2)
+
+        states = list(cram_queryset(self.session(seed=7, order="weakest"))[:2])
+
+        self.assertEqual([state.id for state in states], [weak[0].id, weak[1].id])
+
+    def test_right_answer_advances_and_wrong_answer_repeats(self):
+        session = self.session(seed=5)
+        url = reverse("session_answer", args=[session.id])
+
+        def answer(is_right, key):
+            card_id = cram_card_at(session, session.position).card_id
+            response = self.client.post(
+                url,
+                json.dumps({"card_id": card_id, "is_right": is_right}),
+                content_type="application/json",
+                headers={"Idempotency-Key": key},
+            )
+            session.refresh_from_db()
+            return response
+
+        answer(False, "wrong")
+        self.assertEqual(session.position, 0)
+        answer(True, "right")
+        self.assertEqual(session.position, 1)
+        # The cram answer never touches scheduling.
+        self.assertFalse(CardSRS.objects.filter(deck=self.deck, repetitions__gt=0).exists())
+
+    def test_study_page_starts_a_cram_session(self):
+        response = self.client.get(reverse("study", args=[self.deck.id]), {"mode": "cram"})
+
+        self.assertEqual(response.status_code, 200)
+        session = ReviewSession.objects.get(user=self.user)
+        self.assertEqual((session.mode, session.position), ("cram", 0))
+        self.assertGreater(session.seed, 0)
+
+
+class InterleavedQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("learner", password="pw")
+        self.folder = Folder.objects.create(user=self.user, name="Languages")
+        self.big = make_deck(self.user, "Big", cards=3, folder=self.folder)
+        self.small = make_deck(self.user, "Small", cards=1, folder=self.folder)
+        self.elsewhere = make_deck(self.user, "Elsewhere", cards=1)
+        self.client.force_login(self.user)
+
+    def deck_order(self, states, deck_turns=None):
+        day_end = datetime.now(dt_timezone.utc) + timedelta(days=1)
+        return [state.deck_id for state in interleaved_due_cards(states, day_end, deck_turns)]
+
+    def test_decks_take_turns(self):
+        states = CardSRS.objects.filter(deck__folder=self.folder)
+        big, small = self.big.id, self.small.id
+
+        self.assertEqual(self.deck_order(states), [big, small, big, big])
+        # Once Big has served two cards, Small's card comes first.
+        self.assertEqual(self.deck_order(states, {str(big): 2}), [small, big, big, big])
+
+    def test_folder_session_covers_its_decks_only(self):
+        response = self.client.get(reverse("study_folder", args=[self.folder.id]))
+
+        self.assertEqual(response.status_code, 200)
+        session = ReviewSession.objects.get(user=self.user)
+        self.assertEqual(session.folder_id, self.folder.id)
+        self.assertEqual(response.context["current_card_state"]["deck_id"], self.big.id)
+
+    def test_answers_count_turns_per_deck(self):
+        session = ReviewSession.objects.create(user=self.user, folder=self.folder, mode="review")
+        first = CardSRS.objects.filter(deck=self.big).order_by("id").first()
+
+        response = self.client.post(
+            reverse("session_answer", args=[session.id]),
+            json.dumps({"card_id": first.card_id, "is_right": True}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        session.refresh_from_db()
+        self.assertEqual(session.deck_turns, {str(self.big.id): 1})
+        self.assertEqual(response.json()["next_card"]["deck_id"], self.small.id)
+
+
+class RenderingTests(TestCase):
+    def test_markdown_is_rendered(self):
+        self.assertHTMLEqual(
+            render_content("**bold** and `code`", "markdown"),
+            "<p><strong>bold</strong> and <code>code</code></p>",
+        )
+
+    def test_html_is_sanitized(self):
+        html = render_content(
+            '<p onclick="x()">Hi<script>alert(1)</script></p>'
+            '<a href="javascript:alert(1)">link</a><img src="/media/a/" onerror="x()">',
+            "html",
+        )
+
+        self.assertNotIn("script", html)
+        self.assertNotIn("onclick", html)
+        self.assertNotIn("onerror", html)
+        self.assertNotIn("javascript:", html)
+        self.assertIn('<img src="/media/a/">', html)
+
+    def test_plain_text_is_escaped_with_line_breaks(self):
+        self.assertEqual(render_content("a < b\nc", "plain"), "<p>a &lt; b<br>c</p>")
+
+    def test_cards_are_rendered_on_save(self):
+        user = User.objects.create_user("author")
+        deck = make_deck(user, "Deck")
+        card = Card.objects.create(
+            deck=deck, front_text="# Title", back_text="*x*", content_format="markdown",
+        )
+
+        self.assertHTMLEqual(card.front_html, "<h1>Title</h1>")
+        self.assertHTMLEqual(card.back_html, "<p><em>x</em></p>")
+        self.assertEqual(card.render_version, RENDER_VERSION)
+
+    def test_rerender_cards_refreshes_outdated_cards_only(self):
+        user = User.objects.create_user("author")
+        deck = make_deck(user, "Deck", cards=3)
+        outdated = deck.card_set.order_by("id").first()
+        Card.objects.filter(id=outdated.id).update(front_html="stale", render_version="old")
+
+        output = StringIO()
+        call_command("rerender_cards", stdout=output)
+
+        self.assertIn("Done: 1 cards rendered", output.getvalue())
+        outdated.refresh_from_db()
+        self.assertEqual(outdated.render_version, RENDER_VERSION)
+        self.assertEqual(outdated.front_html, render_content(outdated.front_text, "plain"))
+
+
+class StoreUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, color="red"):
+        # Pillow is already a dependency (thumbnails).
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new("RGB", (8, 8), color).save(buffer, format="PNG")
+        return SimpleUploadedFile("picture.png", buffer.getvalue(), content_type="image/png")
+
+    def test_same_bytes_are_stored_once(self):
+        first = store_upload(self.upload())
+        second = store_upload(self.upload())
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Media.objects.count(), 1)
+        self.assertTrue(default_storage.exists(first.file.name))
+        self.assertTrue(default_storage.exists(first.thumbnail.name))
+
+    def test_losing_a_concurrent_upload_leaves_no_files_behind(self):
+        upload = self.upload()
+        sha256 = hashlib.sha256(upload.read()).hexdigest()
+        upload.seek(0)
+        winner = {}
+
+        def concurrent_upload(execute, sql, params, many, context):
+            # The other request commits the same bytes just before this one
+            # opens its transaction to insert them.
+            if sql.startswith("SAVEPOINT") and not winner:
+                winner["media"] = None
+                winner["media"] = Media.objects.create(
+                    sha256=sha256,
+                    kind="image",
+                    content_type="image/png",
+                    size=1,
+                    file="media/winner.png",
+                )
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(concurrent_upload):
+            media = store_upload(upload)
+
+        self.assertEqual(media.id, winner["media"].id)
+        _, stored = default_storage.listdir("media/" + media.sha256[:2])
+        self.assertEqual(stored, [])
+        _, thumbnails = default_storage.listdir("thumbs/" + media.sha256[:2])
+        self.assertEqual(thumbnails, [])
+
+    def test_cards_count_their_media_references(self):
+        media = store_upload(self.upload())
+        deck = make_deck(User.objects.create_user("author"), "Deck")
+        html = f'<img src="/media/{media.sha256}/">'
+
+        first = Card.objects.create(deck=deck, front_text=html, back_text="", content_format="html")
+        Card.objects.create(deck=deck, front_text=html, back_text=html, content_format="html")
+        media.refresh_from_db()
+        self.assertEqual(media.ref_count, 2)
+
+        first.front_text = "no picture"
+        first.save()
+        media.refresh_from_db()
+        self.assertEqual(media.ref_count, 1)
+
+        deck.delete()
+        media.refresh_from_db()
+        self.assertEqual(media.ref_count, 0)
+
+    def test_gc_media_deletes_unreferenced_blobs_after_the_grace_period(self):
+        media = store_upload(self.upload())
+
+        call_command("gc_media", stdout=StringIO())
+        self.assertTrue(Media.objects.filter(id=media.id).exists())
+
+        call_command("gc_media", "--grace-hours=0", stdout=StringIO())
+        self.assertFalse(Media.objects.filter(id=media.id).exists())
+        self.assertFalse(default_storage.exists(media.file.name))
+
+
+class DuplicateCardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("author", password="pw")
+        self.deck = make_deck(self.user, "Deck")
+        self.client.force_login(self.user)
+
+    def add(self, *fronts):
+        return [Card.objects.create(deck=self.deck, front_text=front, back_text="b") for front in fronts]
+
+    def test_front_hash_ignores_case_and_whitespace(self):
+        self.assertEqual(front_text_hash("  Capital of\tFrance "), front_text_hash("capital of france"))
+        self.assertNotEqual(front_text_hash("capital of france"), front_text_hash("capital of spain"))
+
+    def test_near_duplicates_are_grouped(self):
+        groups = near_duplicate_groups([
+            (1, "What is the capital city of France?"),
+            (2, "What is the capital city of France"),
+            (3, "Name the largest planet in the solar system"),
+        ])
+
+        self.assertEqual(groups, [[1, 2]])
+
+    def test_report_lists_exact_and_near_duplicates(self):
+        first, second, _, near = self.add(
+            "Capital of France", "capital of  france", "Largest planet", "Capital of France?",
+        )
+
+        response = self.client.get(reverse("duplicate_report"), {"near": "1"})
+
+        body = response.json()
+        self.assertEqual(len(body["exact"]), 1)
+        self.assertEqual(body["exact"][0]["count"], 2)
+        self.assertEqual({card["id"] for card in body["exact"][0]["cards"]}, {first.id, second.id})
+        self.assertEqual(
+            [sorted(card["id"] for card in group) for group in body["near"]],
+            [sorted([first.id, second.id, near.id])],
+        )
+
+
+class FrontHashMigrationTests(MigrationTestCase):
+    migrate_from = "0007_media_storage"
+    migrate_to = "0008_card_front_hash"
+
+    def setUpBeforeMigration(self, apps):
+        user = apps.get_model("auth", "User").objects.create(username="author")
+        deck = apps.get_model("cards", "Deck").objects.create(user_id=user.id, title="Deck")
+        apps.get_model("cards", "Card").objects.create(deck=deck, front_text="Old  Card", back_text="b")
+
+    def test_existing_cards_are_hashed(self):
+        card = self.apps.get_model("cards", "Card").objects.get()
+
+        self.assertEqual(card.front_hash, front_text_hash("old card"))
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.admin)
+        self.owner = User.objects.create_user("owner@example.com")
+        self.deck = make_deck(self.owner, "Verbs", cards=2)
+        self.other_deck = make_deck(User.objects.create_user("other@example.com"), "Nouns", cards=1)
+
+    def changelist(self, **params):
+        return self.client.get(reverse("admin:cards_card_changelist"), params)
+
+    def listed_ids(self, response):
+        return {card.id for card in response.context["cl"].result_list}
+
+    def test_user_filter_accepts_id_or_email(self):
+        own_ids = set(Card.objects.filter(deck=self.deck).values_list("id", flat=True))
+
+        self.assertEqual(self.listed_ids(self.changelist(user=self.owner.id)), own_ids)
+        self.assertEqual(self.listed_ids(self.changelist(user="owner@example.com")), own_ids)
+
+    def test_deck_filter_ignores_text(self):
+        self.assertEqual(
+            self.listed_ids(self.changelist(deck=self.other_deck.id)),
+            set(Card.objects.filter(deck=self.other_deck).values_list("id", flat=True)),
+        )
+        self.assertEqual(self.listed_ids(self.changelist(deck="Nouns")), set())
+
+    def test_invalid_tag_expression_is_reported_not_raised(self):
+        response = self.changelist(tags="verbs AND (")
+
+        self.assertRedirects(
+            response, reverse("admin:cards_card_changelist") + "?e=1", fetch_redirect_response=False
+        )
+
+    def test_counts_are_exact_off_postgres(self):
+        response = self.changelist()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 3)
+        self.assertIsNone(response.context["cl"].full_result_count)
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_page_without_csrf_token_gets_brotli(self):
+        response = self.client.get(reverse("home"), headers={"Accept-Encoding": "br, gzip"})
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_page_with_csrf_token_gets_padded_gzip(self):
+        response = self.client.get(reverse("login"), headers={"Accept-Encoding": "br, gzip"})
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        # GZipMiddleware's BREACH padding is a random file name in the header.
+        self.assertTrue(response.content[3] & 0x08)
+
+    def test_client_without_brotli_gets_gzip(self):
+        response = self.client.get(reverse("home"), headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_visitors_share_one_render(self):
+        first = self.client.get(reverse("home"))
+        second = self.client_class().get(reverse("home"))
+
+        self.assertTrue(first.templates)
+        # Served from the page cache: no template was rendered.
+        self.assertEqual(second.templates, [])
+        self.assertIn("public", second["Cache-Control"])
+        self.assertIn("Cookie", second["Vary"])
+
+    def test_visitors_with_a_session_get_a_private_render(self):
+        self.client.get(reverse("home"))
+        self.client.force_login(User.objects.create_user("learner", password="pw"))
+
+        response = self.client.get(reverse("home"))
+
+        self.assertTrue(response.templates)
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_flash_message_page_is_not_shared(self):
+        storage = CookieStorage(RequestFactory().get("/"))
+        storage.add(messages.SUCCESS, "Only for this visitor")
+        carrier = HttpResponse()
+        storage.update(carrier)
+        self.client.cookies[CookieStorage.cookie_name] = carrier.cookies[CookieStorage.cookie_name].value
+
+        own = self.client.get(reverse("home"))
+        self.assertContains(own, "Only for this visitor")
+        self.assertIn("private", own["Cache-Control"])
+
+        other = self.client_class().get(reverse("home"))
+        self.assertNotContains(other, "Only for this visitor")
+        self.assertIn("public", other["Cache-Control"])
+
+
+class PrivateJSONCacheTests(TestCase):
+    def test_json_for_a_logged_in_user_is_private(self):
+        self.client.force_login(User.objects.create_user("learner", password="pw"))
+
+        response = self.client.get(reverse("duplicate_report"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+
+
+class DecksFragmentCacheTests(TestCase):
+    def setUp(self):
+        caches["template_fragments"].clear()
+        self.addCleanup(caches["template_fragments"].clear)
+        self.user = User.objects.create_user("learner@example.com")
+        self.client.force_login(self.user)
+        self.deck = make_deck(self.user, "Verbs", cards=1)
+
+    def test_rows_are_served_from_the_fragment_cache(self):
+        self.client.get(reverse("decks"))
+        # A write that leaves updated_at alone keeps the cached row.
+        Deck.objects.filter(id=self.deck.id).update(title="Nouns")
+
+        response = self.client.get(reverse("decks"))
+
+        # The delete dialog is not cached; the rename box in the row is.
+        self.assertContains(response, 'value="Verbs"')
+        self.assertNotContains(response, 'value="Nouns"')
+
+    def test_rename_rerenders_the_row(self):
+        self.client.get(reverse("decks"))
+
+        self.client.post(reverse("rename_deck"), {"deck_id": self.deck.id, "title": "Nouns"})
+        response = self.client.get(reverse("decks"))
+
+        self.assertContains(response, 'value="Nouns"')
+
+    def test_cached_rows_carry_no_csrf_token(self):
+        response = self.client.get(reverse("decks"))
+
+        self.assertContains(
+            response, 'name="csrfmiddlewaretoken" value="" class="row-csrf-token"'
+        )
+
+
+class AnswerSubmissionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("learner", password="pw")
+        self.deck = Deck.objects.create(user=self.user, title="Deck")
+        self.card = Card.objects.create(deck=self.deck, front_text="Q", back_text="A")
+        self.client.force_login(self.user)
+
+    def state(self):
+        return CardSRS.objects.get(card=self.card, user=self.user)
+
+    def answer(self, key, **fields):
+        payload = {"card_id": self.card.id, "is_right": True, **fields}
+        return self.client.post(
+            reverse("review_answer", args=[self.deck.id]),
+            json.dumps(payload),
+            content_type="application/json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_replayed_answer_is_applied_once(self):
+        first = self.answer("answer-1", version=0)
+        replay = self.answer("answer-1", version=0)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()["version"], 1)
+        self.assertEqual(replay.status_code, 200)
+        self.assertIsNone(replay.json()["version"])
+        self.assertEqual(self.state().repetitions, 1)
+
+    def test_retry_after_conflict_is_applied(self):
+        CardSRS.objects.filter(id=self.state().id).update(version=3)
+
+        conflict = self.answer("answer-1", version=0)
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(self.state().repetitions, 0)
+
+        retry = self.answer("answer-1", version=3)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json()["version"], 4)
+        self.assertEqual(self.state().repetitions, 1)
+
+    def test_retry_after_error_is_applied(self):
+        with mock.patch("cards.views._apply_review_answer", side_effect=RuntimeError("db gone")):
+            with self.assertRaises(RuntimeError):
+                self.answer("answer-1")
+
+        self.assertEqual(self.answer("answer-1").status_code, 200)
+        self.assertEqual(self.state().repetitions, 1)
+
+    @override_settings(ANSWER_RATE_LIMIT=(2, 0.01))
+    def test_burst_over_the_limit_is_throttled(self):
+        statuses = [self.answer(f"answer-{index}").status_code for index in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(self.state().repetitions, 2)
+
+
+class AnswerVersionTests(TestCase):
+    """Answers update CardSRS with one conditional UPDATE and no row locks."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("learner", password="pw")
+        self.deck = Deck.objects.create(user=self.user, title="Deck")
+        self.card = Card.objects.create(deck=self.deck, front_text="Q", back_text="A")
+        self.client.force_login(self.user)
+
+    def state(self):
+        return CardSRS.objects.get(card=self.card, user=self.user)
+
+    def answer(self, url=None, **fields):
+        payload = {"card_id": self.card.id, "is_right": True, **fields}
+        return self.client.post(
+            url or reverse("review_answer", args=[self.deck.id]),
+            json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def test_answer_bumps_version_and_counter(self):
+        right = self.answer(version=0)
+        wrong = self.answer(is_right=False, version=1)
+
+        self.assertEqual([right.json()["version"], wrong.json()["version"]], [1, 2])
+        state = self.state()
+        self.assertEqual((state.repetitions, state.lapses, state.version), (1, 1, 2))
+
+    def test_concurrent_answer_is_not_lost(self):
+        state_id = self.state().id
+
+        def other_device_answers(execute, sql, params, many, context):
+            # Lands between the view's reads and its UPDATE.
+            if sql.startswith('UPDATE "cards_cardsrs"') and not hasattr(self, "raced"):
+                self.raced = True
+                CardSRS.objects.filter(id=state_id).update(
+                    repetitions=F("repetitions") + 1, version=F("version") + 1
+                )
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(other_device_answers):
+            response = self.answer()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 2)
+        self.assertEqual((self.state().repetitions, self.state().version), (2, 2))
+
+    def test_stale_version_is_rejected_without_applying(self):
+        CardSRS.objects.filter(id=self.state().id).update(version=5)
+
+        response = self.answer(version=4)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["next_card"]["id"], self.card.id)
+        self.assertEqual(response.json()["next_card"]["version"], 5)
+        self.assertEqual((self.state().repetitions, self.state().version), (0, 5))
+
+    def test_stale_version_in_a_session_is_rejected(self):
+        session = ReviewSession.objects.create(user=self.user, deck=self.deck, mode="review")
+        CardSRS.objects.filter(id=self.state().id).update(version=5)
+
+        response = self.answer(reverse("session_answer", args=[session.id]), version=4)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.state().repetitions, 0)
+
+
+class EagerSRSTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("learner@example.com")
+        self.deck = Deck.objects.create(user=self.user, title="Deck")
+
+    def test_new_card_is_due_at_creation(self):
+        card = Card.objects.create(deck=self.deck, front_text="Q", back_text="A")
+
+        state = CardSRS.objects.get(card=card)
+        self.assertEqual((state.user_id, state.deck_id), (self.user.id, self.deck.id))
+        self.assertEqual(state.due_at, card.created_at)
+
+    def test_bulk_created_cards_are_prepared_like_saved_ones(self):
+        cards = Card.objects.bulk_create(
+            [
+                Card(deck=self.deck, front_text=f"**Q{index}**", back_text="A", content_format="markdown")
+                for index in range(3)
+            ]
+        )
+
+        self.assertEqual(CardSRS.objects.filter(card__in=cards).count(), 3)
+        stored = Card.objects.get(id=cards[0].id)
+        self.assertEqual(stored.front_hash, front_text_hash("**Q0**"))
+        self.assertIn("<strong>", stored.front_html)
+
+    def test_decks_page_counts_due_cards_by_due_at(self):
+        due, later = (
+            Card.objects.create(deck=self.deck, front_text=text, back_text="A") for text in "QR"
+        )
+        CardSRS.objects.filter(card=later).update(due_at=timezone.now() + timedelta(days=5))
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("decks"))
+
+        deck = response.context["decks"][0]
+        self.assertEqual((deck.today_cards, deck.total_cards), (1, 2))
+
+
+class EagerSRSMigrationTests(MigrationTestCase):
+    migrate_from = "0010_cardsrs_version"
+    migrate_to = "0011_eager_cardsrs"
+
+    def setUpBeforeMigration(self, apps):
+        user = apps.get_model("auth", "User").objects.create(username="author")
+        deck = apps.get_model("cards", "Deck").objects.create(user_id=user.id, title="Deck")
+        Card = apps.get_model("cards", "Card")
+        # Historical models skip the post_save receiver, as old code did.
+        self.unanswered = Card.objects.create(deck=deck, front_text="New", back_text="b").id
+        answered = Card.objects.create(deck=deck, front_text="Seen", back_text="b")
+        apps.get_model("cards", "CardSRS").objects.create(
+            card=answered, repetitions=3, due_at=answered.created_at
+        )
+
+    def test_unanswered_cards_get_a_row_due_at_creation(self):
+        Card = self.apps.get_model("cards", "Card")
+        CardSRS = self.apps.get_model("cards", "CardSRS")
+
+        state = CardSRS.objects.get(card_id=self.unanswered)
+        self.assertEqual(state.due_at, Card.objects.get(id=self.unanswered).created_at)
+        self.assertEqual(CardSRS.objects.count(), 2)
+        self.assertEqual(CardSRS.objects.exclude(card_id=self.unanswered).get().repetitions, 3)
+
+
+class AnalyticsCacheTests(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = Path(cache_dir.name)
+        settings_override = override_settings(ANALYTICS_CACHE_DIR=cache_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user("learner")
+        self.deck = Deck.objects.create(user=self.user, title="Deck")
+        for index in range(5):
+            Card.objects.create(deck=self.deck, front_text=f"Q{index}", back_text="A")
+
+    def assertSnapshotCurrent(self, user):
+        arrays = cached_srs_arrays(user)
+        self.assertEqual(
+            sorted(zip(arrays["card_id"].tolist(), arrays["deck_id"].tolist())),
+            list(CardSRS.objects.filter(user=user).order_by("card_id").values_list("card_id", "deck_id")),
+        )
+
+    def test_arrays_are_written_once_and_reused(self):
+        arrays = cached_srs_arrays(self.user)
+
+        self.assertEqual(len(arrays["card_id"]), 5)
+        self.assertEqual([path.name.startswith("srs-") for path in self.cache_dir.iterdir()], [True])
+        with self.assertNumQueries(1):  # Only the fingerprint.
+            again = cached_srs_arrays(self.user)
+        self.assertEqual(sorted(again["card_id"]), sorted(arrays["card_id"]))
+
+    def test_answer_replaces_the_snapshot(self):
+        cached_srs_arrays(self.user)
+        CardSRS.objects.filter(user=self.user).update(repetitions=1, version=1)
+
+        arrays = cached_srs_arrays(self.user)
+
+        self.assertEqual(arrays["repetitions"].tolist(), [1] * 5)
+        self.assertEqual(len(list(self.cache_dir.iterdir())), 1)
+
+    def test_replaced_card_replaces_the_snapshot(self):
+        cached_srs_arrays(self.user)
+        # Same row count and the same (zero) versions as before.
+        Card.objects.filter(front_text="Q4").delete()
+        Card.objects.create(deck=self.deck, front_text="Q5", back_text="A")
+
+        self.assertSnapshotCurrent(self.user)
+
+    def test_deck_move_replaces_the_snapshot(self):
+        other = Deck.objects.create(user=self.user, title="Other")
+        cached_srs_arrays(self.user)
+        card = Card.objects.get(front_text="Q0")
+        card.deck = other
+        card.save()
+
+        self.assertSnapshotCurrent(self.user)
+
+    def test_copy_on_write_replaces_the_snapshot(self):
+        subscriber = User.objects.create_user("subscriber")
+        deck = subscribe(subscriber, self.deck)
+        cached_srs_arrays(subscriber)
+        card = Card.objects.get(front_text="Q0")
+        card.back_text = "B"
+        copy_on_write(card, deck)
+
+        self.assertSnapshotCurrent(subscriber)
+
+    def test_card_added_during_the_load_is_left_for_the_next_one(self):
+        def card_added_after_count(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if "COUNT(" in sql and not hasattr(self, "raced"):
+                self.raced = True
+                Card.objects.create(deck=self.deck, front_text="Late", back_text="A")
+            return result
+
+        with connection.execute_wrapper(card_added_after_count):
+            arrays = load_srs_arrays(self.user)
+
+        self.assertEqual(len(arrays["card_id"]), 5)
+        self.assertEqual(len(load_srs_arrays(self.user)["card_id"]), 6)
+
+    def test_statistics(self):
+        CardSRS.objects.filter(user=self.user, card__front_text="Q0").update(
+            repetitions=3, lapses=1, interval_days=30,
+        )
+        start_of_today = datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        stats = srs_statistics(cached_srs_arrays(self.user), start_of_today)
+
+        self.assertEqual(stats["cards"], 5)
+        self.assertEqual(stats["due_today"], 5)
+        self.assertEqual(stats["new"], 4)
+        self.assertEqual(stats["mature"], 1)
+        self.assertEqual(stats["retention"], 0.75)
+
+
+class LoadBalancingTests(TestCase):
+    NOW = datetime(2026, 3, 2, 12, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("learner")
+        self.deck = Deck.objects.create(user=self.user, title="Deck")
+        self.day = StudyDay(dt_timezone.utc, now=self.NOW)
+
+    def set_loads(self, loads):
+        """Make ``loads[offset]`` cards due ``offset`` days from now."""
+
+        for offset, count in loads.items():
+            for index in range(count):
+                card = Card.objects.create(deck=self.deck, front_text=f"{offset}-{index}", back_text="b")
+                CardSRS.objects.filter(card=card).update(due_at=self.NOW + timedelta(days=offset))
+
+    def test_tolerance_grows_with_the_interval(self):
+        self.assertEqual([tolerance_days(days) for days in (1, 2, 3, 20, 60, 365)], [0, 0, 1, 2, 6, 14])
+
+    def test_due_date_moves_to_the_lightest_day_in_the_window(self):
+        # Interval 20 days: tolerance 2, so days 18..22 are candidates.
+        self.set_loads({17: 0, 18: 3, 19: 2, 20: 5, 21: 1, 22: 4, 23: 0})
+
+        balanced = balance_due_at(self.user.id, self.NOW + timedelta(days=20), self.day)
+
+        self.assertEqual(balanced, self.NOW + timedelta(days=21))
+
+    def test_short_intervals_are_not_moved(self):
+        self.set_loads({2: 4})
+        due_at = self.NOW + timedelta(days=2)
+
+        self.assertEqual(balance_due_at(self.user.id, due_at, self.day), due_at)
+
+    @override_settings(LOAD_BALANCE_DUE_DATES=False)
+    def test_balancing_can_be_switched_off(self):
+        self.set_loads({20: 5})
+        due_at = self.NOW + timedelta(days=20)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(balance_due_at(self.user.id, due_at, self.day), due_at)
+
+    def test_answers_update_the_cached_histogram(self):
+        self.set_loads({19: 1, 20: 1, 21: 1})
+        first, last = self.day.date + timedelta(days=19), self.day.date + timedelta(days=21)
+        due_load(self.user.id, self.day, first, last)
+
+        record_due(self.user.id, self.NOW + timedelta(days=20), self.day)
+        with self.assertNumQueries(0):
+            loads = due_load(self.user.id, self.day, first, last)
+
+        self.assertEqual(list(loads.values()), [1, 2, 1])
+
+
+class StudyDayTests(TestCase):
+    NEW_YORK = "America/New_York"
+
+    def at(self, *args):
+        return datetime(*args, tzinfo=dt_timezone.utc)
+
+    def test_day_follows_the_users_zone(self):
+        # 02:00 UTC on the 10th is still the evening of the 9th in New York.
+        day = StudyDay(ZoneInfo(self.NEW_YORK), now=self.at(2026, 1, 10, 2))
+
+        self.assertEqual(day.date.isoformat(), "2026-01-09")
+        self.assertEqual(day.start, self.at(2026, 1, 9, 5))
+        self.assertEqual(day.end, self.at(2026, 1, 10, 5))
+
+    def test_rollover_hour_extends_the_evening(self):
+        zone = ZoneInfo(self.NEW_YORK)
+        before = StudyDay(zone, rollover_hour=4, now=self.at(2026, 1, 10, 8, 59))
+        after = StudyDay(zone, rollover_hour=4, now=self.at(2026, 1, 10, 9))
+
+        self.assertEqual(before.date.isoformat(), "2026-01-09")
+        self.assertEqual(after.date.isoformat(), "2026-01-10")
+        self.assertEqual(before.end, after.start)
+        self.assertEqual(after.start, self.at(2026, 1, 10, 9))
+
+    def test_daylight_saving_day_is_short(self):
+        day = StudyDay(ZoneInfo(self.NEW_YORK), now=self.at(2026, 3, 8, 12))
+
+        # Same-zone subtraction is wall-clock time; compare instants in UTC.
+        utc = dt_timezone.utc
+        self.assertEqual(day.end.astimezone(utc) - day.start.astimezone(utc), timedelta(hours=23))
+
+    def test_profile_sets_the_day(self):
+        user = User.objects.create_user("learner@example.com")
+        self.assertFalse(study_day_for_user(user).configured)
+
+        UserProfile.objects.create(user=user, timezone=self.NEW_YORK, day_rollover_hour=3)
+        day = study_day_for_user(user, now=self.at(2026, 1, 10, 7))
+
+        self.assertTrue(day.configured)
+        self.assertEqual(day.date.isoformat(), "2026-01-09")
+
+    def test_update_study_day_validates_input(self):
+        user = User.objects.create_user("learner@example.com")
+        self.client.force_login(user)
+        url = reverse("update_study_day")
+
+        self.assertEqual(self.client.post(url, {"timezone": "Mars/Olympus"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"day_rollover_hour": "24"}).status_code, 400)
+        response = self.client.post(url, {"timezone": self.NEW_YORK, "day_rollover_hour": "4"})
+
+        self.assertEqual(response.json(), {"ok": True, "timezone": self.NEW_YORK, "day_rollover_hour": 4})
+
+
+class LibraryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.publisher = User.objects.create_user("publisher@example.com")
+        self.source = make_deck(self.publisher, "Capitals", cards=2, is_public=True)
+        self.learner = User.objects.create_user("learner@example.com")
+        self.client.force_login(self.learner)
+
+    def test_subscribing_adds_srs_rows_not_cards(self):
+        response = self.client.post(reverse("subscribe_deck", args=[self.source.id]))
+        again = self.client.post(reverse("subscribe_deck", args=[self.source.id]))
+
+        deck_id = response.json()["deck"]["id"]
+        self.assertEqual(again.json()["deck"]["id"], deck_id)
+        self.assertEqual(Card.objects.filter(deck_id=deck_id).count(), 0)
+        self.assertEqual(
+            set(CardSRS.objects.filter(user=self.learner, deck_id=deck_id).values_list("card_id", flat=True)),
+            set(Card.objects.filter(deck=self.source).values_list("id", flat=True)),
+        )
+
+    def test_new_source_cards_reach_subscribers(self):
+        deck = subscribe(self.learner, self.source)
+
+        card = Card.objects.create(deck=self.source, front_text="Peru", back_text="Lima")
+
+        self.assertEqual(
+            set(CardSRS.objects.filter(card=card).values_list("user_id", "deck_id")),
+            {(self.publisher.id, self.source.id), (self.learner.id, deck.id)},
+        )
+
+    def test_every_srs_row_follows_a_moved_card(self):
+        target = make_deck(self.publisher, "Rivers", is_public=True)
+        learner_source, learner_target = subscribe(self.learner, self.source), subscribe(self.learner, target)
+        only_source = User.objects.create_user("other@example.com")
+        subscribe(only_source, self.source)
+        only_target = User.objects.create_user("third@example.com")
+        third_target = subscribe(only_target, target)
+        card = Card.objects.filter(deck=self.source).first()
+        CardSRS.objects.filter(card=card, user=self.learner).update(repetitions=4)
+
+        card.deck = target
+        card.save()
+
+        self.assertEqual(
+            set(CardSRS.objects.filter(card=card).values_list("user_id", "deck_id")),
+            {
+                (self.publisher.id, target.id),
+                (self.learner.id, learner_target.id),
+                (only_target.id, third_target.id),
+            },
+        )
+        self.assertEqual(CardSRS.objects.get(card=card, user=self.learner).repetitions, 4)
+        self.assertFalse(CardSRS.objects.filter(deck=learner_source, card=card).exists())
+
+    def test_answers_only_touch_the_subscribers_row(self):
+        deck = subscribe(self.learner, self.source)
+        card = Card.objects.filter(deck=self.source).first()
+
+        response = self.client.post(
+            reverse("review_answer", args=[deck.id]),
+            json.dumps({"card_id": card.id, "is_right": True}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CardSRS.objects.get(card=card, user=self.learner).repetitions, 1)
+        self.assertEqual(CardSRS.objects.get(card=card, user=self.publisher).repetitions, 0)
+
+    def test_editing_a_shared_card_copies_it(self):
+        deck = subscribe(self.learner, self.source)
+        shared = Card.objects.filter(deck=self.source).first()
+        CardSRS.objects.filter(card=shared, user=self.learner).update(repetitions=4)
+
+        edited = Card.objects.get(id=shared.id)
+        edited.back_text = "My answer"
+        copy = copy_on_write(edited, deck)
+
+        self.assertNotEqual(copy.id, shared.id)
+        self.assertEqual((copy.deck_id, copy.origin_id), (deck.id, shared.id))
+        self.assertEqual(Card.objects.get(id=shared.id).back_text, "back")
+        self.assertEqual(CardSRS.objects.get(card=copy, user=self.learner).repetitions, 4)
+        self.assertFalse(CardSRS.objects.filter(card=shared, user=self.learner).exists())
+
+    def test_library_lists_other_users_public_decks(self):
+        make_deck(self.learner, "Own", is_public=True)
+        make_deck(self.publisher, "Private")
+        subscribe(self.learner, self.source)
+
+        decks = self.client.get(reverse("library")).json()["decks"]
+
+        self.assertEqual(
+            [(deck["id"], deck["cards"], deck["subscribed"]) for deck in decks],
+            [(self.source.id, 2, True)],
+        )
+
+    def test_subscriptions_cannot_be_published(self):
+        deck = subscribe(self.learner, self.source)
+
+        response = self.client.post(reverse("publish_deck", args=[deck.id]))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Deck.objects.get(id=deck.id).is_public)
+
+
+class SRSOwnerMigrationTests(MigrationTestCase):
+    migrate_from = "0012_user_profile"
+    migrate_to = "0013_shared_library"
+
+    def setUpBeforeMigration(self, apps):
+        self.user_id = apps.get_model("auth", "User").objects.create(username="author").id
+        deck = apps.get_model("cards", "Deck").objects.create(user_id=self.user_id, title="Deck")
+        self.deck_id = deck.id
+        card = apps.get_model("cards", "Card").objects.create(deck=deck, front_text="Q", back_text="A")
+        apps.get_model("cards", "CardSRS").objects.create(card=card, due_at=card.created_at)
+
+    def test_rows_take_user_and_deck_from_their_card(self):
+        state = self.apps.get_model("cards", "CardSRS").objects.get()
+
+        self.assertEqual((state.user_id, state.deck_id), (self.user_id, self.deck_id))
+
+
+class CardOwnerTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner@example.com")
+        self.other = User.objects.create_user("other@example.com")
+        self.deck = make_deck(self.owner, "Deck", cards=1)
+        self.card = Card.objects.get(deck=self.deck)
+
+    def test_card_takes_its_decks_owner(self):
+        self.assertEqual(self.card.user_id, self.owner.id)
+
+    def test_moved_card_takes_its_srs_row_along(self):
+        target = make_deck(self.other, "Target")
+
+        self.card.deck = target
+        self.card.save(update_fields=["deck"])
+
+        self.assertEqual(Card.objects.get(id=self.card.id).user_id, self.other.id)
+        self.assertEqual(
+            list(CardSRS.objects.filter(card=self.card).values_list("user_id", "deck_id")),
+            [(self.other.id, target.id)],
+        )
+
+    def test_deck_changing_hands_repoints_cards_and_rows(self):
+        self.deck.user = self.other
+        self.deck.save()
+
+        self.assertEqual(Card.objects.get(id=self.card.id).user_id, self.other.id)
+        self.assertEqual(CardSRS.objects.get(card=self.card).user_id, self.other.id)
+
+
+class CardOwnerMigrationTests(MigrationTestCase):
+    migrate_from = "0014_srs_per_user"
+    migrate_to = "0015_card_user"
+
+    def setUpBeforeMigration(self, apps):
+        User = apps.get_model("auth", "User")
+        Deck = apps.get_model("cards", "Deck")
+        self.owners = {}
+        for name in ("first", "second"):
+            deck = Deck.objects.create(user=User.objects.create(username=name), title=name)
+            card = apps.get_model("cards", "Card").objects.create(deck=deck, front_text="Q", back_text="A")
+            self.owners[card.id] = deck.user_id
+
+    def test_cards_take_their_decks_owner(self):
+        Card = self.apps.get_model("cards", "Card")
+
+        self.assertEqual(dict(Card.objects.values_list("id", "user_id")), self.owners)
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        patcher = mock.patch("nerdeck_project.db_routing.replica_configured", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_alias(self, model=Card):
+        # Test cases run inside a transaction, which alone keeps reads on the primary.
+        with mock.patch.object(connection, "in_atomic_block", False):
+            return self.router.db_for_read(model)
+
+    def test_only_opted_in_reads_use_the_replica(self):
+        self.assertIsNone(self.read_alias())
+        with replica_reads():
+            self.assertEqual(self.read_alias(), REPLICA_ALIAS)
+            self.assertIsNone(self.read_alias(User))
+
+    def test_pinned_or_writing_requests_read_the_primary(self):
+        with replica_reads():
+            with request_state(pinned=True):
+                self.assertIsNone(self.read_alias())
+            with request_state(pinned=False):
+                self.assertEqual(self.read_alias(), REPLICA_ALIAS)
+                self.router.db_for_write(Card)
+                self.assertIsNone(self.read_alias())
+
+    def test_reads_in_a_transaction_stay_on_the_primary(self):
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Card))
+
+    @mock.patch("nerdeck_project.middleware.replica_configured", return_value=True)
+    def test_writes_pin_the_client_to_the_primary(self, _):
+        self.client.force_login(User.objects.create_user("learner@example.com"))
+
+        read = self.client.get(reverse("library"))
+        write = self.client.post(reverse("update_study_day"), {"timezone": "UTC"})
+
+        self.assertNotIn(REPLICA_PIN_COOKIE, read.cookies)
+        self.assertEqual(write.cookies[REPLICA_PIN_COOKIE]["max-age"], settings.REPLICA_PIN_SECONDS)
+
+
+class GunicornConfigTests(TestCase):
+    def load(self, **env):
+        # Start from none of the dyno's own WEB_* settings.
+        base = {name: value for name, value in os.environ.items() if not name.startswith("WEB_")}
+        with (
+            mock.patch.dict(os.environ, {**base, **env}, clear=True),
+            mock.patch("multiprocessing.cpu_count", return_value=2),
+        ):
+            return runpy.run_path(str(settings.BASE_DIR / "gunicorn.conf.py"))
+
+    def test_threaded_workers_by_default(self):
+        config = self.load(PORT="5000")
+
+        self.assertEqual(config["bind"], "0.0.0.0:5000")
+        self.assertEqual((config["worker_class"], config["threads"], config["workers"]), ("gthread", 4, 3))
+        self.assertTrue(config["preload_app"])
+
+    def test_sync_workers_use_one_thread(self):
+        config = self.load(WEB_WORKER_CLASS="sync", WEB_THREADS="8")
+
+        self.assertEqual((config["threads"], config["workers"]), (1, 5))
+
+    def test_environment_overrides(self):
+        config = self.load(WEB_CONCURRENCY="7", WEB_PRELOAD="0", WEB_TIMEOUT="15")
+
+        self.assertEqual((config["workers"], config["preload_app"], config["timeout"]), (7, False, 15))
+
+    def test_several_workers_need_a_shared_cache(self):
+        on_starting = self.load()["on_starting"]
+        server = mock.Mock()
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+        with override_settings(CACHES={"default": local}):
+            server.cfg.workers = 3
+            with self.assertRaises(ImproperlyConfigured):
+                on_starting(server)
+            server.cfg.workers = 1
+            on_starting(server)
+
+        server.cfg.workers = 3
+        with tempfile.TemporaryDirectory() as location:
+            shared = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location}
+            with override_settings(CACHES={"default": shared}):
+                on_starting(server)
+
+
+class ProfileStartupTests(TestCase):
+    def test_importtime_lines_are_parsed(self):
+        stderr = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   _io",
+            "import time:      2500 |       9000 | django",
+            "unrelated warning",
+        ])
+
+        self.assertEqual(
+            list(_parse_importtime(stderr)),
+            [("_io", 120, 120, 1), ("django", 2500, 9000, 0)],
+        )
+
+    def test_reports_every_stage(self):
+        out = StringIO()
+
+        call_command("profile_startup", repeat=1, top=3, stdout=out)
+
+        report = out.getvalue()
+        for stage in ("settings", "django.setup()", "URL resolver", "middleware", "first request"):
+            self.assertIn(stage, report)
+        self.assertIn("first response: 200 OK", report)
+
+
+class MonitoringTests(TestCase):
+    def setUp(self):
+        # Scrape-time gauges are cached per process; start each test cold.
+        patcher = mock.patch.dict(monitoring._gauge_cache, expires=0.0, values=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def counter(self, name, **labels):
+        return sum(
+            value for (_, key), value in metrics.counter_values(name)
+            if labels.items() <= dict(key).items()
+        )
+
+    def test_histograms_render_cumulative_buckets(self):
+        for value in (0.5, 2, 7):
+            metrics.observe("test_render_seconds", "Test histogram.", value, (1, 5), view="v")
+
+        rendered = metrics.render([("test_render_gauge", "Test gauge.", {"name": 'a"b'}, 3)])
+
+        self.assertIn('test_render_seconds_bucket{worker="%d",view="v",le="1"} 1' % os.getpid(), rendered)
+        self.assertIn('test_render_seconds_bucket{worker="%d",view="v",le="5"} 2' % os.getpid(), rendered)
+        self.assertIn('test_render_seconds_count{worker="%d",view="v"} 3' % os.getpid(), rendered)
+        self.assertIn('test_render_gauge{worker="%d",name="a\\"b"} 3' % os.getpid(), rendered)
+
+    def test_requests_are_counted_per_view(self):
+        before = self.counter("nerdeck_http_requests_total", view="api_health", status=200)
+
+        self.client.get(reverse("api_health"))
+
+        self.assertEqual(
+            self.counter("nerdeck_http_requests_total", view="api_health", status=200), before + 1
+        )
+
+    def test_cache_lookups_are_counted(self):
+        def lookups():
+            return [
+                self.counter("nerdeck_cache_lookups_total", cache="nerdecks", result=result)
+                for result in ("hit", "miss")
+            ]
+
+        hits, misses = lookups()
+        cache.set("monitoring-key", 1)
+
+        cache.get("monitoring-key")
+        cache.get("monitoring-missing")
+
+        self.assertEqual(lookups(), [hits + 1, misses + 1])
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_metrics_need_the_token(self):
+        url = reverse("api_metrics")
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(url, headers={"Authorization": "Bearer scrape-secret"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'nerdeck_pending_tasks{worker="%d",task="gc_media"} 0' % os.getpid(), response.content)
+        self.assertIn(b"nerdeck_reviews_last_minute", response.content)
+
+    def test_ready_when_database_and_cache_work(self):
+        response = self.client.get(reverse("api_ready"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["checks"]["migrations"], "applied")
+        self.assertEqual(response.json()["checks"]["cache"], "ok")
+
+    def test_not_ready_when_the_cache_fails(self):
+        with mock.patch.object(monitoring.cache, "get", return_value=None):
+            response = self.client.get(reverse("api_ready"))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "unavailable")
+
+
+class TagExpressionTests(TestCase):
+    def test_not_binds_tighter_than_and_than_or(self):
+        self.assertEqual(
+            parse_tag_expression("a OR not b c"),
+            ("or", [("tag", "a"), ("and", [("not", ("tag", "b")), ("tag", "c")])]),
+        )
+
+    def test_parentheses_group(self):
+        self.assertEqual(
+            parse_tag_expression("Verbs AND NOT (irregular OR archaic)"),
+            ("and", [
+                ("tag", "verbs"),
+                ("not", ("or", [("tag", "irregular"), ("tag", "archaic")])),
+            ]),
+        )
+
+    def test_malformed_expressions_are_rejected(self):
+        for expression in ("", "a AND", "(a OR b", "a )", "OR a", "a b$", "NOT"):
+            with self.subTest(expression=expression), self.assertRaises(TagError):
+                parse_tag_expression(expression)
+
+    def test_term_count_is_bounded(self):
+        parse_tag_expression(" ".join(f"t{index}" for index in range(MAX_EXPRESSION_TERMS)))
+
+        with self.assertRaises(TagError):
+            parse_tag_expression(" ".join(f"t{index}" for index in range(MAX_EXPRESSION_TERMS + 1)))
+
+    def test_tag_names_are_normalized(self):
+        self.assertEqual(parse_tag_names("Verbs, lang:de  verbs"), {"verbs", "lang:de"})
+        for names in ("and", "a" * 65, "bad#tag"):
+            with self.subTest(names=names), self.assertRaises(TagError):
+                parse_tag_names(names)
+
+
+class CardTagTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("learner@example.com")
+        self.deck = make_deck(self.user, "Deck", cards=3)
+        self.first, self.second, self.third = Card.objects.filter(deck=self.deck).order_by("id")
+        set_card_tags(self.user, self.first, {"verbs", "irregular"})
+        set_card_tags(self.user, self.second, {"verbs"})
+        set_card_tags(self.user, self.third, {"nouns"})
+
+    def matching(self, expression, user_id=None):
+        user_id = self.user.id if user_id is None else user_id
+        states = CardSRS.objects.filter(user=self.user).filter(tag_filter(expression, user_id))
+        return set(states.values_list("card_id", flat=True))
+
+    def test_expressions_filter_cards(self):
+        self.assertEqual(self.matching("verbs AND NOT irregular"), {self.second.id})
+        self.assertEqual(self.matching("irregular OR nouns"), {self.first.id, self.third.id})
+        self.assertEqual(self.matching("NOT verbs"), {self.third.id})
+        self.assertEqual(self.matching("missing"), set())
+
+    def test_other_users_tags_do_not_match(self):
+        other = User.objects.create_user("other@example.com")
+
+        self.assertEqual(self.matching("verbs", user_id=other.id), set())
+
+    def test_expression_filter_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.matching("verbs AND NOT (irregular OR nouns)")
+
+    def test_counters_follow_tag_changes(self):
+        set_card_tags(self.user, self.first, {"verbs", "nouns"})
+        self.third.delete()
+
+        self.assertEqual(list(tag_counts(self.user)), [("nouns", 1), ("verbs", 2)])
+        self.assertEqual(Tag.objects.get(user=self.user, name="irregular").card_count, 0)
+
+    def test_concurrent_edit_of_the_same_card_counts_each_link_once(self):
+        def other_request_first(execute, sql, params, many, context):
+            # The same edit, from another tab, lands just before this one writes.
+            if sql.startswith("DELETE") and "cards_cardtag" in sql and not hasattr(self, "raced"):
+                self.raced = True
+                set_card_tags(self.user, self.second, {"nouns"})
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(other_request_first):
+            set_card_tags(self.user, self.second, {"nouns"})
+
+        self.assertTrue(self.raced)
+        self.assertEqual(list(tag_counts(self.user)), [("irregular", 1), ("nouns", 2), ("verbs", 1)])
+
+    def test_search_rejects_bad_expressions(self):
+        self.client.force_login(self.user)
+
+        bad = self.client.get(reverse("card_search"), {"tags": "verbs AND ("})
+        good = self.client.get(reverse("card_search"), {"tags": "verbs AND NOT irregular"})
+
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual([card["id"] for card in good.json()["cards"]], [self.second.id])
+        self.assertEqual(good.json()["cards"][0]["tags"], ["verbs"])
+
+
+class NoteCardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("learner@example.com")
+        self.deck = make_deck(self.user, "Deck")
+
+    def note(self, front_text, back_text="", kind="cloze", **fields):
+        return Note(deck=self.deck, kind=kind, front_text=front_text, back_text=back_text, **fields)
+
+    def cards_by_ordinal(self, note):
+        return {card.ordinal: card for card in Card.objects.filter(note=note)}
+
+    def test_basic_notes_make_one_or_two_cards(self):
+        self.assertEqual(card_sides(self.note("Q", "A", kind="basic")), {0: ("Q", "A")})
+        self.assertEqual(
+            card_sides(self.note("Q", "A", kind="basic_reverse")), {0: ("Q", "A"), 1: ("A", "Q")}
+        )
+
+    def test_cloze_makes_one_card_per_deletion(self):
+        sides = card_sides(self.note(
+            "{{c1::Paris}} is the capital of {{c2::France::country}}.", "Extra",
+            content_format="markdown",
+        ))
+
+        self.assertEqual(sides, {
+            1: ("[...] is the capital of France.", "**Paris** is the capital of France.\n\nExtra"),
+            2: ("Paris is the capital of [country].", "Paris is the capital of **France**.\n\nExtra"),
+        })
+
+    def test_invalid_notes_are_rejected(self):
+        for note in (
+            self.note("No deletions here"),
+            self.note("{{c0::zero}}"),
+            self.note("{{c101::too far}}"),
+            self.note("Q", kind="basic"),
+        ):
+            with self.subTest(front=note.front_text), self.assertRaises(NoteError):
+                card_sides(note)
+
+    def test_ordinals_are_sorted_and_unique(self):
+        self.assertEqual(cloze_ordinals("{{c3::a}} {{c1::b}} {{c3::c}}"), [1, 3])
+
+    def test_create_notes_adds_cards_with_srs_rows(self):
+        cards = create_notes([self.note("{{c1::a}} {{c2::b}}"), self.note("Q", "A", kind="basic")])
+
+        self.assertEqual(len(cards), 3)
+        self.assertEqual(CardSRS.objects.filter(card__in=cards, user=self.user).count(), 3)
+        self.assertEqual(set(Note.objects.values_list("user_id", flat=True)), {self.user.id})
+
+    def test_edit_only_rewrites_changed_ordinals(self):
+        note = self.note("{{c1::Paris}} and {{c2::Rome}}")
+        create_notes([note])
+        before = self.cards_by_ordinal(note)
+        CardSRS.objects.filter(card=before[1]).update(repetitions=5)
+
+        # c1's own text is unchanged, but its front still shows c2's answer.
+        note.front_text = "{{c1::Paris}} and {{c2::Berlin}} and {{c3::Madrid}}"
+        note.save()
+        self.assertEqual(sync_note_cards(note), (1, 2, 0))
+
+        note.front_text = "{{c2::Berlin}} and {{c3::Madrid}}"
+        note.save()
+        self.assertEqual(sync_note_cards(note), (0, 2, 1))
+
+        after = self.cards_by_ordinal(note)
+        self.assertEqual(set(after), {2, 3})
+        self.assertEqual(after[2].id, before[2].id)
+        self.assertEqual(after[2].sides(), ("[...] and Madrid", "Berlin and Madrid"))
+        self.assertEqual(after[2].front_html, render_content("[...] and Madrid", "plain"))
+        self.assertFalse(Card.objects.filter(id=before[1].id).exists())
+
+    def test_cards_keep_no_copy_of_the_note_text(self):
+        note = self.note("{{c1::Paris}} is in France", "Extra")
+        create_notes([note])
+        card = Card.objects.get(note=note)
+
+        self.assertEqual((card.front_text, card.back_text), ("", ""))
+        self.assertEqual(card.sides(), ("[...] is in France", "Paris is in France\n\nExtra"))
+        self.assertEqual(card.front_hash, front_text_hash("[...] is in France"))
+
+    def test_search_matches_the_generated_front(self):
+        note = self.note("Hund", "dog", kind="basic_reverse")
+        create_notes([note])
+        reverse_card = self.cards_by_ordinal(note)[1]
+        self.client.force_login(self.user)
+
+        found = self.client.get(reverse("card_search"), {"q": "do"}).json()["cards"]
+
+        self.assertEqual([(item["id"], item["front"]) for item in found], [(reverse_card.id, "dog")])
+
+    def test_moving_the_note_moves_its_cards_and_srs_rows(self):
+        other = make_deck(self.user, "Other")
+        note = self.note("Q", "A", kind="basic_reverse")
+        create_notes([note])
+
+        note.deck = other
+        note.save()
+        self.assertEqual(sync_note_cards(note), (0, 2, 0))
+
+        self.assertEqual(set(Card.objects.filter(note=note).values_list("deck_id", flat=True)), {other.id})
+        self.assertEqual(
+            list(CardSRS.objects.filter(card__note=note).values_list("deck_id", flat=True)),
+            [other.id, other.id],
+        )
+
+    def test_copy_of_a_shared_note_card_gets_the_text(self):
+        note = self.note("Q", "A", kind="basic")
+        create_notes([note])
+        deck = subscribe(User.objects.create_user("subscriber@example.com"), self.deck)
+
+        copy = copy_on_write(Card.objects.get(note=note), deck)
+
+        self.assertIsNone(copy.note_id)
+        self.assertEqual((copy.front_text, copy.back_text), ("Q", "A"))
+
+    def test_unchanged_note_writes_nothing(self):
+        note = self.note("{{c1::a}} {{c2::b}}")
+        create_notes([note])
+        states = dict(CardSRS.objects.filter(card__note=note).values_list("card_id", "version"))
+
+        # The card SELECT; the rest is the empty atomic block's savepoint.
+        with self.assertNumQueries(3):
+            self.assertEqual(sync_note_cards(note), (0, 0, 0))
+        self.assertEqual(
+            dict(CardSRS.objects.filter(card__note=note).values_list("card_id", "version")), states
+        )
+
+
+class MoveFolderTests(FolderInvariantsMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner", password="pw")
+        self.top = Folder.objects.create(user=self.user, name="Top")
+        self.middle = Folder.objects.create(user=self.user, name="Middle", parent=self.top)
+        self.leaf = Folder.objects.create(user=self.user, name="Leaf", parent=self.middle)
+        self.other = Folder.objects.create(user=self.user, name="Other")
+
+    def move(self, folder_id, parent_folder_id):
+        response = post_json(
+            move_folder,
+            self.user,
+            {"folder_id": folder_id, "parent_folder_id": parent_folder_id},
+        )
+        return response.status_code, json.loads(response.content)
+
+    def test_subtree_moves_with_its_folder(self):
+        status, body = self.move(self.middle.id, self.other.id)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body["folder"]["parent_id"], self.other.id)
+        self.assertTrue(
+            FolderClosure.objects.filter(ancestor=self.other, descendant=self.leaf, depth=2).exists()
+        )
+        self.assertFalse(FolderClosure.objects.filter(ancestor=self.top, descendant=self.leaf).exists())
+        self.assertClosureConsistent(self.user)
+
+    def test_move_to_top_level(self):
+        status, body = self.move(str(self.middle.id), None)
+
+        self.assertEqual(status, 200)
+        self.assertIsNone(Folder.objects.get(id=self.middle.id).parent_id)
+        self.assertClosureConsistent(self.user)
+
+    def test_move_inside_own_subtree_is_rejected(self):
+        status, body = self.move(self.top.id, self.leaf.id)
+
+        self.assertEqual(status, 400)
+        self.assertIsNone(Folder.objects.get(id=self.top.id).parent_id)
+        self.assertClosureConsistent(self.user)
+
+    def test_malformed_ids_are_rejected(self):
+        self.assertEqual(self.move("abc", None)[0], 400)
+        self.assertEqual(self.move(self.middle.id, "abc")[0], 400)
+        self.assertEqual(self.move(self.middle.id, [1])[0], 400)
+        self.assertEqual(self.move(999999, None)[0], 404)
+
+
+class FolderTreeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("learner@example.com")
+        self.subject = Folder.objects.create(user=self.user, name="Subject", sort_order=0)
+        self.course = Folder.objects.create(user=self.user, name="Course", parent=self.subject)
+        self.chapter = Folder.objects.create(user=self.user, name="Chapter", parent=self.course)
+        self.other = Folder.objects.create(user=self.user, name="Other", sort_order=1)
+
+    def test_tree_lists_each_folder_before_its_subtree(self):
+        folders = Folder.objects.filter(user=self.user).order_by("sort_order", "name")
+
+        self.assertEqual(
+            [(folder.name, depth) for folder, depth in folder_tree(folders)],
+            [("Subject", 0), ("Course", 1), ("Chapter", 2), ("Other", 0)],
+        )
+
+    def test_subtree_is_one_closure_lookup(self):
+        self.assertEqual(
+            set(Folder.objects.filter(id__in=subtree_ids(self.course.id)).values_list("name", flat=True)),
+            {"Course", "Chapter"},
+        )
+        self.assertEqual(
+            FolderClosure.objects.get(ancestor=self.subject, descendant=self.chapter).depth, 2
+        )
+
+    def test_counts_roll_up_to_every_ancestor(self):
+        decks = [
+            make_deck(self.user, "Deep", folder=self.chapter),
+            make_deck(self.user, "Mid", folder=self.course),
+            make_deck(self.user, "Loose"),
+        ]
+        for deck, due, total in zip(decks, (2, 1, 7), (5, 3, 9)):
+            deck.today_cards, deck.total_cards = due, total
+
+        with self.assertNumQueries(1):
+            counts = rolled_up_counts(self.user, decks)
+
+        self.assertEqual(counts, {
+            self.subject.id: (3, 8),
+            self.course.id: (3, 8),
+            self.chapter.id: (2, 5),
+        })
+
+
+class FolderClosureMigrationTests(MigrationTestCase):
+    migrate_from = "0018_notes"
+    migrate_to = "0019_nested_folders"
+
+    def setUpBeforeMigration(self, apps):
+        user = apps.get_model("auth", "User").objects.create(username="author")
+        Folder = apps.get_model("cards", "Folder")
+        self.folder_ids = {Folder.objects.create(user=user, name=name).id for name in ("A", "B")}
+
+    def test_existing_folders_get_self_links(self):
+        FolderClosure = self.apps.get_model("cards", "FolderClosure")
+
+        self.assertEqual(
+            set(FolderClosure.objects.values_list("ancestor_id", "descendant_id", "depth")),
+            {(folder_id, folder_id, 0) for folder_id in self.folder_ids},
+        )
+
+
+class NoteCardTextMigrationTests(MigrationTestCase):
+    migrate_from = "0019_nested_folders"
+    migrate_to = "0020_note_cards_without_text"
+
+    def setUpBeforeMigration(self, apps):
+        user = apps.get_model("auth", "User").objects.create(username="author")
+        deck = apps.get_model("cards", "Deck").objects.create(user_id=user.id, title="Deck")
+        note = apps.get_model("cards", "Note").objects.create(
+            user_id=user.id, deck=deck, kind="basic", front_text="Q", back_text="A",
+        )
+        Card = apps.get_model("cards", "Card")
+        Card.objects.create(user_id=user.id, deck=deck, note=note, front_text="Q", back_text="A")
+        Card.objects.create(user_id=user.id, deck=deck, front_text="Own", back_text="card")
+
+    def test_note_cards_drop_their_text(self):
+        Card = self.apps.get_model("cards", "Card")
+
+        self.assertEqual(
+            {(card.note_id is None, card.front_text, card.back_text) for card in Card.objects.all()},
+            {(False, "", ""), (True, "Own", "card")},
+        )
+
+
+class OrganizeDecksTests(FolderInvariantsMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner", password="pw")
+        self.left = Folder.objects.create(user=self.user, name="Left")
+        self.right = Folder.objects.create(user=self.user, name="Right")
+        self.a = Deck.objects.create(user=self.user, title="A", folder=self.left)
+        self.b = Deck.objects.create(user=self.user, title="B", folder=self.left)
+        self.c = Deck.objects.create(user=self.user, title="C", folder=self.right)
+        self.loose = Deck.objects.create(user=self.user, title="Loose", sort_order=5)
+        self.other = Deck.objects.create(user=self.user, title="Other", sort_order=6)
+
+    def organize(self, **payload):
+        response = post_json(organize_decks, self.user, payload)
+        return response.status_code, json.loads(response.content)
+
+    def test_deck_onto_deck_in_other_folder_merges_folders(self):
+        # Savepoint, lock decks, lock folders, one UPDATE, the conditional
+        # DELETE and, because it deleted a folder, one statement each for
+        # its closure rows, sessions and archived decks, release.
+        with self.assertNumQueries(9):
+            status, body = self.organize(source_deck_id=self.a.id, target_deck_id=self.c.id)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body["folder"]["id"], self.right.id)
+        self.assertEqual(body["deleted_empty_folder_id"], self.left.id)
+        self.assertEqual(
+            set(Deck.objects.filter(folder=self.right).values_list("title", flat=True)),
+            {"A", "B", "C"},
+        )
+        self.assertClosureConsistent(self.user)
+        self.assertNoEmptyFolders(self.user)
+
+    def test_deck_onto_loose_deck_creates_folder(self):
+        status, body = self.organize(source_deck_id=self.loose.id, target_deck_id=self.other.id)
+
+        self.assertEqual(status, 200)
+        folder = Folder.objects.get(id=body["folder"]["id"])
+        self.assertEqual(folder.name, "Other + Loose")
+        self.assertEqual(
+            set(Deck.objects.filter(folder=folder).values_list("title", flat=True)),
+            {"Loose", "Other"},
+        )
+        self.assertClosureConsistent(self.user)
+
+    def test_deck_into_folder_keeps_source_folder_with_decks(self):
+        with self.assertNumQueries(6):
+            status, body = self.organize(source_deck_id=self.a.id, target_folder_id=self.right.id)
+
+        self.assertEqual(status, 200)
+        self.assertIsNone(body["deleted_empty_folder_id"])
+        self.assertEqual(Deck.objects.get(id=self.a.id).folder_id, self.right.id)
+        self.assertTrue(Folder.objects.filter(id=self.left.id).exists())
+
+    def test_deck_to_root_goes_first(self):
+        with self.assertNumQueries(9):
+            status, body = self.organize(source_deck_id=self.c.id, target_root=True)
+
+        self.assertEqual(status, 200)
+        self.assertIsNone(body["folder"])
+        self.assertEqual(body["deleted_empty_folder_id"], self.right.id)
+        self.assertEqual(Deck.objects.get(id=self.c.id).sort_order, 4)
+        self.assertClosureConsistent(self.user)
+        self.assertNoEmptyFolders(self.user)
+
+    def test_deck_into_folder_leaving_nonempty_folder_does_not_clean_up(self):
+        # Savepoint, lock decks, lock folders, UPDATE, conditional DELETE
+        # (no rows), release.
+        with self.assertNumQueries(6):
+            status, body = self.organize(source_deck_id=self.a.id, target_root=True)
+
+        self.assertEqual(status, 200)
+        self.assertIsNone(body["deleted_empty_folder_id"])
+
+    def test_deck_moved_in_before_cleanup_keeps_folder(self):
+        # Another request moves a deck into the folder this drag empties,
+        # after the drag's UPDATE but before its cleanup runs. No row lock
+        # is involved: the emptiness test is part of the DELETE itself.
+        def concurrent_move(execute, sql, params, many, context):
+            if sql.startswith('DELETE FROM "cards_folder"'):
+                connection.cursor().execute(
+                    'UPDATE "cards_deck" SET "folder_id" = %s WHERE "id" = %s',
+                    [self.right.id, self.loose.id],
+                )
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(concurrent_move):
+            status, body = self.organize(source_deck_id=self.c.id, target_root=True)
+
+        self.assertEqual(status, 200)
+        self.assertIsNone(body["deleted_empty_folder_id"])
+        self.assertEqual(Deck.objects.get(id=self.loose.id).folder_id, self.right.id)
+        self.assertClosureConsistent(self.user)
+        self.assertNoEmptyFolders(self.user)
+
+    def test_folder_with_subfolder_is_kept(self):
+        Folder.objects.create(user=self.user, name="Child", parent=self.right)
+
+        status, body = self.organize(source_deck_id=self.c.id, target_root=True)
+
+        self.assertEqual(status, 200)
+        self.assertIsNone(body["deleted_empty_folder_id"])
+        self.assertTrue(Folder.objects.filter(id=self.right.id).exists())
+
+    def test_folder_deleted_in_another_tab(self):
+        # The other tab emptied and removed the folder before this drop ran.
+        Deck.objects.filter(folder=self.right).update(folder=None)
+        Folder.objects.filter(id=self.right.id).delete()
+
+        status, body = self.organize(source_deck_id=self.a.id, target_folder_id=self.right.id)
+
+        self.assertEqual(status, 404)
+        self.assertEqual(Deck.objects.get(id=self.a.id).folder_id, self.left.id)
+        self.assertClosureConsistent(self.user)
+
+    def test_stale_drop_after_deck_already_moved(self):
+        # Two tabs drag A onto C; the second request finds A already there.
+        self.organize(source_deck_id=self.a.id, target_deck_id=self.c.id)
+
+        status, body = self.organize(source_deck_id=self.a.id, target_deck_id=self.c.id)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body["folder"]["id"], self.right.id)
+        self.assertIsNone(body["deleted_empty_folder_id"])
+        self.assertClosureConsistent(self.user)
+
+    def test_other_users_decks_and_bad_ids(self):
+        stranger = User.objects.create_user("stranger")
+        theirs = Deck.objects.create(user=stranger, title="Theirs")
+
+        self.assertEqual(self.organize(source_deck_id=theirs.id, target_root=True)[0], 404)
+        self.assertEqual(self.organize(source_deck_id=self.a.id, target_deck_id=theirs.id)[0], 404)
+        self.assertEqual(self.organize(source_deck_id="x", target_root=True)[0], 400)
+        self.assertEqual(self.organize(source_deck_id=self.a.id, target_deck_id=str(self.a.id))[0], 400)
+
+
+class MergeFoldersTests(FolderInvariantsMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner", password="pw")
+        self.source = Folder.objects.create(user=self.user, name="Source")
+        self.target = Folder.objects.create(user=self.user, name="Target")
+        self.child = Folder.objects.create(user=self.user, name="Child", parent=self.source)
+        self.grandchild = Folder.objects.create(user=self.user, name="Grandchild", parent=self.child)
+        for index in range(20):
+            Deck.objects.create(user=self.user, title=f"S{index}", folder=self.source)
+        Deck.objects.create(user=self.user, title="T", folder=self.target)
+        Deck.objects.create(user=self.user, title="G", folder=self.grandchild)
+
+    def merge(self, source, target, name="Merged"):
+        response = post_json(
+            merge_folders,
+            self.user,
+            {"source_folder_id": source.id, "target_folder_id": target.id, "name": name},
+        )
+        return response.status_code, json.loads(response.content)
+
+    def test_merge_moves_decks_and_subfolders_into_target(self):
+        # Independent of the number of decks (20 here) and of subfolder depth.
+        with self.assertNumQueries(17):
+            status, body = self.merge(self.source, self.target)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body["folder"], {"id": self.target.id, "name": "Merged"})
+        self.assertFalse(Folder.objects.filter(id=self.source.id).exists())
+        self.assertEqual(Deck.objects.filter(folder=self.target).count(), 21)
+        self.assertEqual(Folder.objects.get(id=self.child.id).parent_id, self.target.id)
+        self.assertClosureConsistent(self.user)
+
+    def test_merge_into_own_subfolder_is_rejected(self):
+        status, body = self.merge(self.source, self.grandchild)
+
+        self.assertEqual(status, 400)
+        self.assertEqual(Deck.objects.filter(folder=self.source).count(), 20)
+        self.assertEqual(Folder.objects.get(id=self.grandchild.id).name, "Grandchild")
+        self.assertClosureConsistent(self.user)
+
+    def test_merge_into_ancestor(self):
+        status, body = self.merge(self.grandchild, self.source)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(Deck.objects.get(title="G").folder_id, self.source.id)
+        self.assertClosureConsistent(self.user)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentOrganizeTests(FolderInvariantsMixin, TransactionTestCase):
+    """Drags from several tabs at once leave no orphaned or empty folder."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("owner", password="pw")
+        self.decks = []
+        for index in range(4):
+            folder = Folder.objects.create(user=self.user, name=f"F{index}")
+            self.decks.append(Deck.objects.create(user=self.user, title=f"D{index}", folder=folder))
+
+    def run_concurrently(self, payloads):
+        barrier = threading.Barrier(len(payloads))
+        statuses = []
+
+        def drag(payload):
+            try:
+                barrier.wait()
+                statuses.append(post_json(organize_decks, self.user, payload).status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=drag, args=(payload,)) for payload in payloads]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_crossing_drags(self):
+        d0, d1, d2, d3 = (deck.id for deck in self.decks)
+        statuses = self.run_concurrently([
+            {"source_deck_id": d0, "target_deck_id": d1},
+            {"source_deck_id": d1, "target_deck_id": d2},
+            {"source_deck_id": d2, "target_deck_id": d3},
+            {"source_deck_id": d3, "target_deck_id": d0},
+        ])
+
+        self.assertTrue(set(statuses) <= {200, 404})
+        self.assertEqual(Deck.objects.filter(user=self.user, folder__isnull=True).count(), 0)
+        self.assertClosureConsistent(self.user)
+        self.assertNoEmptyFolders(self.user)
+
+    def test_drop_into_folder_being_emptied(self):
+        d0, d1 = self.decks[0].id, self.decks[1].id
+        f1 = self.decks[1].folder_id
+        statuses = self.run_concurrently([
+            {"source_deck_id": d1, "target_root": True},
+            {"source_deck_id": d0, "target_folder_id": f1},
+        ])
+
+        self.assertTrue(set(statuses) <= {200, 404})
+        self.assertClosureConsistent(self.user)
+        self.assertNoEmptyFolders(self.user)
@@ -0,0 +1,121 @@
+"""Abuse protection for the answer endpoints.
+
+A stuck key or a misbehaving client can post hundreds of answers a second.
+``rate_limited`` keeps a per-user token bucket in the Django cache and turns
+excess requests away with 429 before they reach the database.
+``first_submission`` recognises retried answers (same card, same idempotency
+key) so each answer is applied to the card's SRS record once.
+
+Both only work if every worker sees the same cache; ``check_shared_cache``
+refuses to start several worker processes on a process-local one.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+
+
+def _take_token(user_id, capacity, refill_per_second):
+    """Take one token from the user's bucket; return seconds to wait, or 0.
+
+    The bucket state is one cache entry, read and written back per request.
+    Two simultaneous requests may both see the same token; that slack is
+    bounded by the number of concurrent requests and is fine for throttling.
+    """
+
+    key = f"answer-bucket:{user_id}"
+    now = time.time()
+    tokens, updated_at = cache.get(key) or (capacity, now)
+
+    tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+    if tokens < 1:
+        return (1 - tokens) / refill_per_second
+
+    # The entry can expire once a full bucket would have refilled.
+    cache.set(key, (tokens - 1, now), timeout=int(capacity / refill_per_second) + 1)
+    return 0
+
+
+def rate_limited(view_func):
+    """Throttle a view to ANSWER_RATE_LIMIT = (burst, answers per second)."""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        capacity, refill_per_second = settings.ANSWER_RATE_LIMIT
+        retry_after = _take_token(request.user.id, capacity, refill_per_second)
+        if retry_after:
+            response = JsonResponse(
+                {"ok": False, "error": "Too many answers, slow down."},
+                status=429,
+            )
+            response.headers["Retry-After"] = str(max(1, round(retry_after)))
+            return response
+        return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+class SubmissionClaim:
+    """A claim on applying one answer, taken in the cache.
+
+    ``first`` is True the first time an answer is seen and False for its
+    retries. The claim only sticks once the answer is applied: leaving the
+    ``with`` block with an exception, or calling ``release()`` when the
+    answer was turned away (a version conflict), drops it again, so the
+    client's retry is applied instead of being answered as a replay.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.first = False
+
+    def __enter__(self):
+        self.first = cache.add(self.key, True, timeout=settings.ANSWER_IDEMPOTENCY_SECONDS)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.release()
+
+    def release(self):
+        if self.first:
+            cache.delete(self.key)
+            self.first = False
+
+
+def first_submission(request, card_id, payload):
+    """Return the SubmissionClaim of an answer, to be used as a context manager.
+
+    The key comes from the ``Idempotency-Key`` header the study page sends
+    once per answer. Clients that don't send one are keyed on the answer
+    itself (card, right/wrong and the due date they computed), which is
+    identical when the same submission is replayed.
+    """
+
+    idempotency_key = request.headers.get("Idempotency-Key", "")[:100]
+    if not idempotency_key:
+        idempotency_key = "{}:{}".format(payload.get("is_right"), payload.get("due_at"))
+
+    digest = hashlib.blake2b(idempotency_key.encode("utf-8"), digest_size=16).hexdigest()
+    return SubmissionClaim(f"answer-seen:{request.user.id}:{card_id}:{digest}")
+
+
+def check_shared_cache(processes):
+    """Raise ImproperlyConfigured if ``processes`` workers can't share answer state.
+
+    Token buckets and answer claims live in the default cache. With locmem,
+    each worker process keeps its own copy: a user gets a full burst per
+    worker, and a retry that reaches another worker is applied again.
+    """
+
+    if processes > 1 and isinstance(caches["default"], LocMemCache):
+        raise ImproperlyConfigured(
+            f"{processes} worker processes need a shared default cache for answer "
+            "throttling and replay protection; set REDIS_URL or run one worker."
+        )
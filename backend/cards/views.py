@@ -8,23 +8,68 @@ This module contains:
 """
 
 import json
+from datetime import timedelta
+from functools import wraps
 
+from django.conf import settings
 from django.views.generic import TemplateView
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth import login, logout
 from django.views import View
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control, cache_page
 from django.views.decorators.http import require_POST
 from django.views.decorators.clickjacking import xframe_options_exempt
-from django.http import JsonResponse
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse
+from django.template.defaultfilters import pluralize
 from django.utils import timezone
+from django.urls import reverse
 from django.db import transaction
-from django.db.models import Q, Count
-
-from .forms import EmailSignupForm, CardForm
-from .models import Deck, Card, ReviewSession, CardSRS, Folder
+from django.db.models import Q, Case, Count, F, Min, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from nerdeck_project import metrics
+from nerdeck_project.db_routing import replica_reads
+
+from .days import study_day
+from .fingerprints import near_duplicate_groups
+from .folders import delete_empty_folders, folder_tree, rolled_up_counts
+from .library import copy_on_write, public_decks, publish, subscribe
+from .forms import EmailSignupForm, CardForm, NoteForm
+from .media import MediaError, media_url, store_upload, thumbnail_url
+from .models import (
+    Deck,
+    Card,
+    ReviewSession,
+    CardSRS,
+    Folder,
+    FolderClosure,
+    Media,
+    Note,
+    UserProfile,
+)
+from .notes import card_fronts, create_notes, sync_note_cards
+from .scheduling import balance_due_at, record_due
+from .study import (
+    CRAM_ORDERS,
+    cram_card_at,
+    interleaved_due_cards,
+    new_cram_seed,
+    scope_states,
+)
+from .tags import (
+    TagError,
+    card_tag_names,
+    parse_tag_expression,
+    set_card_tags,
+    tag_counts,
+    tag_filter,
+)
+from .throttling import first_submission, rate_limited
 
 
 # Default review ladder in days used by the simple spaced‑repetition system.
@@ -51,11 +96,188 @@ def _step_from_interval(interval_days: int) -> int:
     return 0
 
 
+def _card_payload(state):
+    """Serialize a queue entry (a CardSRS row) the way the study page expects it.
+
+    ``deck_id`` is the deck the user studies the card in, which for a
+    subscribed card is the subscriber's linked deck, not the card's own.
+    """
+
+    if state is None:
+        return None
+
+    card = state.card
+    front_text, back_text = card.sides()
+    return {
+        "id": card.id,
+        "deck_id": state.deck_id,
+        "front_text": front_text,
+        "back_text": back_text,
+        "front_html": card.front_html,
+        "back_html": card.back_html,
+        "due_at": state.due_at.isoformat(),
+        "step": _step_from_interval(state.interval_days),
+        "version": state.version,
+    }
+
+
+def _parse_due_at(due_at_str):
+    """Parse the ISO due date sent by the study page; fall back to now."""
+
+    if not due_at_str:
+        return timezone.now()
+
+    try:
+        due_at = timezone.datetime.fromisoformat(due_at_str.replace("Z", "+00:00"))
+        if timezone.is_naive(due_at):
+            due_at = timezone.make_aware(due_at, timezone.utc)
+    except Exception:
+        due_at = timezone.now()
+    return due_at
+
+
+def _apply_review_answer(request, state, is_right, due_at, expected_version=None):
+    """Record an answer on a CardSRS row and return the row's new version.
+
+    Right answers are spread over the user's lightest days around the
+    requested due date (see scheduling.balance_due_at).
+
+    The counters move with F() expressions inside a single UPDATE, so two
+    devices answering at once never lose an increment. When the client sends
+    the version it last saw, the UPDATE is a compare-and-set on it and None
+    is returned if another answer got there first.
+    """
+
+    now = timezone.now()
+    day = study_day(request)
+    # Ladder interval in days from now to the requested due_at. It stays
+    # the ladder value when balancing moves the actual due date, so the
+    # card's step (see _step_from_interval) still advances.
+    interval_days = max(round((due_at - now) / timedelta(days=1)), 0)
+    if is_right:
+        due_at = balance_due_at(request.user.id, due_at, day)
+    counter = "repetitions" if is_right else "lapses"
+    changes = {
+        "due_at": due_at,
+        "interval_days": interval_days,
+        "last_reviewed_at": now,
+        "version": F("version") + 1,
+        counter: F(counter) + 1,
+    }
+
+    rows = CardSRS.objects.filter(id=state.id)
+    if expected_version is not None:
+        rows = rows.filter(version=expected_version)
+
+    if not rows.update(**changes):
+        return None
+    metrics.record_review(is_right)
+    if is_right:
+        record_due(request.user.id, due_at, day)
+
+    if expected_version is not None:
+        return expected_version + 1
+    return CardSRS.objects.filter(id=state.id).values_list("version", flat=True).first()
+
+
+def _parse_version(value):
+    """Return the SRS version a client sent with its answer, if any."""
+
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    return None
+
+
+def _answer_conflict(next_card):
+    """409 for an answer whose card was answered elsewhere in the meantime.
+
+    It carries the queue's current head (possibly the same card with its new
+    state) so the study page can carry on from there.
+    """
+
+    return JsonResponse(
+        {
+            "ok": False,
+            "error": "This card was already answered on another device.",
+            "next_card": _card_payload(next_card),
+        },
+        status=409,
+    )
+
+
+def _deck_states(user, deck_id):
+    """The user's SRS rows for the active cards studied in one deck."""
+
+    return CardSRS.objects.filter(user=user, deck_id=deck_id, card__status="active")
+
+
+def _next_due_card(states, day, exclude_id=None):
+    """Return the SRS row of the first card due by the end of the study day.
+
+    ``exclude_id`` is a card id.
+    """
+
+    states = states.filter(due_at__lt=day.end)
+    if exclude_id is not None:
+        states = states.exclude(card_id=exclude_id)
+
+    return states.select_related("card", "card__note").order_by("card__created_at", "card_id").first()
+
+
+def _next_session_card(session, day, exclude_id=None):
+    """Return the SRS row of the card a study session should show next.
+
+    Deck sessions keep the per-deck creation order; folder and "all due"
+    sessions interleave their decks (see interleaved_due_cards).
+    """
+
+    if session.mode == "cram":
+        return cram_card_at(session, session.position)
+    if session.deck_id:
+        return _next_due_card(scope_states(session), day, exclude_id=exclude_id)
+
+    states = scope_states(session)
+    if exclude_id is not None:
+        states = states.exclude(card_id=exclude_id)
+    return interleaved_due_cards(states, day.end, session.deck_turns).first()
+
+
 # ---------------------------------------------------------------------------
 # Simple template‑only pages 
 # ---------------------------------------------------------------------------
 
 
+def _cache_anonymous_page(view_func):
+    """Serve a page from the cache for visitors without a session.
+
+    Anonymous visitors all see the same HTML, so it is rendered once per
+    ANONYMOUS_PAGE_CACHE_SECONDS. Anyone with a session cookie (logged in)
+    or with pending flash messages (their own cookie, see MESSAGE_STORAGE)
+    gets a fresh, private render instead. Both variants send
+    ``Vary: Cookie`` so browsers and proxies never mix them up.
+    """
+
+    timeout = settings.ANONYMOUS_PAGE_CACHE_SECONDS
+    cached_view = cache_page(timeout, key_prefix="anon")(
+        cache_control(public=True, max_age=min(timeout, 300))(view_func)
+    )
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        # len() loads pending messages without marking them as shown.
+        pending_messages = len(getattr(request, "_messages", ()))
+        if settings.SESSION_COOKIE_NAME in request.COOKIES or pending_messages:
+            response = view_func(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            response = cached_view(request, *args, **kwargs)
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+    return wrapper
+
+
+@method_decorator(_cache_anonymous_page, name="dispatch")
 @method_decorator(xframe_options_exempt, name="dispatch")
 class LandingPageView(TemplateView):
     """Render the minimal landing page with the NerDeck logo and link to home."""
@@ -63,6 +285,7 @@ class LandingPageView(TemplateView):
     template_name = "landingPage.html"
 
 
+@method_decorator(_cache_anonymous_page, name="dispatch")
 @method_decorator(xframe_options_exempt, name="dispatch")
 class HomeView(TemplateView):
     """Render the marketing/overview home page (no auth required)."""
@@ -76,6 +299,7 @@ class HomeView(TemplateView):
 
 
 @method_decorator(login_required, name="dispatch")
+@method_decorator(replica_reads(), name="get")
 class DecksView(TemplateView):
     """Show the logged‑in user's active decks with due/total card counts."""
 
@@ -85,8 +309,7 @@ class DecksView(TemplateView):
         """Add the user's decks plus today/total card counts into the context."""
         context = super().get_context_data(**kwargs)
 
-        now = timezone.localtime()
-        end_of_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+        day = study_day(self.request)
 
         # Base queryset: all non‑archived decks for this user.
         decks = (
@@ -94,11 +317,18 @@ class DecksView(TemplateView):
             .filter(user=self.request.user, is_archived=False)
             .select_related("folder")
             .annotate(
-                # Total active cards per deck.
+                # Active cards studied in each deck (subscribed ones included).
                 total_cards=Count(
-                    "card",
-                    filter=Q(card__status="active"),
-                    distinct=True,
+                    "card_states",
+                    filter=Q(card_states__card__status="active"),
+                ),
+                # Active cards due before the user's day rolls over.
+                today_cards=Count(
+                    "card_states",
+                    filter=Q(
+                        card_states__card__status="active",
+                        card_states__due_at__lt=day.end,
+                    ),
                 ),
             )
             .order_by("sort_order", "created_at")
@@ -106,32 +336,32 @@ class DecksView(TemplateView):
 
         decks = list(decks)
 
-        # For each deck, compute how many cards are due today.
-        for deck in decks:
-            deck.today_cards = (
-                Card.objects.filter(deck=deck, status="active")
-                .filter(Q(cardsrs__due_at__lte=end_of_today) | Q(cardsrs__isnull=True))
-                .count()
-            )
-
-        folder_groups_map = {}
+        decks_by_folder = {}
         ungrouped_decks = []
         for deck in decks:
             if deck.folder_id:
-                group = folder_groups_map.setdefault(
-                    deck.folder_id,
-                    {"folder": deck.folder, "decks": []},
-                )
-                group["decks"].append(deck)
+                decks_by_folder.setdefault(deck.folder_id, []).append(deck)
             else:
                 ungrouped_decks.append(deck)
 
-        folder_groups = sorted(
-            folder_groups_map.values(),
-            key=lambda item: item["folder"].created_at,
-        )
-
+        # Every folder, each followed by its subfolders, with due/total counts
+        # rolled up over the whole subtree (one closure query at any depth).
+        folders = Folder.objects.filter(user=self.request.user).order_by("sort_order", "created_at")
+        counts = rolled_up_counts(self.request.user, decks)
+        folder_groups = []
+        for folder, depth in folder_tree(folders):
+            today_cards, total_cards = counts.get(folder.id, (0, 0))
+            folder_groups.append({
+                "folder": folder,
+                "depth": depth,
+                "decks": decks_by_folder.get(folder.id, []),
+                "today_cards": today_cards,
+                "total_cards": total_cards,
+            })
+
+        context["study_day"] = day
         context["decks"] = decks
+        context["tag_counts"] = list(tag_counts(self.request.user))
         context["folder_groups"] = folder_groups
         context["ungrouped_decks"] = ungrouped_decks
         return context
@@ -139,7 +369,11 @@ class DecksView(TemplateView):
 
 @login_required
 def new_flashcard(request, deck_id):
-    """Create a new flashcard or edit an existing one inside the given deck."""
+    """Create a new flashcard or edit an existing one inside the given deck.
+
+    In a subscribed deck the cards of the source deck can be edited too:
+    saving one creates the user's private copy (see library.copy_on_write).
+    """
 
     deck = get_object_or_404(Deck, id=deck_id, user=request.user, is_archived=False)
     edit_card_id = request.POST.get("edit_card_id") or request.GET.get("card_id")
@@ -147,33 +381,60 @@ def new_flashcard(request, deck_id):
     is_edit_mode = False
 
     if edit_card_id:
+        # Own cards of the deck, or shared cards the user studies in it.
         card_to_edit = get_object_or_404(
             Card,
+            Q(deck=deck) | Q(id__in=CardSRS.objects.filter(user=request.user, deck=deck).values("card_id")),
             id=edit_card_id,
-            deck=deck,
-            deck__user=request.user,
         )
         is_edit_mode = True
 
     next_target = request.POST.get("next") if request.method == "POST" else request.GET.get("next", "")
 
+    if card_to_edit is not None and card_to_edit.note_id:
+        if card_to_edit.deck_id == deck.id:
+            # Generated cards are edited through their note.
+            query = f"?note_id={card_to_edit.note_id}" + ("&next=study" if next_target == "study" else "")
+            return redirect(reverse("new_note", args=[deck.id]) + query)
+        # A shared note card: the private copy starts from its generated text.
+        card_to_edit.front_text, card_to_edit.back_text = card_to_edit.sides()
+
     if request.method == "POST":
         form = CardForm(request.POST, instance=card_to_edit)
         if form.is_valid():
             card = form.save(commit=False)
-            card.deck = deck
-            card.save()
+            with transaction.atomic():
+                if is_edit_mode and card.deck_id != deck.id:
+                    card = copy_on_write(card, deck)
+                else:
+                    card.deck = deck
+                    card.save()
+                set_card_tags(request.user, card, form.cleaned_data["tags"])
 
             if is_edit_mode:
                 messages.success(request, "Flashcard updated.")
             else:
                 messages.success(request, "Flashcard created.")
 
+            # Indexed lookup on (user, front_hash): same normalized front elsewhere?
+            duplicate = (
+                Card.objects.filter(user=request.user, front_hash=card.front_hash)
+                .exclude(id=card.id)
+                .select_related("deck")
+                .first()
+            )
+            if duplicate is not None:
+                messages.warning(
+                    request,
+                    f"A card with the same front already exists in '{duplicate.deck.title}'.",
+                )
+
             if next_target == "study":
                 return redirect("study", deck_id=deck.id)
             return redirect("decks")
     else:
-        form = CardForm(instance=card_to_edit)
+        tags = card_tag_names(request.user, [card_to_edit.id]).get(card_to_edit.id, []) if card_to_edit else []
+        form = CardForm(instance=card_to_edit, initial={"tags": " ".join(tags)})
 
     return render(request, "new_flashcard.html", {
         "deck": deck,
@@ -184,184 +445,350 @@ def new_flashcard(request, deck_id):
     })
 
 
+@login_required
+def new_note(request, deck_id):
+    """Create a note (and the cards it generates) or edit one (``?note_id=``).
+
+    Saving an edited note rewrites only the cards whose text changed, adds
+    cards for new cloze deletions and deletes those for removed ones (see
+    notes.sync_note_cards); the other cards keep their review history.
+    """
+
+    deck = get_object_or_404(Deck, id=deck_id, user=request.user, is_archived=False)
+    note_id = request.POST.get("note_id") or request.GET.get("note_id")
+    note = get_object_or_404(Note, id=note_id, deck=deck) if note_id else None
+    next_target = request.POST.get("next") if request.method == "POST" else request.GET.get("next", "")
+
+    if request.method == "POST":
+        form = NoteForm(request.POST, instance=note)
+        if form.is_valid():
+            with transaction.atomic():
+                if note is None:
+                    note = form.save(commit=False)
+                    note.deck = deck
+                    created = len(create_notes([note]))
+                    messages.success(request, f"Note created with {created} flashcard{pluralize(created)}.")
+                else:
+                    note = form.save()
+                    created, updated, deleted = sync_note_cards(note)
+                    messages.success(
+                        request,
+                        f"Note updated: {created} flashcard{pluralize(created)} added, "
+                        f"{updated} changed, {deleted} removed.",
+                    )
+
+            if next_target == "study":
+                return redirect("study", deck_id=deck.id)
+            return redirect("decks")
+    else:
+        form = NoteForm(instance=note)
+
+    return render(request, "new_flashcard.html", {
+        "deck": deck,
+        "form": form,
+        "is_note": True,
+        "is_edit_mode": note is not None,
+        "edit_note": note,
+        "next_target": next_target,
+    })
+
+
 # ---------------------------------------------------------------------------
 # Study / spaced‑repetition views
 # ---------------------------------------------------------------------------
 
 
+def _current_card_context(state):
+    """study.html context for the card a page opens on (an SRS row or None)."""
+
+    card_payload = _card_payload(state)
+    return {
+        "current_card": state.card if state else None,
+        "current_card_state": {
+            "deck_id": card_payload["deck_id"] if card_payload else "",
+            "step": card_payload["step"] if card_payload else 0,
+            "due_at": card_payload["due_at"] if card_payload else "",
+            "version": card_payload["version"] if card_payload else 0,
+        },
+    }
+
+
+def _requested_tags(request):
+    """The ``?tags=`` expression of a study link; raises TagError if invalid."""
+
+    expression = " ".join(request.GET.get("tags", "").split())
+    if expression:
+        if len(expression) > ReviewSession._meta.get_field("tag_expression").max_length:
+            raise TagError("The tag expression is too long.")
+        parse_tag_expression(expression)
+    return expression
+
+
+def _start_cram_session(request, deck=None, folder=None, tags=""):
+    """Create a cram session over a deck or folder and render its first card."""
+
+    order = request.GET.get("order", "random")
+    if order not in CRAM_ORDERS:
+        order = "random"
+
+    session = ReviewSession.objects.create(
+        user=request.user,
+        deck=deck,
+        folder=folder,
+        mode="cram",
+        order=order,
+        seed=new_cram_seed(),
+        tag_expression=tags,
+    )
+    return render(request, "study.html", {
+        "deck": deck,
+        "folder": folder,
+        **_current_card_context(cram_card_at(session, 0)),
+        "session": session,
+        "total_cards": scope_states(session).count(),
+    })
+
+
 @login_required
 def study_deck(request, deck_id):
     """Start a study session for a given deck.
 
-    Selects all due cards for today, determines the current card and its SRS
-    state, and creates a ReviewSession row for tracking the session.
+    In the default review mode, selects all due cards for today, determines
+    the current card and its SRS state, and creates a ReviewSession row for
+    tracking the session. ``?mode=cram`` goes through every active card
+    instead (see _start_cram_session). ``?tags=`` limits either mode to
+    the cards matching a tag expression.
     """
 
     deck = get_object_or_404(Deck, id=deck_id, user=request.user, is_archived=False)
-    now = timezone.localtime()
-    end_of_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-    # All active cards that are due now or have never been scheduled.
-    due_cards = (
-        Card.objects.filter(deck=deck, status="active")
-        .filter(Q(cardsrs__due_at__lte=end_of_today) | Q(cardsrs__isnull=True))
-        .select_related("cardsrs")
-        .order_by("created_at")
-    )
-
-    current_card = due_cards.first() if due_cards.exists() else None
 
-    current_card_state = {
-        "step": 0,
-        "due_at": "",
-    }
+    try:
+        tags = _requested_tags(request)
+    except TagError as exc:
+        messages.error(request, str(exc))
+        return redirect("decks")
 
-    # If the current card already has SRS data, expose it to the frontend.
-    if current_card and hasattr(current_card, "cardsrs") and current_card.cardsrs:
-        current_card_state = {
-            "step": _step_from_interval(current_card.cardsrs.interval_days),
-            "due_at": current_card.cardsrs.due_at.isoformat(),
-        }
+    if request.GET.get("mode") == "cram":
+        return _start_cram_session(request, deck=deck, tags=tags)
 
     # Create a new review session for this user.
     session = ReviewSession.objects.create(
         user=request.user,
-        mode="review",  # or "cram" later if you add that mode in the UI
+        deck=deck,
+        mode="review",
+        tag_expression=tags,
     )
 
+    # The first active card due by the end of the user's study day.
+    current_state = _next_session_card(session, study_day(request))
+
     return render(request, "study.html", {
         "deck": deck,
-        "cards": due_cards,
-        "current_card": current_card,
-        "current_card_state": current_card_state,
+        **_current_card_context(current_state),
+        "session": session,
+    })
+
+
+def _start_queue_session(request, folder=None, tags=""):
+    """Create a review session over a folder (or all decks) and render it."""
+
+    session = ReviewSession.objects.create(
+        user=request.user,
+        folder=folder,
+        mode="review",
+        tag_expression=tags,
+    )
+    return render(request, "study.html", {
+        "deck": None,
+        "folder": folder,
+        **_current_card_context(_next_session_card(session, study_day(request))),
         "session": session,
     })
 
 
+@login_required
+def study_folder(request, folder_id):
+    """Study the due cards of every deck inside a folder as one queue.
+
+    ``?mode=cram`` goes through every active card of the folder instead.
+    """
+
+    folder = get_object_or_404(Folder, id=folder_id, user=request.user)
+
+    try:
+        tags = _requested_tags(request)
+    except TagError as exc:
+        messages.error(request, str(exc))
+        return redirect("decks")
+
+    if request.GET.get("mode") == "cram":
+        return _start_cram_session(request, folder=folder, tags=tags)
+    return _start_queue_session(request, folder=folder, tags=tags)
+
+
+@login_required
+def study_due(request):
+    """Study every card due today across all of the user's active decks.
+
+    With ``?tags=`` only the due cards matching the tag expression.
+    """
+
+    try:
+        tags = _requested_tags(request)
+    except TagError as exc:
+        messages.error(request, str(exc))
+        return redirect("decks")
+
+    return _start_queue_session(request, tags=tags)
+
+
 @login_required
 @require_POST
-def review_answer(request, deck_id):
-    """AJAX endpoint called when the user answers a card.
+@rate_limited
+def session_answer(request, session_id):
+    """AJAX endpoint for answers given inside a study session.
 
-    Updates the CardSRS record based on whether the answer was right/wrong and
-    the chosen next due date, then returns the next due card (if any).
+    Review sessions update CardSRS exactly like review_answer. Cram sessions
+    leave scheduling untouched: a right answer only moves the session one
+    step further through its permutation, a wrong answer keeps the card.
     """
 
+    session = get_object_or_404(ReviewSession, id=session_id, user=request.user)
+
     try:
         payload = json.loads(request.body.decode("utf-8"))
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON"}, status=400)
 
-    now = timezone.localtime()
-    end_of_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-
     card_id = payload.get("card_id")
     is_right = payload.get("is_right")
-    step = payload.get("step")  # currently unused but kept for future logic
-    due_at_str = payload.get("due_at")
 
     if card_id is None or is_right is None:
         return JsonResponse({"error": "Missing fields"}, status=400)
 
-    card = get_object_or_404(
-        Card,
-        id=card_id,
-        deck_id=deck_id,
-        deck__user=request.user,
-    )
+    state = get_object_or_404(scope_states(session), card_id=card_id)
+    version = None
 
-    # Parse due_at from ISO string; if missing, fall back to now.
-    if due_at_str:
-        try:
-            due_at = timezone.datetime.fromisoformat(due_at_str.replace("Z", "+00:00"))
-            if timezone.is_naive(due_at):
-                due_at = timezone.make_aware(due_at, timezone.utc)
-        except Exception:
-            due_at = timezone.now()
+    if session.mode == "cram":
+        if is_right:
+            with first_submission(request, state.card_id, payload) as claim:
+                if claim.first:
+                    ReviewSession.objects.filter(id=session.id).update(position=F("position") + 1)
+                    session.refresh_from_db(fields=["position"])
     else:
-        due_at = timezone.now()
+        with first_submission(request, state.card_id, payload) as claim:
+            if claim.first:
+                version = _apply_review_answer(
+                    request,
+                    state,
+                    is_right,
+                    _parse_due_at(payload.get("due_at")),
+                    _parse_version(payload.get("version")),
+                )
+                if version is None:
+                    claim.release()
+                    return _answer_conflict(_next_session_card(session, study_day(request)))
+                if is_right and not session.deck_id:
+                    deck_key = str(state.deck_id)
+                    session.deck_turns[deck_key] = session.deck_turns.get(deck_key, 0) + 1
+                    session.save(update_fields=["deck_turns"])
 
-    # Create or update the SRS record for this card.
-    srs, _ = CardSRS.objects.get_or_create(
-        card=card,
-        defaults={"due_at": due_at},
-    )
+    next_card = _next_session_card(session, study_day(request), exclude_id=state.card_id)
+    if next_card is None and session.ended_at is None:
+        session.ended_at = timezone.now()
+        session.save(update_fields=["ended_at"])
 
-    srs.due_at = due_at
-    # Interval in days from today to due_at.
-    srs.interval_days = (due_at.date() - timezone.now().date()).days
-    srs.last_reviewed_at = timezone.now()
+    return JsonResponse({"ok": True, "version": version, "next_card": _card_payload(next_card)})
 
-    if is_right:
-        srs.repetitions += 1
-    else:
-        srs.lapses += 1
 
-    srs.save()
+@login_required
+@require_POST
+@rate_limited
+def review_answer(request, deck_id):
+    """AJAX endpoint called when the user answers a card.
 
-    # Next due card: still active, due today or earlier (or never scheduled).
-    due_filter = Q(cardsrs__due_at__lte=end_of_today) | Q(cardsrs__isnull=True)
+    Updates the CardSRS record based on whether the answer was right/wrong and
+    the chosen next due date, then returns the next due card (if any).
+    """
 
-    next_card = (
-        Card.objects.filter(deck_id=deck_id, status="active")
-        .filter(due_filter)
-        .exclude(id=card.id)
-        .select_related("cardsrs")
-        .order_by("created_at")
-        .first()
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    card_id = payload.get("card_id")
+    is_right = payload.get("is_right")
+    step = payload.get("step")  # currently unused but kept for future logic
+    due_at_str = payload.get("due_at")
+
+    if card_id is None or is_right is None:
+        return JsonResponse({"error": "Missing fields"}, status=400)
+
+    state = get_object_or_404(
+        CardSRS,
+        card_id=card_id,
+        deck_id=deck_id,
+        user=request.user,
     )
 
-    response = {"ok": True}
+    deck_states = _deck_states(request.user, deck_id)
 
-    if next_card is not None:
-        response["next_card"] = {
-            "id": next_card.id,
-            "front_text": next_card.front_text,
-            "back_text": next_card.back_text,
-            "due_at": next_card.cardsrs.due_at.isoformat() if hasattr(next_card, "cardsrs") and next_card.cardsrs else "",
-            "step": _step_from_interval(next_card.cardsrs.interval_days) if hasattr(next_card, "cardsrs") and next_card.cardsrs else 0,
-        }
-    else:
-        response["next_card"] = None
+    # A retried submission of the same answer only fetches the next card.
+    version = None
+    with first_submission(request, state.card_id, payload) as claim:
+        if claim.first:
+            version = _apply_review_answer(
+                request,
+                state,
+                is_right,
+                _parse_due_at(due_at_str),
+                _parse_version(payload.get("version")),
+            )
+            if version is None:
+                # Not applied: a retry of this answer must not look like a replay.
+                claim.release()
+                return _answer_conflict(_next_due_card(deck_states, study_day(request)))
 
-    return JsonResponse(response)
+    # Next due card: still active, due today or earlier.
+    next_card = _next_due_card(deck_states, study_day(request), exclude_id=state.card_id)
+
+    return JsonResponse({"ok": True, "version": version, "next_card": _card_payload(next_card)})
 
 
 @login_required
 @require_POST
 def delete_flashcard(request, deck_id, card_id):
-    """Delete a flashcard from study mode and return the next due card."""
+    """Delete a flashcard from study mode and return the next due card.
 
-    deck = get_object_or_404(Deck, id=deck_id, user=request.user, is_archived=False)
-    card = get_object_or_404(Card, id=card_id, deck=deck, deck__user=request.user)
+    A card of a subscribed deck belongs to the deck's publisher: only the
+    user's own SRS row for it is removed, which drops it from their queue.
+    """
 
-    card.delete()
+    deck = get_object_or_404(Deck, id=deck_id, user=request.user, is_archived=False)
+    state = get_object_or_404(
+        CardSRS.objects.select_related("card"),
+        card_id=card_id,
+        deck=deck,
+        user=request.user,
+    )
 
-    now = timezone.localtime()
-    end_of_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-    due_filter = Q(cardsrs__due_at__lte=end_of_today) | Q(cardsrs__isnull=True)
+    if state.card.deck_id == deck.id:
+        state.card.delete()
+    else:
+        state.delete()
 
-    next_card = (
-        Card.objects.filter(deck_id=deck_id, status="active")
-        .filter(due_filter)
-        .select_related("cardsrs")
-        .order_by("created_at")
-        .first()
-    )
+    # Inside a study session the next card comes from that session's queue.
+    session_id = request.POST.get("session_id")
+    session = None
+    if session_id and session_id.isdigit():
+        session = ReviewSession.objects.filter(id=session_id, user=request.user).first()
 
-    response = {"ok": True}
-    if next_card is not None:
-        response["next_card"] = {
-            "id": next_card.id,
-            "front_text": next_card.front_text,
-            "back_text": next_card.back_text,
-            "due_at": next_card.cardsrs.due_at.isoformat() if hasattr(next_card, "cardsrs") and next_card.cardsrs else "",
-            "step": _step_from_interval(next_card.cardsrs.interval_days) if hasattr(next_card, "cardsrs") and next_card.cardsrs else 0,
-        }
+    if session is not None:
+        next_card = _next_session_card(session, study_day(request))
     else:
-        response["next_card"] = None
+        next_card = _next_due_card(_deck_states(request.user, deck_id), study_day(request))
 
-    return JsonResponse(response)
+    return JsonResponse({"ok": True, "next_card": _card_payload(next_card)})
 
 
 @login_required
@@ -403,14 +830,7 @@ def delete_deck(request):
     deck.delete()
 
     if folder_id:
-        folder = Folder.objects.filter(id=folder_id, user=request.user).first()
-        folder_still_has_decks = Deck.objects.filter(
-            user=request.user,
-            is_archived=False,
-            folder_id=folder_id,
-        ).exists()
-        if folder and not folder_still_has_decks:
-            folder.delete()
+        delete_empty_folders([folder_id])
 
     messages.success(request, f"NerDeck '{title}' deleted.")
     return redirect("decks")
@@ -449,7 +869,7 @@ def rename_deck(request):
         return redirect("decks")
 
     deck.title = new_title
-    deck.save(update_fields=["title"])
+    deck.save(update_fields=["title", "updated_at"])
     messages.success(request, f"NerDeck renamed to '{new_title}'.")
     return redirect("decks")
 
@@ -505,7 +925,7 @@ def rename_folder(request):
         return redirect("decks")
 
     folder.name = new_name
-    folder.save(update_fields=["name"])
+    folder.save(update_fields=["name", "updated_at"])
     if is_ajax:
         return JsonResponse({"ok": True, "folder": {"id": folder.id, "name": folder.name}})
     messages.success(request, f"Folder renamed to '{new_name}'.")
@@ -521,19 +941,39 @@ def _build_folder_name(source_title: str, target_title: str) -> str:
     return base[:255]
 
 
+def _payload_id(value):
+    """A positive id from a JSON payload (number or digit string), else None."""
+
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if value > 0 else None
+    if isinstance(value, str) and value.isdigit():
+        return int(value) or None
+    return None
+
+
 @login_required
 @require_POST
 def organize_decks(request):
-    """Assign decks to a folder based on drag-and-drop from the decks table."""
+    """Assign decks to a folder based on drag-and-drop from the decks table.
+
+    The drag runs as a few set-based statements in one transaction. The
+    decks involved and then their folders are locked (select_for_update,
+    in id order), so a concurrent drag from another tab waits instead of
+    moving a deck into a folder this one is about to delete. Both decks move
+    in one UPDATE, and the folder the source deck left is removed by one
+    conditional DELETE only if it ended up empty.
+    """
 
     try:
         payload = json.loads(request.body.decode("utf-8"))
     except json.JSONDecodeError:
         return JsonResponse({"ok": False, "error": "Invalid JSON payload."}, status=400)
 
-    source_id = payload.get("source_deck_id")
-    target_id = payload.get("target_deck_id")
-    target_folder_id = payload.get("target_folder_id")
+    source_id = _payload_id(payload.get("source_deck_id"))
+    target_id = _payload_id(payload.get("target_deck_id"))
+    target_folder_id = _payload_id(payload.get("target_folder_id"))
     target_root = bool(payload.get("target_root"))
 
     if not source_id:
@@ -560,63 +1000,59 @@ def organize_decks(request):
             status=400,
         )
 
-    if target_id and str(source_id) == str(target_id):
+    if target_id and source_id == target_id:
         return JsonResponse(
             {"ok": False, "error": "Source and target decks must be different."},
             status=400,
         )
 
-    source_deck = Deck.objects.filter(
-        id=source_id,
-        user=request.user,
-        is_archived=False,
-    ).select_related("folder").first()
-    if not source_deck:
-        return JsonResponse({"ok": False, "error": "Deck not found."}, status=404)
-
-    source_folder_id_before = source_deck.folder_id
     deleted_empty_folder_id = None
 
     with transaction.atomic():
+        decks = {
+            deck.id: deck
+            for deck in Deck.objects.select_for_update()
+            .filter(user=request.user, is_archived=False, id__in={source_id, target_id or source_id})
+            .order_by("id")
+        }
+        source_deck = decks.get(source_id)
+        target_deck = decks.get(target_id)
+        if source_deck is None or (target_id and target_deck is None):
+            return JsonResponse({"ok": False, "error": "Deck not found."}, status=404)
+
+        folder_ids = {source_deck.folder_id, target_folder_id, target_deck and target_deck.folder_id} - {None}
+        folders = {}
+        if folder_ids:
+            folders = {
+                folder.id: folder
+                for folder in Folder.objects.select_for_update()
+                .filter(user=request.user, id__in=folder_ids)
+                .order_by("id")
+            }
+
         if target_root:
             # Move deck out of any folder and make it the first ungrouped deck.
-            min_ungrouped_sort = (
-                Deck.objects.filter(
-                    user=request.user,
-                    is_archived=False,
-                    folder__isnull=True,
-                )
-                .exclude(id=source_deck.id)
+            destination_folder = None
+            first_ungrouped = (
+                Deck.objects.filter(user=request.user, is_archived=False, folder__isnull=True)
+                .exclude(id=source_id)
                 .order_by("sort_order")
-                .values_list("sort_order", flat=True)
-                .first()
+                .values("sort_order")[:1]
+            )
+            Deck.objects.filter(id=source_id).update(
+                folder=None,
+                sort_order=Coalesce(Subquery(first_ungrouped), Value(1)) - 1,
             )
-            source_deck.folder = None
-            source_deck.sort_order = (min_ungrouped_sort - 1) if min_ungrouped_sort is not None else 0
-            source_deck.save(update_fields=["folder", "sort_order"])
-            destination_folder = None
         elif target_folder_id:
-            destination_folder = Folder.objects.filter(
-                id=target_folder_id,
-                user=request.user,
-            ).first()
-            if not destination_folder:
+            destination_folder = folders.get(target_folder_id)
+            if destination_folder is None:
                 return JsonResponse({"ok": False, "error": "Folder not found."}, status=404)
 
             if source_deck.folder_id != destination_folder.id:
-                source_deck.folder = destination_folder
-                source_deck.save(update_fields=["folder"])
+                Deck.objects.filter(id=source_id).update(folder=destination_folder)
         else:
-            target_deck = Deck.objects.filter(
-                id=target_id,
-                user=request.user,
-                is_archived=False,
-            ).select_related("folder").first()
-
-            if not target_deck:
-                return JsonResponse({"ok": False, "error": "Deck not found."}, status=404)
-
-            destination_folder = target_deck.folder or source_deck.folder
+            source_folder = folders.get(source_deck.folder_id)
+            destination_folder = folders.get(target_deck.folder_id) or source_folder
 
             # No existing folder on either side: create one and move both decks in.
             if destination_folder is None:
@@ -625,40 +1061,19 @@ def organize_decks(request):
                     name=_build_folder_name(source_deck.title, target_deck.title),
                 )
 
-            # If both decks belong to different folders, merge source folder into target folder.
-            source_folder = source_deck.folder
-            target_folder = target_deck.folder
-            if (
-                source_folder
-                and target_folder
-                and source_folder.id != target_folder.id
-            ):
-                Deck.objects.filter(folder=source_folder, user=request.user).update(
-                    folder=target_folder
-                )
-                destination_folder = target_folder
-                if not Deck.objects.filter(folder=source_folder).exists():
-                    source_folder.delete()
-
-            if source_deck.folder_id != destination_folder.id:
-                source_deck.folder = destination_folder
-                source_deck.save(update_fields=["folder"])
-
-            if target_deck.folder_id != destination_folder.id:
-                target_deck.folder = destination_folder
-                target_deck.save(update_fields=["folder"])
+            moving = Q(id__in=[source_id, target_id])
+            if source_folder is not None and source_folder.id != destination_folder.id:
+                # Decks in different folders: the source folder's decks join the target's.
+                moving |= Q(folder=source_folder)
+            Deck.objects.filter(moving, user=request.user).exclude(
+                folder=destination_folder,
+            ).update(folder=destination_folder)
 
         # If the source deck moved out of its original folder, delete that folder if now empty.
-        if source_folder_id_before and source_deck.folder_id != source_folder_id_before:
-            source_folder = Folder.objects.filter(id=source_folder_id_before, user=request.user).first()
-            folder_still_has_decks = Deck.objects.filter(
-                user=request.user,
-                is_archived=False,
-                folder_id=source_folder_id_before,
-            ).exists()
-            if source_folder and not folder_still_has_decks:
-                source_folder.delete()
-                deleted_empty_folder_id = source_folder_id_before
+        destination_id = destination_folder.id if destination_folder else None
+        if source_deck.folder_id and source_deck.folder_id != destination_id:
+            if delete_empty_folders([source_deck.folder_id]):
+                deleted_empty_folder_id = source_deck.folder_id
 
     response_payload = {"ok": True}
     if destination_folder is not None:
@@ -676,15 +1091,23 @@ def organize_decks(request):
 @login_required
 @require_POST
 def merge_folders(request):
-    """Merge one folder into another and create a freshly named destination folder."""
+    """Merge one folder into another under a new name.
+
+    The target folder keeps its place in the tree and takes the new name;
+    the source folder's decks and subfolders move into it and the source is
+    deleted. Both folders are locked first, and the moves are one UPDATE
+    each, so the number of statements does not grow with the number of
+    decks or the depth of the tree. A folder cannot be merged into a folder
+    inside it.
+    """
 
     try:
         payload = json.loads(request.body.decode("utf-8"))
     except json.JSONDecodeError:
         return JsonResponse({"ok": False, "error": "Invalid JSON payload."}, status=400)
 
-    source_folder_id = payload.get("source_folder_id")
-    target_folder_id = payload.get("target_folder_id")
+    source_folder_id = _payload_id(payload.get("source_folder_id"))
+    target_folder_id = _payload_id(payload.get("target_folder_id"))
     new_name = (payload.get("name") or "").strip()
 
     if not source_folder_id or not target_folder_id:
@@ -693,7 +1116,7 @@ def merge_folders(request):
             status=400,
         )
 
-    if str(source_folder_id) == str(target_folder_id):
+    if source_folder_id == target_folder_id:
         return JsonResponse({"ok": False, "error": "Folders must be different."}, status=400)
 
     if not new_name:
@@ -702,24 +1125,365 @@ def merge_folders(request):
     if len(new_name) > 255:
         return JsonResponse({"ok": False, "error": "Folder name is too long."}, status=400)
 
-    source_folder = Folder.objects.filter(id=source_folder_id, user=request.user).first()
-    target_folder = Folder.objects.filter(id=target_folder_id, user=request.user).first()
+    try:
+        with transaction.atomic():
+            folders = {
+                folder.id: folder
+                for folder in Folder.objects.select_for_update()
+                .filter(user=request.user, id__in=[source_folder_id, target_folder_id])
+                .order_by("id")
+            }
+            source_folder = folders.get(source_folder_id)
+            target_folder = folders.get(target_folder_id)
+            if not source_folder or not target_folder:
+                return JsonResponse({"ok": False, "error": "Folder not found."}, status=404)
+
+            Deck.objects.filter(user=request.user, folder=source_folder).update(folder=target_folder)
+            child_ids = list(source_folder.children.values_list("id", flat=True))
+            if child_ids:
+                # Raises ValueError if the target lies inside the source.
+                FolderClosure.objects.move(child_ids, target_folder.id)
+                Folder.objects.filter(id__in=child_ids).update(parent=target_folder)
+
+            target_folder.name = new_name
+            target_folder.updated_at = timezone.now()
+            Folder.objects.filter(id=target_folder.id).update(
+                name=target_folder.name, updated_at=target_folder.updated_at,
+            )
+            # Empty now except for archived decks, which drop to the top level.
+            delete_empty_folders([source_folder.id])
+    except ValueError:
+        return JsonResponse(
+            {"ok": False, "error": "A folder cannot be merged into a folder inside it."},
+            status=400,
+        )
+
+    return JsonResponse(
+        {"ok": True, "folder": {"id": target_folder.id, "name": target_folder.name}}
+    )
+
+
+@login_required
+@require_POST
+def move_folder(request):
+    """Nest a folder inside another (``parent_folder_id``) or move it to the top level.
+
+    The folder's whole subtree moves with it; the closure rows are rewritten
+    in a fixed number of queries (see FolderClosureManager.move).
+    """
 
-    if not source_folder or not target_folder:
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except json.JSONDecodeError:
+        return JsonResponse({"ok": False, "error": "Invalid JSON payload."}, status=400)
+
+    folder_id = _payload_id(payload.get("folder_id"))
+    parent_id = _payload_id(payload.get("parent_folder_id"))
+    if not folder_id or (payload.get("parent_folder_id") not in (None, "") and not parent_id):
+        return JsonResponse({"ok": False, "error": "Invalid folder id."}, status=400)
+
+    folder = Folder.objects.filter(id=folder_id, user=request.user).first()
+    if not folder:
         return JsonResponse({"ok": False, "error": "Folder not found."}, status=404)
 
-    with transaction.atomic():
-        merged_folder = Folder.objects.create(user=request.user, name=new_name)
-        Deck.objects.filter(
-            user=request.user,
-            folder_id__in=[source_folder.id, target_folder.id],
-        ).update(folder=merged_folder)
+    parent = None
+    if parent_id:
+        parent = Folder.objects.filter(id=parent_id, user=request.user).first()
+        if not parent:
+            return JsonResponse({"ok": False, "error": "Folder not found."}, status=404)
+
+    folder.parent = parent
+    try:
+        folder.save(update_fields=["parent", "updated_at"])
+    except ValueError as exc:
+        return JsonResponse({"ok": False, "error": str(exc)}, status=400)
 
-        source_folder.delete()
-        target_folder.delete()
+    return JsonResponse({
+        "ok": True,
+        "folder": {"id": folder.id, "name": folder.name, "parent_id": folder.parent_id},
+    })
+
+
+def _front_source(prefix=""):
+    """SQL for the text a card's front is made from.
+
+    A plain card's own front_text, or for a note's card (which stores no
+    text) the note field its front is generated from, cloze markup and all.
+    ``prefix`` is the lookup path to the card, e.g. "card__".
+    """
+
+    return Case(
+        When(**{f"{prefix}note__isnull": True}, then=F(f"{prefix}front_text")),
+        When(
+            **{f"{prefix}note__kind": "basic_reverse", f"{prefix}ordinal": 1},
+            then=F(f"{prefix}note__back_text"),
+        ),
+        default=F(f"{prefix}note__front_text"),
+    )
+
+
+@login_required
+@replica_reads()
+def duplicate_report(request):
+    """List the user's duplicate card clusters as JSON.
+
+    Exact duplicates (same normalized front) come from one GROUP BY over the
+    indexed front_hash column. ``?near=1`` also runs the MinHash pass, which
+    catches small edits but reads every front of the user's cards.
+    """
+
+    cards = Card.objects.filter(user=request.user).exclude(status="archived")
+
+    clusters = list(
+        cards.values("front_hash")
+        .annotate(total=Count("id"), sample=Min(_front_source()))
+        .filter(total__gt=1)
+        .order_by("-total", "front_hash")[:200]
+    )
+    members = {}
+    for card_id, deck_id, front_hash in cards.filter(
+        front_hash__in=[cluster["front_hash"] for cluster in clusters],
+    ).values_list("id", "deck_id", "front_hash"):
+        members.setdefault(front_hash, []).append({"id": card_id, "deck_id": deck_id})
+
+    response = {
+        "ok": True,
+        "exact": [
+            {
+                "front": cluster["sample"],
+                "count": cluster["total"],
+                "cards": members.get(cluster["front_hash"], []),
+            }
+            for cluster in clusters
+        ],
+    }
+
+    if request.GET.get("near") == "1":
+        fronts = card_fronts(cards)
+        response["near"] = [
+            [{"id": card_id, "front": fronts[card_id]} for card_id in group]
+            for group in near_duplicate_groups(fronts.items())
+        ]
+
+    return JsonResponse(response)
+
+
+@login_required
+@replica_reads()
+def srs_stats(request):
+    """Due forecast, retention curve and ease distribution as JSON.
+
+    Computed over every CardSRS row of the user with NumPy arrays (see
+    cards/analytics.py) rather than one model instance per card.
+    """
+
+    # NumPy is only needed here; keep it out of the import path of other views.
+    from .analytics import cached_srs_arrays, srs_statistics
+
+    stats = srs_statistics(cached_srs_arrays(request.user), study_day(request).start)
+    return JsonResponse({"ok": True, **stats})
+
+
+# ---------------------------------------------------------------------------
+# Shared deck library
+# ---------------------------------------------------------------------------
+
+
+@login_required
+@replica_reads()
+def library(request):
+    """List public decks of other users as JSON (``?q=`` filters by title prefix)."""
+
+    query = request.GET.get("q", "").strip()[:255]
+    decks = [
+        {
+            "id": deck.id,
+            "title": deck.title,
+            "description": deck.description,
+            "owner": deck.user.username,
+            "cards": deck.card_count,
+            "subscribed": deck.subscribed,
+        }
+        for deck in public_decks(request.user, query)
+    ]
+    return JsonResponse({"ok": True, "decks": decks})
+
+
+CARD_SEARCH_LIMIT = 50
+
+
+@login_required
+@replica_reads()
+def card_search(request):
+    """Search the cards the user studies, as JSON.
+
+    ``?q=`` is a prefix of the front text (for a note's card, of the note
+    text its front comes from), ``?tags=`` a tag expression
+    (e.g. ``verbs AND NOT irregular``) and ``?deck=`` a deck id. The filters
+    go into one query over the user's SRS rows; the newest
+    CARD_SEARCH_LIMIT matches are returned with their tags.
+    """
+
+    states = CardSRS.objects.filter(user=request.user)
+    query = request.GET.get("q", "").strip()[:255]
+    if query:
+        states = states.alias(front=_front_source("card__")).filter(front__istartswith=query)
+    deck_id = request.GET.get("deck", "")
+    if deck_id.isdigit():
+        states = states.filter(deck_id=deck_id)
+    expression = request.GET.get("tags", "").strip()
+    if expression:
+        try:
+            states = states.filter(tag_filter(expression, request.user.id))
+        except TagError as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+
+    states = list(states.select_related("card", "card__note").order_by("-card_id")[:CARD_SEARCH_LIMIT])
+    tags = card_tag_names(request.user, [state.card_id for state in states])
+    return JsonResponse({
+        "ok": True,
+        "cards": [
+            {
+                "id": state.card_id,
+                "deck_id": state.deck_id,
+                "front": state.card.sides()[0],
+                "status": state.card.status,
+                "due_at": state.due_at.isoformat(),
+                "tags": tags.get(state.card_id, []),
+            }
+            for state in states
+        ],
+    })
+
+
+@login_required
+def tag_list(request):
+    """The user's tags with their card counts (from the Tag counters) as JSON."""
+
+    return JsonResponse({
+        "ok": True,
+        "tags": [{"name": name, "cards": count} for name, count in tag_counts(request.user)],
+    })
+
+
+@login_required
+@require_POST
+def publish_deck(request, deck_id):
+    """Publish a deck to the library, or unpublish it with ``public=0``."""
+
+    deck = get_object_or_404(Deck, id=deck_id, user=request.user, is_archived=False)
+    try:
+        publish(deck, is_public=request.POST.get("public", "1") != "0")
+    except ValueError as exc:
+        return JsonResponse({"ok": False, "error": str(exc)}, status=400)
+    return JsonResponse({"ok": True, "deck": {"id": deck.id, "is_public": deck.is_public}})
+
+
+@login_required
+@require_POST
+def subscribe_deck(request, deck_id):
+    """Subscribe to a public deck; returns the user's linked deck."""
+
+    source = get_object_or_404(Deck.objects.exclude(user=request.user), id=deck_id, is_public=True)
+    deck = subscribe(request.user, source)
+    return JsonResponse({"ok": True, "deck": {"id": deck.id, "title": deck.title}})
+
+
+# ---------------------------------------------------------------------------
+# Card media (content-addressed images and audio)
+# ---------------------------------------------------------------------------
+
+
+# Media URLs contain the file hash, so their content can never change.
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@login_required
+@require_POST
+def upload_media(request):
+    """Store an uploaded image/audio file (deduplicated) and return its URLs."""
+
+    uploaded_file = request.FILES.get("file")
+    if uploaded_file is None:
+        return JsonResponse({"ok": False, "error": "No file uploaded."}, status=400)
+
+    try:
+        media = store_upload(uploaded_file, user=request.user)
+    except MediaError as exc:
+        return JsonResponse({"ok": False, "error": str(exc)}, status=400)
+
+    url = media_url(media)
+    if media.kind == "image":
+        snippet = f"![]({url})"
+    else:
+        snippet = f'<audio controls src="{url}"></audio>'
+
+    return JsonResponse({
+        "ok": True,
+        "media": {
+            "sha256": media.sha256,
+            "kind": media.kind,
+            "url": url,
+            "thumbnail_url": thumbnail_url(media),
+            "markdown": snippet,
+        },
+    })
+
+
+def _media_response(request, media, field, content_type):
+    """Stream a stored blob with immutable caching headers."""
+
+    etag = f'"{media.sha256}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(field.open("rb"), content_type=content_type)
+
+    response["ETag"] = etag
+    response["Cache-Control"] = MEDIA_CACHE_CONTROL
+    return response
+
+
+def serve_media(request, sha256):
+    """Serve a media blob by its hash."""
+
+    media = get_object_or_404(Media, sha256=sha256)
+    return _media_response(request, media, media.file, media.content_type)
+
+
+def serve_media_thumbnail(request, sha256):
+    """Serve the thumbnail generated when an image was uploaded."""
+
+    media = get_object_or_404(Media.objects.exclude(thumbnail=""), sha256=sha256)
+    return _media_response(request, media, media.thumbnail, "image/jpeg")
+
+
+@login_required
+@require_POST
+def update_study_day(request):
+    """Save the user's time zone and/or day rollover hour.
+
+    decks.js posts the browser's time zone the first time a user without a
+    profile opens the decks page; either field may be sent on its own.
+    """
+
+    profile, _ = UserProfile.objects.get_or_create(user=request.user)
+    if "timezone" in request.POST:
+        profile.timezone = request.POST["timezone"].strip()
+    if "day_rollover_hour" in request.POST:
+        rollover_hour = request.POST["day_rollover_hour"].strip()
+        if not rollover_hour.isdigit():
+            return JsonResponse({"ok": False, "error": "Rollover hour must be 0-23."}, status=400)
+        profile.day_rollover_hour = int(rollover_hour)
+
+    try:
+        profile.full_clean()
+    except ValidationError as error:
+        return JsonResponse({"ok": False, "error": " ".join(error.messages)}, status=400)
 
+    profile.save()
     return JsonResponse(
-        {"ok": True, "folder": {"id": merged_folder.id, "name": merged_folder.name}}
+        {"ok": True, "timezone": profile.timezone, "day_rollover_hour": profile.day_rollover_hour}
     )
 
 
@@ -0,0 +1,65 @@
+"""Gunicorn settings for the web dyno, all overridable from the environment.
+
+The study page posts one small AJAX answer every few seconds per user, so
+most of a request's time is spent waiting on the database. Threaded
+workers (gthread) serve several of those per process and keep the
+browser's connection open between answers; ``manage.py bench_gunicorn``
+compares them with plain sync workers on the answer endpoint.
+"""
+
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# "gthread" (default) or "sync".
+worker_class = os.environ.get("WEB_WORKER_CLASS", "gthread")
+threads = _env_int("WEB_THREADS", 4) if worker_class == "gthread" else 1
+
+# Threads already overlap database waits, so gthread needs about one process
+# per CPU; sync workers use the usual 2 * CPUs + 1. cpu_count() reports the
+# host's CPUs on shared dynos, so set WEB_CONCURRENCY to fit the dyno's
+# memory there (Heroku sets it per dyno size).
+_cpus = multiprocessing.cpu_count()
+workers = _env_int(
+    "WEB_CONCURRENCY",
+    _cpus + 1 if worker_class == "gthread" else _cpus * 2 + 1,
+)
+
+# Import Django and the app once in the master; workers share those pages
+# copy-on-write instead of each importing its own copy. Connections are
+# opened lazily per worker, so none is shared across the fork.
+preload_app = os.environ.get("WEB_PRELOAD", "1") == "1"
+
+# Recycle workers now and then against slow leaks; the jitter keeps them
+# from all restarting at the same moment.
+max_requests = _env_int("WEB_MAX_REQUESTS", 1000)
+max_requests_jitter = _env_int("WEB_MAX_REQUESTS_JITTER", 100)
+
+# The Heroku router gives up after 30 s; a worker stuck longer than that
+# is only holding a slot.
+timeout = _env_int("WEB_TIMEOUT", 30)
+graceful_timeout = _env_int("WEB_GRACEFUL_TIMEOUT", 20)
+
+# Seconds an idle connection stays open (gthread only). Long enough to
+# span the pause between two answers, so the next one skips a new
+# connection handshake.
+keepalive = _env_int("WEB_KEEPALIVE", 20)
+
+# Worker heartbeats on tmpfs: a slow disk must not look like a hung worker.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def on_starting(server):
+    # Answer throttling and replay protection keep their state in the
+    # Django cache; refuse to fork several workers onto a per-process one.
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nerdeck_project.settings")
+    from cards.throttling import check_shared_cache
+
+    check_shared_cache(server.cfg.workers)
@@ -0,0 +1,49 @@
+"""Cache backends that count their hits and misses (see metrics.py)."""
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from . import metrics
+
+
+_MISSING = object()
+
+
+class HitCountingMixin:
+    """Count get() lookups per cache as hits or misses."""
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        # The KEY_PREFIX tells shared Redis aliases apart; locmem caches
+        # each have their own LOCATION.
+        self.metrics_name = params.get("KEY_PREFIX") or location
+
+    def _count(self, hits, misses):
+        for result, count in (("hit", hits), ("miss", misses)):
+            if count:
+                metrics.inc(
+                    "nerdeck_cache_lookups_total",
+                    "Cache lookups by result.",
+                    count,
+                    cache=self.metrics_name,
+                    result=result,
+                )
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        hit = value is not _MISSING
+        self._count(int(hit), int(not hit))
+        return value if hit else default
+
+
+class CountingLocMemCache(HitCountingMixin, LocMemCache):
+    # LocMemCache.get_many() goes through get(), which already counts.
+    pass
+
+
+class CountingRedisCache(HitCountingMixin, RedisCache):
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        self._count(len(found), len(keys) - len(found))
+        return found
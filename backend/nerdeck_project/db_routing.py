@@ -0,0 +1,100 @@
+"""Read replica routing.
+
+With DATABASE_REPLICA_URL set, settings add a "replica" database alias.
+Reads are sent there only where code opts in with ``replica_reads()``, as a
+view decorator or a ``with`` block around read-only querysets. Everything
+else, writes, and any read inside a transaction stay on "default".
+
+Replicas lag behind the primary, so a client that just wrote must not read
+its old state back: every write marks the request, and
+ReplicaPinMiddleware then pins that client to the primary for
+REPLICA_PIN_SECONDS with a short-lived cookie (read-your-writes).
+
+Only the cards app is routed; sessions and users are always read from the
+primary, where a fresh login is guaranteed to be visible.
+
+To try it locally, point DATABASE_REPLICA_URL at a second SQLite file and
+``python manage.py migrate --database replica``; the two files don't
+replicate, which makes it easy to see which one a page read from.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_ALIAS = "replica"
+REPLICA_PIN_COOKIE = "nerdeck_primary"
+REPLICA_APPS = {"cards"}
+
+_replica_reads = ContextVar("replica_reads", default=False)
+_request_state = ContextVar("replica_request_state", default=None)
+
+
+class RequestState:
+    """Per-request routing state kept by ReplicaPinMiddleware."""
+
+    def __init__(self, pinned=False):
+        # Pinned requests read from the primary only.
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """Allow reads in this block (or decorated view) to use the replica."""
+
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def request_state(pinned):
+    """Track one request's writes; yields its RequestState."""
+
+    state = RequestState(pinned)
+    token = _request_state.set(state)
+    try:
+        yield state
+    finally:
+        _request_state.reset(token)
+
+
+class ReplicaRouter:
+    """Route opted-in reads of the cards app to the replica alias."""
+
+    def db_for_read(self, model, **hints):
+        if not (_replica_reads.get() and replica_configured()):
+            return None
+        if model._meta.app_label not in REPLICA_APPS:
+            return None
+
+        state = _request_state.get()
+        if state is not None and (state.pinned or state.wrote):
+            return None
+        # Reads inside a transaction must see that transaction's writes.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        databases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,133 @@
+"""In-process metrics in the Prometheus text format.
+
+Counters and histograms live in this process's memory; there is no agent
+or client library. Each gunicorn worker keeps its own numbers, and the
+``worker`` label on every sample (the pid) keeps them apart when a scraper
+reaches different workers. Gauges are computed when /api/metrics/ is
+scraped (see monitoring.py).
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+
+# Seconds; covers cached page hits up to requests near the router timeout.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_lock = threading.Lock()
+_help = {}
+_buckets = {}
+_counters = {}
+_histograms = {}
+_reviews = deque()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, help_text, value=1, **labels):
+    """Add ``value`` to a counter."""
+
+    key = _key(name, labels)
+    with _lock:
+        _help.setdefault(name, ("counter", help_text))
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, help_text, value, buckets, **labels):
+    """Record one observation in a histogram."""
+
+    key = _key(name, labels)
+    with _lock:
+        _help.setdefault(name, ("histogram", help_text))
+        _buckets.setdefault(name, buckets)
+        counts, total = _histograms.get(key, ([0] * (len(buckets) + 1), 0.0))
+        # Per-bucket counts here; made cumulative when rendered.
+        counts[bisect_left(buckets, value)] += 1
+        _histograms[key] = (counts, total + value)
+
+
+def counter_values(name):
+    """Return [((name, labels), value)] for every label set of a counter."""
+
+    with _lock:
+        return [(key, value) for key, value in _counters.items() if key[0] == name]
+
+
+def record_review(is_right):
+    """Count one answered card (the reviews-per-minute gauge)."""
+
+    inc(
+        "nerdeck_reviews_total",
+        "Answers recorded on SRS rows.",
+        result="right" if is_right else "wrong",
+    )
+    now = time.monotonic()
+    with _lock:
+        _reviews.append(now)
+        while _reviews and _reviews[0] < now - 60:
+            _reviews.popleft()
+
+
+def reviews_last_minute():
+    cutoff = time.monotonic() - 60
+    with _lock:
+        while _reviews and _reviews[0] < cutoff:
+            _reviews.popleft()
+        return len(_reviews)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    # Read per call: with preload_app the module is imported before the fork.
+    pairs = (("worker", os.getpid()), *pairs)
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render(gauges=()):
+    """Return every metric in the Prometheus text exposition format.
+
+    ``gauges`` is an iterable of (name, help, labels dict, value) computed
+    by the caller at scrape time.
+    """
+
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(counts), total) for key, (counts, total) in _histograms.items()}
+        metadata = dict(_help)
+
+    lines = []
+    written = set()
+
+    def header(name, kind, help_text):
+        if name not in written:
+            written.add(name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, *metadata[name])
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+    for (name, labels), (counts, total) in sorted(histograms.items()):
+        header(name, *metadata[name])
+        cumulative = 0
+        for bound, count in zip((*_buckets[name], "+Inf"), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels((*labels, ('le', bound)))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+    for name, help_text, labels, value in gauges:
+        header(name, "gauge", help_text)
+        lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,180 @@
+"""Project-wide HTTP middleware: request metrics, response compression,
+cache headers and read replica pinning."""
+
+import time
+from contextlib import ExitStack
+
+import brotli
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from . import metrics
+from .db_routing import REPLICA_PIN_COOKIE, replica_configured, request_state
+
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class MetricsMiddleware:
+    """Count requests, their latency and their database queries per URL name.
+
+    First in MIDDLEWARE, so the latency covers every other middleware.
+    Requests that resolve to no URL pattern share the view label
+    "unmatched", which keeps the number of label values bounded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or "unmatched"
+        metrics.inc(
+            "nerdeck_http_requests_total",
+            "HTTP requests by view, method and status.",
+            view=view,
+            method=request.method if request.method in KNOWN_METHODS else "other",
+            status=response.status_code,
+        )
+        metrics.observe(
+            "nerdeck_http_request_duration_seconds",
+            "Request latency by view.",
+            elapsed,
+            metrics.LATENCY_BUCKETS,
+            view=view,
+        )
+        metrics.observe(
+            "nerdeck_http_request_db_queries",
+            "Database queries per request by view.",
+            queries[0],
+            metrics.QUERY_COUNT_BUCKETS,
+            view=view,
+        )
+        metrics.inc("nerdeck_db_queries_total", "Database queries.", queries[0], view=view)
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Brotli- or gzip-compress large HTML/JSON responses.
+
+    Static files never get here (WhiteNoise answers them above this
+    middleware with precompressed files), and binary media such as card
+    images or audio is skipped because it is already compressed. Pages that
+    carry a CSRF token always get GZipMiddleware's padded gzip, not brotli.
+    """
+
+    min_length = 1024
+    brotli_quality = 5  # Good ratio at gzip-like CPU cost for dynamic pages.
+
+    def process_response(self, request, response):
+        content_type = response.get("Content-Type", "")
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return response
+        if response.streaming or response.has_header("Content-Encoding"):
+            return super().process_response(request, response)
+        if len(response.content) < self.min_length:
+            return response
+
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if not re_accepts_brotli.search(accept_encoding):
+            return super().process_response(request, response)
+        if "CSRF_COOKIE_NEEDS_UPDATE" in request.META:
+            # get_token() ran, so the page may embed the CSRF token
+            # (CsrfViewMiddleware resets the flag but leaves the key). gzip
+            # pads such responses with a random-length file name against
+            # BREACH; a brotli stream has no field to carry that padding.
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed_content = brotli.compress(response.content, quality=self.brotli_quality)
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response.headers["Content-Length"] = str(len(compressed_content))
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
+
+
+class PrivateJSONCacheMiddleware:
+    """Mark JSON answers for logged-in users as private and revalidated.
+
+    Shared caches must never store per-user JSON; browsers may keep it but
+    have to revalidate (ConditionalGetMiddleware answers with 304 when the
+    ETag still matches). Views that set their own Cache-Control win.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        is_json = response.get("Content-Type", "").startswith("application/json")
+        if is_json and request.user.is_authenticated and not response.has_header("Cache-Control"):
+            if request.method in ("GET", "HEAD"):
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, private=True, no_store=True)
+            patch_vary_headers(response, ("Cookie",))
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Keep a client on the primary database for a while after it writes.
+
+    The router (see db_routing.py) records every write of the request; the
+    response then carries a cookie that pins the client's next requests to
+    the primary for REPLICA_PIN_SECONDS, until the replica has caught up.
+    It sits above SessionMiddleware so session saves count as writes too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        with request_state(pinned=REPLICA_PIN_COOKIE in request.COOKIES) as state:
+            response = self.get_response(request)
+
+        if state.wrote:
+            response.set_cookie(
+                REPLICA_PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,163 @@
+"""Readiness check and the /api/metrics/ endpoint.
+
+``/api/health/`` only says the process is up (liveness). ``/api/ready/``
+checks what a request needs: a database round trip per configured alias,
+no unapplied migrations, and a working cache; it answers 503 otherwise so
+a load balancer or deploy can hold traffic back. ``/api/metrics/`` serves
+metrics.py's counters plus gauges computed at scrape time.
+"""
+
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils import timezone
+
+from . import metrics
+
+
+# Database-backed gauges are cached this long, so frequent scrapes don't
+# turn into frequent COUNT queries.
+GAUGE_CACHE_SECONDS = 60
+
+_migrations_applied = False
+_gauge_cache = {"expires": 0.0, "values": []}
+
+
+def _db_roundtrip(alias):
+    """Seconds for a ``SELECT 1`` on a database alias."""
+
+    start = time.perf_counter()
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    return time.perf_counter() - start
+
+
+def _migrations_pending():
+    """True while the default database has unapplied migrations.
+
+    Loading the migration graph is slow, so once everything is applied the
+    answer is remembered for the life of the process.
+    """
+
+    global _migrations_applied
+    if _migrations_applied:
+        return False
+    executor = MigrationExecutor(connections["default"])
+    pending = bool(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+    _migrations_applied = not pending
+    return pending
+
+
+def readiness(request):
+    """200 when the database, migrations and cache are usable, else 503."""
+
+    checks = {}
+    ready = True
+
+    for alias in settings.DATABASES:
+        try:
+            checks[f"db_{alias}_ms"] = round(_db_roundtrip(alias) * 1000, 2)
+        except DatabaseError as exc:
+            checks[f"db_{alias}"] = f"error: {exc.__class__.__name__}"
+            ready = False
+
+    try:
+        pending = _migrations_pending()
+        checks["migrations"] = "pending" if pending else "applied"
+        ready = ready and not pending
+    except DatabaseError as exc:
+        checks["migrations"] = f"error: {exc.__class__.__name__}"
+        ready = False
+
+    probe = secrets.token_hex(8)
+    try:
+        cache.set("readiness-probe", probe, timeout=30)
+        checks["cache"] = "ok" if cache.get("readiness-probe") == probe else "error"
+    except Exception as exc:  # Backend-specific errors (e.g. Redis down).
+        checks["cache"] = f"error: {exc.__class__.__name__}"
+    ready = ready and checks["cache"] == "ok"
+
+    return JsonResponse(
+        {"status": "ready" if ready else "unavailable", "checks": checks},
+        status=200 if ready else 503,
+    )
+
+
+def _database_gauges():
+    """Backlogs of the maintenance commands, cached for GAUGE_CACHE_SECONDS."""
+
+    now = time.monotonic()
+    if _gauge_cache["expires"] > now:
+        return _gauge_cache["values"]
+
+    from django.contrib.sessions.models import Session
+
+    from cards.models import Media
+
+    # Only indexed counts: outdated renders (rerender_cards) would need a
+    # scan of the whole card table on every refresh.
+    pending = {
+        # Unreferenced blobs waiting for gc_media (partial index).
+        "gc_media": Media.objects.filter(ref_count=0).count(),
+    }
+    if settings.SESSION_ENGINE.endswith((".db", ".cached_db")):
+        # Expired sessions waiting for purge_sessions (indexed expire_date).
+        pending["purge_sessions"] = Session.objects.filter(expire_date__lt=timezone.now()).count()
+
+    values = [
+        ("nerdeck_pending_tasks", "Rows waiting for a maintenance command.", {"task": task}, count)
+        for task, count in pending.items()
+    ]
+    for alias in settings.DATABASES:
+        values.append((
+            "nerdeck_db_roundtrip_seconds",
+            "Latency of SELECT 1 at the last gauge refresh.",
+            {"database": alias},
+            round(_db_roundtrip(alias), 6),
+        ))
+
+    _gauge_cache.update(expires=now + GAUGE_CACHE_SECONDS, values=values)
+    return values
+
+
+def metrics_endpoint(request):
+    """Prometheus scrape target, guarded by METRICS_TOKEN (or DEBUG)."""
+
+    token = settings.METRICS_TOKEN
+    if token:
+        sent = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not secrets.compare_digest(sent, token):
+            raise Http404
+    elif not settings.DEBUG:
+        raise Http404
+
+    lookups = {}
+    for (name, labels), value in metrics.counter_values("nerdeck_cache_lookups_total"):
+        labels = dict(labels)
+        lookups.setdefault(labels["cache"], {}).setdefault(labels["result"], value)
+
+    gauges = [
+        (
+            "nerdeck_reviews_last_minute",
+            "Answers recorded by this worker in the last 60 seconds.",
+            {},
+            metrics.reviews_last_minute(),
+        ),
+        *(
+            (
+                "nerdeck_cache_hit_ratio",
+                "Share of cache lookups that hit, since the worker started.",
+                {"cache": name},
+                round(counts.get("hit", 0) / (counts.get("hit", 0) + counts.get("miss", 0)), 4),
+            )
+            for name, counts in sorted(lookups.items())
+        ),
+        *_database_gauges(),
+    ]
+    return HttpResponse(metrics.render(gauges), content_type="text/plain; version=0.0.4")
@@ -33,13 +33,25 @@ INSTALLED_APPS = [
     "cards",
 ]
 
+# The admin (and every admin.py it autodiscovers) is about a quarter of a
+# worker's start-up. ADMIN_ENABLED=0 leaves it out of web dynos that
+# don't serve /admin/; `manage.py profile_startup` shows the difference.
+ADMIN_ENABLED = os.environ.get("ADMIN_ENABLED", "1") == "1"
+if not ADMIN_ENABLED:
+    INSTALLED_APPS.remove("django.contrib.admin")
+
 MIDDLEWARE = [
+    "nerdeck_project.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "nerdeck_project.middleware.CompressionMiddleware",
+    "nerdeck_project.middleware.ReplicaPinMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "nerdeck_project.middleware.PrivateJSONCacheMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -50,13 +62,23 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
             ],
+            # Compile each template once per process. In DEBUG the
+            # autoreloader resets this cache whenever a template changes.
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
         },
     },
 ]
@@ -71,6 +93,75 @@ DATABASES = {
     )
 }
 
+# Optional read replica. Views marked with replica_reads() read from it;
+# a client that writes is pinned to the primary for REPLICA_PIN_SECONDS
+# (see nerdeck_project/db_routing.py).
+if os.environ.get("DATABASE_REPLICA_URL"):
+    DATABASES["replica"] = dj_database_url.parse(os.environ["DATABASE_REPLICA_URL"])
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["nerdeck_project.db_routing.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
+
+# Cache
+# Per-process memory cache by default; set REDIS_URL to share the cache
+# (page cache, rate limits, ...) between workers and dynos. The backends
+# count hits and misses for /api/metrics/ (see cache_backends.py).
+CACHES = {
+    "default": {
+        "BACKEND": "nerdeck_project.cache_backends.CountingLocMemCache",
+        "LOCATION": "nerdecks",
+    },
+    # {% cache %} fragments of decks.html: one entry per deck row, so it
+    # needs far more room than locmem's default of 300 entries.
+    "template_fragments": {
+        "BACKEND": "nerdeck_project.cache_backends.CountingLocMemCache",
+        "LOCATION": "nerdecks-fragments",
+        "TIMEOUT": 86400,
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
+}
+if os.environ.get("REDIS_URL"):
+    for alias in CACHES:
+        CACHES[alias] = {
+            "BACKEND": "nerdeck_project.cache_backends.CountingRedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+            "KEY_PREFIX": alias,
+        }
+
+# Bearer token for /api/metrics/. Unset: the endpoint only answers in DEBUG.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Sessions: "db" (default, one django_session read per request), "cached_db"
+# (read from the cache, written through to the database; share the cache
+# with REDIS_URL) or "signed_cookies" (no server-side storage; a session
+# can't be revoked before it expires, only replaced on logout).
+SESSION_BACKENDS = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_ENGINE = SESSION_BACKENDS[os.environ.get("SESSION_BACKEND", "db")]
+
+# Flash messages ride in their own cookie, so messages.success() before a
+# redirect never modifies (and re-saves) the session.
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+# Answer endpoints: token bucket of (burst size, answers per second) per
+# user, and how long a submitted answer is remembered to drop its retries.
+ANSWER_RATE_LIMIT = (
+    int(os.environ.get("ANSWER_RATE_BURST", 20)),
+    float(os.environ.get("ANSWER_RATE_PER_SECOND", 2.0)),
+)
+ANSWER_IDEMPOTENCY_SECONDS = 600
+
+# Move new due dates to the least loaded day within a tolerance window
+# (see cards/scheduling.py) instead of the exact ladder day.
+LOAD_BALANCE_DUE_DATES = os.environ.get("LOAD_BALANCE_DUE_DATES", "1") == "1"
+
+# Seconds anonymous marketing pages (landing, home) stay in the page cache.
+ANONYMOUS_PAGE_CACHE_SECONDS = int(os.environ.get("ANONYMOUS_PAGE_CACHE_SECONDS", 600))
+
 CSRF_TRUSTED_ORIGINS = [
     "https://*.codeinstitute-ide.net",
     "https://*.herokuapp.com",
@@ -96,6 +187,15 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# Uploaded card media, content-addressed (see cards/media.py). Stored by the
+# default FileSystemStorage backend under MEDIA_ROOT.
+MEDIA_URL = "/media/"
+MEDIA_ROOT = Path(os.environ.get("MEDIA_ROOT", BASE_DIR / "media"))
+
+# Directory for cached NumPy snapshots of users' SRS state (see
+# cards/analytics.py). Unset: statistics always read the database.
+ANALYTICS_CACHE_DIR = os.environ.get("ANALYTICS_CACHE_DIR") or None
+
 # Auth redirects
 LOGIN_REDIRECT_URL = "/decks/"
 LOGIN_URL = "/login/"
@@ -1,7 +1,8 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from django.http import JsonResponse
+from nerdeck_project.monitoring import metrics_endpoint, readiness
 from cards.views import (
     LandingPageView,
     HomeView,
@@ -14,18 +15,35 @@ from cards.views import (
     rename_folder,
     organize_decks,
     merge_folders,
+    move_folder,
     new_flashcard,
+    new_note,
     study_deck,
+    study_folder,
+    study_due,
+    session_answer,
     review_answer,
     delete_flashcard,
+    duplicate_report,
+    srs_stats,
+    update_study_day,
+    library,
+    publish_deck,
+    subscribe_deck,
+    card_search,
+    tag_list,
+    upload_media,
+    serve_media,
+    serve_media_thumbnail,
 )
 
 def health(request):
     return JsonResponse({"status": "ok"})
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("api/health/", health, name="api_health"),
+    path("api/ready/", readiness, name="api_ready"),
+    path("api/metrics/", metrics_endpoint, name="api_metrics"),
     path("home/", HomeView.as_view(), name="home"),
     path("decks/", DecksView.as_view(), name="decks"),
     path("decks/create/", create_deck, name="create_deck"),
@@ -34,12 +52,33 @@ urlpatterns = [
     path("decks/folders/rename/", rename_folder, name="rename_folder"),
     path("decks/organize/", organize_decks, name="organize_decks"),
     path("decks/folders/merge/", merge_folders, name="merge_folders"),
+    path("decks/folders/move/", move_folder, name="move_folder"),
     path("decks/<int:deck_id>/new/", new_flashcard, name="new_flashcard"),
+    path("decks/<int:deck_id>/notes/new/", new_note, name="new_note"),
     path("decks/<int:deck_id>/study/", study_deck, name="study"),
     path("decks/<int:deck_id>/review/answer/", review_answer, name="review_answer"),
+    path("decks/duplicates/", duplicate_report, name="duplicate_report"),
+    path("decks/<int:deck_id>/publish/", publish_deck, name="publish_deck"),
+    path("library/", library, name="library"),
+    path("library/<int:deck_id>/subscribe/", subscribe_deck, name="subscribe_deck"),
+    path("cards/search/", card_search, name="card_search"),
+    path("tags/", tag_list, name="tag_list"),
+    path("folders/<int:folder_id>/study/", study_folder, name="study_folder"),
+    path("study/due/", study_due, name="study_due"),
+    path("study/stats/", srs_stats, name="srs_stats"),
+    path("study/day/", update_study_day, name="update_study_day"),
+    path("study/sessions/<int:session_id>/answer/", session_answer, name="session_answer"),
     path("decks/<int:deck_id>/cards/<int:card_id>/delete/", delete_flashcard, name="delete_flashcard"),
+    path("media/upload/", upload_media, name="upload_media"),
+    path("media/<str:sha256>/", serve_media, name="media_file"),
+    path("media/<str:sha256>/thumb/", serve_media_thumbnail, name="media_thumbnail"),
     path("login/", auth_views.LoginView.as_view(template_name="login.html"), name="login"),
     path("logout/", logout_view, name="logout"),
     path("signup/", SignupView.as_view(), name="signup"),
     path("", LandingPageView.as_view(), name="landingpage"),
 ]
+
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
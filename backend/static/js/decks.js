@@ -117,6 +117,11 @@ document.addEventListener("DOMContentLoaded", () => {
 
     input.value = next;
     form.dataset.submitting = "1";
+    // Deck rows are cached server-side, so their forms carry an empty token slot.
+    const tokenInput = form.querySelector(".row-csrf-token");
+    if (tokenInput) {
+      tokenInput.value = getCsrfToken();
+    }
     form.submit();
   }
 
@@ -369,6 +374,27 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   }
 
+  async function moveFolder(folderId, parentFolderId) {
+    // Nest a folder (with its subfolders) inside another, or back to the top level.
+    const response = await fetch("/decks/folders/move/", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        "X-CSRFToken": getCsrfToken(),
+      },
+      body: JSON.stringify({
+        folder_id: folderId,
+        parent_folder_id: parentFolderId,
+      }),
+    });
+
+    const responsePayload = await response.json().catch(() => ({}));
+    if (!response.ok || !responsePayload.ok) {
+      const error = responsePayload.error || "Could not move folder.";
+      throw new Error(error);
+    }
+  }
+
   function clearDropStyles() {
     // Visual cleanup for highlighted drop targets.
     deckRows.forEach((row) => row.classList.remove("deck-row-drop-target"));
@@ -579,7 +605,7 @@ document.addEventListener("DOMContentLoaded", () => {
           return;
         }
         try {
-          const name = window.prompt("Name for the new folder:");
+          const name = window.prompt("Name for the merged folder:");
           if (!name) return;
           await mergeFolders(source.id, targetFolderId, name.trim());
           window.location.reload();
@@ -662,10 +688,15 @@ document.addEventListener("DOMContentLoaded", () => {
           return;
         }
 
-        // Folder dropped on folder row: prompt user and merge into a new folder.
+        // Folder dropped on folder row: nest it, or merge it into the target folder.
         if (source.type === "folder") {
           if (!source.id || source.id === targetFolderId) return;
-          const name = window.prompt("Name for the new folder:");
+          if (window.confirm("Move this folder inside the other one? Cancel to merge them instead.")) {
+            await moveFolder(source.id, targetFolderId);
+            window.location.reload();
+            return;
+          }
+          const name = window.prompt("Name for the merged folder:");
           if (!name) return;
           await mergeFolders(source.id, targetFolderId, name.trim());
           window.location.reload();
@@ -691,7 +722,9 @@ document.addEventListener("DOMContentLoaded", () => {
 
   if (rootDropZone) {
     rootDropZone.addEventListener("dragover", (event) => {
-      if (dragState.type !== "deck" || !dragState.deckId) return;
+      const draggingDeck = dragState.type === "deck" && dragState.deckId;
+      const draggingFolder = dragState.type === "folder" && dragState.folderId;
+      if (!draggingDeck && !draggingFolder) return;
       event.preventDefault();
       event.dataTransfer.dropEffect = "move";
       rootDropZone.classList.add("root-drop-zone-drop-target");
@@ -706,6 +739,16 @@ document.addEventListener("DOMContentLoaded", () => {
       rootDropZone.classList.remove("root-drop-zone-drop-target");
 
       const source = getDropSource(event);
+      if (source.type === "folder" && source.id) {
+        // Folder dropped on the root zone: move it to the top level.
+        try {
+          await moveFolder(source.id, null);
+          window.location.reload();
+        } catch (error) {
+          window.alert(error.message);
+        }
+        return;
+      }
       if (source.type !== "deck" || !source.id) return;
 
       try {
@@ -723,3 +766,31 @@ document.addEventListener("DOMContentLoaded", () => {
     });
   }
 });
+
+
+// First visit without a study profile: save the browser's time zone so
+// "due today" follows the user's own midnight instead of the server's.
+document.addEventListener("DOMContentLoaded", () => {
+  const url = document.body.dataset.detectTimezoneUrl;
+  const timezone = window.Intl ? Intl.DateTimeFormat().resolvedOptions().timeZone : "";
+  if (!url || !timezone) return;
+
+  const cookie = document.cookie
+    .split(";")
+    .map((part) => part.trim())
+    .find((part) => part.startsWith("csrftoken="));
+
+  fetch(url, {
+    method: "POST",
+    headers: {
+      "X-CSRFToken": cookie ? decodeURIComponent(cookie.split("=")[1]) : "",
+      "X-Requested-With": "XMLHttpRequest",
+    },
+    body: new URLSearchParams({ timezone }),
+  })
+    .then((response) => {
+      // Due counts on this page used the server's day; redraw them.
+      if (response.ok && timezone !== "UTC") window.location.reload();
+    })
+    .catch(() => {});
+});
@@ -0,0 +1,60 @@
+// Upload images/audio from the flashcard form and insert them into the card text.
+// Files are stored once by hash on the server; the response contains a
+// markdown snippet pointing at the shared media URL.
+
+document.addEventListener("DOMContentLoaded", () => {
+  const input = document.getElementById("media-upload-input");
+  const messageEl = document.getElementById("media-upload-message");
+  const frontEl = document.getElementById("id_front_text");
+  const backEl = document.getElementById("id_back_text");
+  const formatEl = document.getElementById("id_content_format");
+  if (!input || !frontEl || !backEl) return;
+
+  let lastTextarea = frontEl;
+  [frontEl, backEl].forEach((el) => {
+    el.addEventListener("focus", () => {
+      lastTextarea = el;
+    });
+  });
+
+  function getCookie(name) {
+    const value = `; ${document.cookie}`;
+    const parts = value.split(`; ${name}=`);
+    if (parts.length === 2) return parts.pop().split(";").shift();
+    return null;
+  }
+
+  input.addEventListener("change", async () => {
+    const file = input.files && input.files[0];
+    if (!file) return;
+
+    const body = new FormData();
+    body.append("file", file);
+    input.disabled = true;
+
+    try {
+      const resp = await fetch(input.dataset.uploadUrl, {
+        method: "POST",
+        headers: { "X-CSRFToken": getCookie("csrftoken") || "" },
+        body,
+      });
+      const data = await resp.json();
+      if (!resp.ok || !data.ok) {
+        throw new Error(data.error || "Upload failed.");
+      }
+
+      const separator = lastTextarea.value && !lastTextarea.value.endsWith("\n") ? "\n" : "";
+      lastTextarea.value = `${lastTextarea.value}${separator}${data.media.markdown}\n`;
+      // Plain text cards would show the snippet literally.
+      if (formatEl && formatEl.value === "plain") {
+        formatEl.value = "markdown";
+      }
+      if (messageEl) messageEl.textContent = "File added.";
+    } catch (e) {
+      if (messageEl) messageEl.textContent = e.message;
+    } finally {
+      input.value = "";
+      input.disabled = false;
+    }
+  });
+});
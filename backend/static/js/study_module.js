@@ -16,6 +16,7 @@ const confirmDeleteButtonEl = document.getElementById("confirmDeleteButton");
 const rightButtonEl = document.getElementById("right-button");
 const wrongButtonEl = document.getElementById("wrong-button");
 const messageEl = document.getElementById("review-message");
+const isCramSession = document.body.dataset.studyMode === "cram";
 const REVIEW_MESSAGE_VISIBLE_MS = 1500;
 const RIGHT_FEEDBACK_DELAY_MS = REVIEW_MESSAGE_VISIBLE_MS;
 
@@ -34,26 +35,28 @@ if (
   let reviewMessageTimeoutId = null;
   const cardState = {
     id: Number(cardTextEl.dataset.cardId),
+    deckId: Number(cardTextEl.dataset.deckId),
     step: Number(cardTextEl.dataset.step || "0"),
     dueAt: cardTextEl.dataset.dueAt || null,
+    version: Number(cardTextEl.dataset.version || "0"),
   };
 
-  let frontText = cardTextEl.dataset.front || "";
-  let backText = cardTextEl.dataset.back || "";
+  // Card content is sanitized HTML rendered by the server when the card is saved.
+  let frontHtml = cardTextEl.dataset.frontHtml || "";
+  let backHtml = cardTextEl.dataset.backHtml || "";
 
   function updateEditUrl() {
-    const baseEditUrl = document.body.dataset.editBaseUrl;
-    if (!baseEditUrl || !cardState.id) return;
+    if (!cardState.deckId || !cardState.id) return;
 
     const params = new URLSearchParams({
       card_id: String(cardState.id),
       next: "study",
     });
-    editButtonEl.dataset.href = `${baseEditUrl}?${params.toString()}`;
+    editButtonEl.dataset.href = `/decks/${cardState.deckId}/new/?${params.toString()}`;
   }
 
   function showFront() {
-    cardTextEl.textContent = frontText;
+    cardTextEl.innerHTML = frontHtml;
     showButtonEl.classList.remove("d-none");
     editButtonEl.classList.add("d-none");
     deleteButtonEl.classList.add("d-none");
@@ -62,7 +65,7 @@ if (
   }
 
   function showBack() {
-    cardTextEl.textContent = backText;
+    cardTextEl.innerHTML = backHtml;
     showButtonEl.classList.add("d-none");
     updateEditUrl();
     editButtonEl.classList.remove("d-none");
@@ -74,17 +77,21 @@ if (
   function moveToNextCard(next) {
     if (next) {
       cardState.id = next.id;
+      cardState.deckId = next.deck_id;
       cardState.step = Number.isFinite(next.step) ? next.step : 0;
       cardState.dueAt = next.due_at || null;
+      cardState.version = Number.isFinite(next.version) ? next.version : 0;
 
-      frontText = next.front_text;
-      backText = next.back_text;
+      frontHtml = next.front_html;
+      backHtml = next.back_html;
 
       cardTextEl.dataset.cardId = String(next.id);
-      cardTextEl.dataset.front = frontText;
-      cardTextEl.dataset.back = backText;
+      cardTextEl.dataset.deckId = String(next.deck_id);
+      cardTextEl.dataset.frontHtml = frontHtml;
+      cardTextEl.dataset.backHtml = backHtml;
       cardTextEl.dataset.step = String(cardState.step);
       cardTextEl.dataset.dueAt = cardState.dueAt || "";
+      cardTextEl.dataset.version = String(cardState.version);
 
       showFront();
       return;
@@ -95,7 +102,9 @@ if (
     deleteButtonEl.classList.add("d-none");
     rightButtonEl.classList.add("d-none");
     wrongButtonEl.classList.add("d-none");
-    cardTextEl.textContent = " Well done you have completed all the cards! See you tomorrow!";
+    cardTextEl.textContent = isCramSession
+      ? " Cram complete — you went through every card!"
+      : " Well done you have completed all the cards! See you tomorrow!";
     if (messageEl) {
       messageEl.textContent = "";
     }
@@ -142,25 +151,29 @@ if (
     setAnswerActionDisabled(true);
 
     const { card: updatedCard, message } = reviewCardTwoButtons(cardState, isRight);
-    showTransientMessage(message);
+    // Cram answers never reschedule the card, so don't promise a due date.
+    showTransientMessage(isCramSession ? (isRight ? "Right ✅" : "Wrong — try it again.") : message);
 
-    const deckId = Number(document.body.dataset.deckId);
     const csrftoken = getCookie("csrftoken");
+    // One key per answer: the server ignores replays of the same submission.
+    const answerKey = `${cardState.id}-${Date.now()}-${Math.random().toString(36).slice(2)}`;
     const delayPromise = isRight ? wait(RIGHT_FEEDBACK_DELAY_MS) : Promise.resolve();
     let resp = null;
 
     try {
-      resp = await fetch(`/decks/${deckId}/review/answer/`, {
+      resp = await fetch(document.body.dataset.answerUrl, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
           "X-CSRFToken": csrftoken || "",
+          "Idempotency-Key": answerKey,
         },
         body: JSON.stringify({
           card_id: cardState.id,
           is_right: isRight,
           step: updatedCard.step,
           due_at: updatedCard.dueAt,
+          version: cardState.version,
         }),
       });
     } catch (e) {
@@ -171,13 +184,21 @@ if (
     await delayPromise;
 
     try {
+      if (resp && resp.status === 409) {
+        // Answered on another device meanwhile: continue from the server's queue.
+        const data = await resp.json();
+        clearReviewMessage();
+        moveToNextCard(data.next_card);
+        return;
+      }
+
       if (!resp || !resp.ok) {
         showFront();
         return;
       }
 
+      const data = await resp.json();
       if (isRight) {
-        const data = await resp.json();
         clearReviewMessage();
         moveToNextCard(data.next_card);
         return;
@@ -185,6 +206,10 @@ if (
 
       cardState.step = updatedCard.step;
       cardState.dueAt = updatedCard.dueAt;
+      if (Number.isFinite(data.version)) {
+        cardState.version = data.version;
+        cardTextEl.dataset.version = String(data.version);
+      }
       showFront();
     } finally {
       setAnswerActionDisabled(false);
@@ -210,16 +235,16 @@ if (
   });
 
   confirmDeleteButtonEl.addEventListener("click", async () => {
-    const deckId = Number(document.body.dataset.deckId);
     const csrftoken = getCookie("csrftoken");
     confirmDeleteButtonEl.disabled = true;
 
     try {
-      const resp = await fetch(`/decks/${deckId}/cards/${cardState.id}/delete/`, {
+      const resp = await fetch(`/decks/${cardState.deckId}/cards/${cardState.id}/delete/`, {
         method: "POST",
         headers: {
           "X-CSRFToken": csrftoken || "",
         },
+        body: new URLSearchParams({ session_id: document.body.dataset.sessionId || "" }),
       });
 
       if (!resp.ok) {